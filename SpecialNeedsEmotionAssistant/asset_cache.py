@@ -0,0 +1,330 @@
+"""
+Build step for the static assets: responsive image derivatives and
+precompressed CSS/JS, kept in a content-hashed cache on disk.
+
+    images      Every JPEG/PNG under image_dirs is resized (INTER_AREA) to each
+                of the configured widths below its own width, plus its own
+                width. Each size is written as WebP (if OpenCV supports it) and
+                as JPEG, or PNG for images with transparency. The learn and
+                quiz pages then get srcset lists, and each device downloads the
+                smallest file that fills its layout slot.
+    text        CSS/JS/SVG files are gzip-compressed (and brotli-compressed
+                when the brotli module is installed) at maximum level. app.py
+                serves them in place of the original when the client accepts
+                the encoding.
+
+Cache file names start with the source file's content hash, so a changed
+source gets new files and stale ones are simply never referenced again. They
+can therefore be served as immutable. manifest.json maps source files to their
+derivatives. A rebuild with unchanged sources only re-hashes files. Run it at
+startup (AssetCache.start_build) or ahead of time with build_assets.py.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from static_assets import StaticAssetVersions
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMAGE_DIRS = ('images', 'learning_content/images')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+DEFAULT_IMAGE_WIDTHS = (160, 320, 640, 1280)
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg')
+# Small files gain little from compression; keep a variant only if it saves at least 10%.
+MIN_COMPRESS_BYTES = 512
+MAX_COMPRESSED_RATIO = 0.9
+MANIFEST_VERSION = 1
+
+# Preferred order when a client accepts several encodings.
+ENCODING_EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+
+
+def _webp_supported():
+    try:
+        ok, _ = cv2.imencode('.webp', np.zeros((8, 8, 3), dtype=np.uint8))
+        return bool(ok)
+    except cv2.error:
+        return False
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class AssetCache:
+    """
+    Responsive image derivatives and precompressed text assets for a static
+    folder, stored under cache_dir/images and cache_dir/compressed.
+    """
+
+    def __init__(self, static_folder, cache_dir, widths=DEFAULT_IMAGE_WIDTHS, image_dirs=IMAGE_DIRS,
+                 webp_quality=80, jpeg_quality=82, versions=None):
+        self.static_folder = os.path.abspath(static_folder)
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.image_cache_dir = os.path.join(self.cache_dir, 'images')
+        self.compressed_cache_dir = os.path.join(self.cache_dir, 'compressed')
+        self.manifest_path = os.path.join(self.cache_dir, 'manifest.json')
+        self.widths = tuple(sorted(set(int(w) for w in widths if int(w) > 0)))
+        self.image_dirs = image_dirs
+        self.webp_quality = webp_quality
+        self.jpeg_quality = jpeg_quality
+        self.versions = versions or StaticAssetVersions(static_folder)
+        self.webp = _webp_supported()
+        if not self.webp:
+            print("Info: this OpenCV build cannot write WebP; image derivatives are JPEG/PNG only.")
+        # Derivatives of an earlier build are only reused if they were made with the same settings.
+        self.options = {'widths': list(self.widths), 'webp': self.webp, 'webp_quality': webp_quality,
+                        'jpeg_quality': jpeg_quality}
+        self._loaded_options = None
+        self._images = {}
+        self._compressed = {}
+        self._build_lock = threading.Lock()
+        self._build_thread = None
+        # Bumped whenever the index changes, so precomputed responses know to rebuild.
+        self.version = 0
+        self.last_build = None
+
+    def load(self):
+        """Reads the manifest of an earlier build. Returns False if there is none (or it is unusable)."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if manifest.get('version') != MANIFEST_VERSION:
+            return False
+        self._loaded_options = manifest.get('options')
+        self._images = manifest.get('images', {})
+        self._compressed = manifest.get('compressed', {})
+        self.version += 1
+        return True
+
+    def start_build(self):
+        """Builds in a daemon thread; the index switches over when it finishes."""
+        self._build_thread = threading.Thread(target=self._build_in_background, name='asset-build', daemon=True)
+        self._build_thread.start()
+        return self._build_thread
+
+    def _build_in_background(self):
+        try:
+            self.build()
+        except Exception as e:
+            print(f"Warning: static asset build failed, serving original files: {e}")
+
+    def wait(self, timeout=None):
+        """Waits for a build started with start_build."""
+        if self._build_thread is not None:
+            self._build_thread.join(timeout)
+
+    def build(self, prune=False):
+        """
+        Creates any missing derivatives and writes a new manifest.
+
+        Args:
+            prune: Delete cache files the new manifest no longer references.
+        Returns:
+            A stats dict (files and bytes built, reused and saved, seconds).
+        """
+        with self._build_lock:
+            start = time.perf_counter()
+            os.makedirs(self.image_cache_dir, exist_ok=True)
+            os.makedirs(self.compressed_cache_dir, exist_ok=True)
+            stats = {'images': 0, 'image_files_built': 0, 'image_files_reused': 0, 'image_bytes_original': 0,
+                     'image_bytes_smallest': 0, 'text_files': 0, 'compressed_files_built': 0,
+                     'compressed_files_reused': 0, 'text_bytes_original': 0, 'text_bytes_gzip': 0}
+            images = {}
+            for filename in self._static_files(self.image_dirs, IMAGE_EXTENSIONS):
+                entry = self._build_image(filename, stats)
+                if entry is not None:
+                    images[filename] = entry
+            compressed = {}
+            for filename in self._static_files(('',), COMPRESS_EXTENSIONS):
+                entry = self._build_compressed(filename, stats)
+                if entry is not None:
+                    compressed[filename] = entry
+
+            manifest = {'version': MANIFEST_VERSION, 'options': self.options, 'images': images,
+                        'compressed': compressed}
+            _write_atomic(self.manifest_path, json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+            if prune:
+                stats['files_pruned'] = self._prune(images, compressed)
+            self._images, self._compressed = images, compressed
+            self._loaded_options = self.options
+            self.version += 1
+            stats['seconds'] = time.perf_counter() - start
+            self.last_build = stats
+            print(f"Static assets: {stats['images']} images ({stats['image_files_built']} derivatives built, "
+                  f"{stats['image_files_reused']} reused), {len(compressed)} precompressed text files "
+                  f"in {stats['seconds']:.2f}s")
+            return stats
+
+    def _static_files(self, directories, extensions):
+        files = []
+        for directory in directories:
+            root = os.path.join(self.static_folder, directory)
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.lower().endswith(extensions):
+                        path = os.path.join(dirpath, name)
+                        files.append(os.path.relpath(path, self.static_folder).replace(os.sep, '/'))
+        return files
+
+    def _build_image(self, filename, stats):
+        digest = self.versions.version(filename)
+        if digest is None:
+            return None
+        previous = self._images.get(filename)
+        if previous is not None and previous.get('hash') == digest and self._loaded_options == self.options and all(
+                os.path.exists(os.path.join(self.image_cache_dir, name))
+                for variants in previous['variants'].values() for _, name in variants):
+            stats['images'] += 1
+            stats['image_files_reused'] += sum(len(v) for v in previous['variants'].values())
+            self._count_image_bytes(filename, previous, stats)
+            return previous
+
+        image = cv2.imread(os.path.join(self.static_folder, filename), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            print(f"Warning: could not decode {filename}; it is served as is.")
+            return None
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        height, width = image.shape[:2]
+        has_alpha = image.shape[2] == 4 and int(image[:, :, 3].min()) < 255
+        if image.shape[2] == 4 and not has_alpha:
+            image = image[:, :, :3]
+
+        formats = []
+        if self.webp:
+            formats.append(('image/webp', f'-q{self.webp_quality}', '.webp',
+                            [cv2.IMWRITE_WEBP_QUALITY, self.webp_quality]))
+        if has_alpha:
+            formats.append(('image/png', '', '.png', [cv2.IMWRITE_PNG_COMPRESSION, 9]))
+        else:
+            formats.append(('image/jpeg', f'-q{self.jpeg_quality}', '.jpg', [
+                cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+                cv2.IMWRITE_JPEG_PROGRESSIVE, 1]))
+        variants = {mimetype: [] for mimetype, _, _, _ in formats}
+        for target_width in [w for w in self.widths if w < width] + [width]:
+            target_height = max(1, round(height * target_width / width))
+            resized = image if target_width == width else cv2.resize(
+                image, (target_width, target_height), interpolation=cv2.INTER_AREA)
+            for mimetype, tag, extension, params in formats:
+                name = f"{digest}-{target_width}{tag}{extension}"
+                path = os.path.join(self.image_cache_dir, name)
+                if os.path.exists(path):
+                    stats['image_files_reused'] += 1
+                else:
+                    ok, encoded = cv2.imencode(extension, resized, params)
+                    if not ok:
+                        continue
+                    _write_atomic(path, encoded.tobytes())
+                    stats['image_files_built'] += 1
+                variants[mimetype].append([target_width, name])
+
+        entry = {'hash': digest, 'width': width, 'height': height,
+                 'variants': {mimetype: v for mimetype, v in variants.items() if v}}
+        stats['images'] += 1
+        self._count_image_bytes(filename, entry, stats)
+        return entry
+
+    def _count_image_bytes(self, filename, entry, stats):
+        """Original size vs the smallest full-width derivative, as a rough measure of the savings."""
+        stats['image_bytes_original'] += os.path.getsize(os.path.join(self.static_folder, filename))
+        full_width = [os.path.getsize(os.path.join(self.image_cache_dir, v[-1][1])) for v in entry['variants'].values()]
+        stats['image_bytes_smallest'] += min(full_width) if full_width else 0
+
+    def _build_compressed(self, filename, stats):
+        path = os.path.join(self.static_folder, filename)
+        size = os.path.getsize(path)
+        digest = self.versions.version(filename)
+        if digest is None or size < MIN_COMPRESS_BYTES:
+            return None
+        stats['text_files'] += 1
+        stats['text_bytes_original'] += size
+        entry = {'hash': digest}
+        data = None
+        for encoding, extension in ENCODING_EXTENSIONS.items():
+            if encoding == 'br' and brotli is None:
+                continue
+            name = f"{digest}{os.path.splitext(filename)[1]}{extension}"
+            cache_path = os.path.join(self.compressed_cache_dir, name)
+            if os.path.exists(cache_path):
+                stats['compressed_files_reused'] += 1
+                compressed_size = os.path.getsize(cache_path)
+            else:
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                if encoding == 'br':
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                compressed_size = len(compressed)
+                if compressed_size > size * MAX_COMPRESSED_RATIO:
+                    continue
+                _write_atomic(cache_path, compressed)
+                stats['compressed_files_built'] += 1
+            entry[encoding] = name
+            if encoding == 'gzip':
+                stats['text_bytes_gzip'] += compressed_size
+        return entry if len(entry) > 1 else None
+
+    def _prune(self, images, compressed):
+        referenced = {name for entry in images.values() for v in entry['variants'].values() for _, name in v}
+        referenced |= {entry[e] for entry in compressed.values() for e in ENCODING_EXTENSIONS if e in entry}
+        removed = 0
+        for directory in (self.image_cache_dir, self.compressed_cache_dir):
+            for name in os.listdir(directory):
+                if name not in referenced:
+                    os.remove(os.path.join(directory, name))
+                    removed += 1
+        return removed
+
+    def _current(self, entries, filename):
+        """
+        The index entry for filename, or None if it is missing or was built
+        from other content. A manifest loaded at startup can predate edits to
+        the source, and its derivatives must not be served under the new hash.
+        """
+        entry = entries.get(filename)
+        if entry is None or entry.get('hash') != self.versions.version(filename):
+            return None
+        return entry
+
+    def image(self, filename):
+        """
+        The derivatives of a static image, or None if it has not been built:
+        {'width', 'height', 'variants': {mimetype: [[width, cache name], ...]}}
+        with each list ordered by width. 'image/webp' (when available) is the
+        preferred variant, the JPEG/PNG one the fallback.
+        """
+        return self._current(self._images, filename)
+
+    def precompressed(self, filename, accepted):
+        """
+        Returns (cache path, encoding) for the best precompressed variant of
+        filename among the accepted encodings, or None.
+        """
+        entry = self._current(self._compressed, filename)
+        if entry is None:
+            return None
+        for encoding in ENCODING_EXTENSIONS:
+            if encoding in entry and encoding in accepted:
+                return os.path.join(self.compressed_cache_dir, entry[encoding]), encoding
+        return None
+
+    def has_precompressed(self, filename):
+        return self._current(self._compressed, filename) is not None
@@ -66,10 +66,11 @@ document.addEventListener('DOMContentLoaded', () => {
                     contentHTML += `<h3 class="mt-4">Example Images:</h3>`;
                     contentHTML += `<p class="text-muted"><small>Click on an image to enlarge.</small></p>`;
                     contentHTML += `<div class="example-images-gallery">`;
-                    data.image_urls.forEach(url => {
-                        // Wrap images in <a> tags for Magnific Popup
-                        contentHTML += `<a href="${url}" class="gallery-item mfp-image" title="Example of ${data.name}">
-                                           <img src="${url}" alt="Example of ${data.name}">
+                    const images = data.images || data.image_urls.map(url => ({ src: url }));
+                    images.forEach(image => {
+                        // Wrap images in <a> tags for Magnific Popup (which shows the full-size src)
+                        contentHTML += `<a href="${image.src}" class="gallery-item mfp-image" title="Example of ${data.name}">
+                                           ${pictureHTML(image, `Example of ${data.name}`, '200px', ' loading="lazy"')}
                                         </a>`;
                     });
                     contentHTML += `</div>`;
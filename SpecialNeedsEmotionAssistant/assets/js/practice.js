@@ -23,12 +23,39 @@ document.addEventListener('DOMContentLoaded', () => {
     let intervalId = null;
     let isDetecting = false;
     const detectionInterval = 300; 
+    // Frames are downscaled before upload and sent as binary to /api/process_frame_binary.
+    // 'jpeg' sends an encoded JPEG; 'gray' sends raw 8-bit luminance (no server-side decode).
+    const uploadWidth = 320;
+    const uploadFormat = 'jpeg';
+    const jpegQuality = 0.7;
+    // With a WebSocket the page streams at ~15 FPS; HTTP polling stays as the fallback.
+    const streamInterval = 66;
 
     let lastDisplayedEmotion = 'Neutral';
     let lastPlayedSound = null;
     let currentTargetEmotion = ''; 
 
     let emojiUrls = {}; 
+    let sessionId = null;
+    let socket = null;
+    let frameInFlight = false; // only one frame is ever waiting on the server; others are dropped
+    let lastStreamMeta = null;
+
+    function newSessionId() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+
+    function endSession() {
+        if (!sessionId) return;
+        const body = JSON.stringify({ sessionId: sessionId });
+        if (navigator.sendBeacon) {
+            navigator.sendBeacon('/api/end_session', new Blob([body], { type: 'application/json' }));
+        } else {
+            fetch('/api/end_session', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: body }).catch(() => {});
+        }
+        sessionId = null;
+    }
 
     function storeEmojiUrl(emotion, url) {
         if (emotion && url) emojiUrls[emotion] = url;
@@ -72,12 +99,13 @@ document.addEventListener('DOMContentLoaded', () => {
             detectionResultDiv.classList.remove('feedback-correct', 'feedback-incorrect');
             startStopButton.innerHTML = '<i class="fas fa-video-slash"></i> Stop Camera';
             isDetecting = true;
+            sessionId = newSessionId();
             lastDisplayedEmotion = 'Neutral'; 
             lastPlayedSound = null;
             updateInstructions(); 
 
-            if(intervalId) clearInterval(intervalId);
-            intervalId = setInterval(detectEmotion, detectionInterval);
+            startDetectionLoop(detectEmotion, detectionInterval);
+            openSocket();
 
         } catch (err) {
             console.error("Error accessing webcam: ", err);
@@ -96,6 +124,8 @@ document.addEventListener('DOMContentLoaded', () => {
      function stopCamera() {
         console.log("Stopping camera...");
         if (intervalId) { clearInterval(intervalId); intervalId = null; }
+        closeSocket();
+        endSession();
 
         if (stream) {
             stream.getTracks().forEach(track => track.stop());
@@ -121,35 +151,114 @@ document.addEventListener('DOMContentLoaded', () => {
         console.log("Camera and detection stopped.");
     }
 
-     async function detectEmotion() {
+    function startDetectionLoop(tick, interval) {
+        if (intervalId) clearInterval(intervalId);
+        frameInFlight = false;
+        intervalId = setInterval(tick, interval);
+    }
+
+    function openSocket() {
+        if (!('WebSocket' in window) || !sessionId) return;
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const ws = new WebSocket(`${protocol}//${window.location.host}/ws/practice?session=${encodeURIComponent(sessionId)}`);
+        ws.binaryType = 'arraybuffer';
+        lastStreamMeta = null;
+
+        ws.onopen = () => {
+            if (socket !== ws || !isDetecting) return;
+            console.log("Practice stream connected over WebSocket.");
+            startDetectionLoop(streamFrame, streamInterval);
+        };
+        ws.onmessage = (event) => {
+            frameInFlight = false;
+            try {
+                updateDetectionUI(JSON.parse(event.data));
+            } catch (e) {
+                console.error('Invalid stream message:', e);
+            }
+        };
+        ws.onclose = () => {
+            if (socket !== ws) return;
+            socket = null;
+            if (isDetecting) {
+                console.warn("Practice stream closed; falling back to HTTP polling.");
+                startDetectionLoop(detectEmotion, detectionInterval);
+            }
+        };
+        socket = ws;
+    }
+
+    function closeSocket() {
+        if (!socket) return;
+        const ws = socket;
+        socket = null;
+        ws.close();
+    }
+
+    function captureFrame() {
         if (!isDetecting || !stream || video.readyState < video.HAVE_CURRENT_DATA || video.paused || video.ended) {
-             return;
+             return false;
         }
 
         try {
-            if (canvas.width !== video.videoWidth || canvas.height !== video.videoHeight) {
-                 if (video.videoWidth > 0 && video.videoHeight > 0) {
-                     canvas.width = video.videoWidth;
-                     canvas.height = video.videoHeight;
-                 } else {
-                     return; 
-                 }
+            if (video.videoWidth <= 0 || video.videoHeight <= 0) return false;
+            const targetWidth = Math.min(uploadWidth, video.videoWidth);
+            const targetHeight = Math.round(video.videoHeight * targetWidth / video.videoWidth);
+            if (canvas.width !== targetWidth || canvas.height !== targetHeight) {
+                canvas.width = targetWidth;
+                canvas.height = targetHeight;
             }
             context.drawImage(video, 0, 0, canvas.width, canvas.height);
+            return true;
         } catch (e) {
             console.error("Error drawing video frame to canvas:", e);
-            return;
+            return false;
         }
+    }
 
-        const imageData = canvas.toDataURL('image/jpeg', 0.7);
+    async function streamFrame() {
+        // Backpressure: skip this tick while the server is still working on the previous frame.
+        if (!socket || socket.readyState !== WebSocket.OPEN || frameInFlight || socket.bufferedAmount > 0) return;
+        if (!captureFrame()) return;
 
+        frameInFlight = true;
         try {
-            const response = await fetch('/api/process_frame', {
+            const frame = await encodeFrame();
+            if (!frame || !socket || socket.readyState !== WebSocket.OPEN) { frameInFlight = false; return; }
+            const meta = JSON.stringify({
+                format: frame.headers['X-Frame-Format'],
+                width: frame.headers['X-Frame-Width'],
+                height: frame.headers['X-Frame-Height'],
+            });
+            if (meta !== lastStreamMeta) {
+                socket.send(meta);
+                lastStreamMeta = meta;
+            }
+            socket.send(frame.body);
+        } catch (error) {
+            frameInFlight = false;
+            console.error('Error streaming frame:', error);
+        }
+    }
+
+     async function detectEmotion() {
+        if (frameInFlight || !captureFrame()) return;
+
+        frameInFlight = true;
+        try {
+            const frame = await encodeFrame();
+            if (!frame) return;
+            const response = await fetch('/api/process_frame_binary', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json', },
-                body: JSON.stringify({ imageData: imageData }),
+                headers: frame.headers,
+                body: frame.body,
             });
 
+            if (response.status === 503) {
+                // The emotion model is still loading on the server; keep polling.
+                updateDetectionUI({ loading: true });
+                return;
+            }
             if (!response.ok) {
                 let errorMsg = `Backend error: ${response.status}`;
                 try { const errorData = await response.json(); errorMsg += ` - ${errorData.error || 'Unknown'}`; } catch(e){}
@@ -163,10 +272,38 @@ document.addEventListener('DOMContentLoaded', () => {
         } catch (error) {
             console.error('Error sending frame or processing response:', error);
              updateDetectionUI({ emotion: lastDisplayedEmotion, error: "Network error" });
+        } finally {
+            frameInFlight = false;
+        }
+    }
+
+    function encodeFrame() {
+        const headers = {
+            'Content-Type': 'application/octet-stream',
+            'X-Session-Id': sessionId,
+            'X-Frame-Format': uploadFormat,
+        };
+        if (uploadFormat === 'gray') {
+            const rgba = context.getImageData(0, 0, canvas.width, canvas.height).data;
+            const gray = new Uint8Array(canvas.width * canvas.height);
+            for (let i = 0, j = 0; j < gray.length; i += 4, j++) {
+                // ITU-R BT.601 luma, same weights as cv2.COLOR_BGR2GRAY
+                gray[j] = (rgba[i] * 299 + rgba[i + 1] * 587 + rgba[i + 2] * 114) / 1000;
+            }
+            headers['X-Frame-Width'] = String(canvas.width);
+            headers['X-Frame-Height'] = String(canvas.height);
+            return Promise.resolve({ body: gray, headers: headers });
         }
+        return new Promise(resolve => {
+            canvas.toBlob(blob => resolve(blob ? { body: blob, headers: headers } : null), 'image/jpeg', jpegQuality);
+        });
     }
 
     function updateDetectionUI(result) {
+        if (result.loading) {
+            emotionLabel.textContent = 'Loading emotion model...';
+            return;
+        }
         let detectedEmotion = result.emotion || 'Neutral';
         let soundIsAvailable = result.sound_available === true;
         let currentEmojiUrl = result.emoji_url || emojiUrls[detectedEmotion];
@@ -239,6 +376,7 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     targetEmotionSelect.addEventListener('change', updateInstructions);
+    window.addEventListener('pagehide', endSession);
 
     stopCamera(); 
 }); 
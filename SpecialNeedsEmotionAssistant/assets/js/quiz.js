@@ -68,7 +68,9 @@ document.addEventListener('DOMContentLoaded', () => {
     function displayQuestion(data) {
         let questionHTML = `<h3>What emotion is shown?</h3>`;
         if (data.image_url) {
-            questionHTML += `<img src="${data.image_url}" alt="Emotion to identify" id="questionImage">`;
+            const image = data.image || { src: data.image_url };
+            const sizes = image.width ? `(max-width: ${image.width}px) 100vw, ${image.width}px` : '100vw';
+            questionHTML += pictureHTML(image, 'Emotion to identify', sizes, ' id="questionImage"');
         } else {
              questionHTML += `<p class="text-danger">(Image could not be loaded for this question)</p>`;
         }
@@ -0,0 +1,11 @@
+// Shared by learn.js and quiz.js. Builds <picture> markup for an image object from the API
+// (see responsive_image() in app.py): WebP and JPEG/PNG srcsets let the browser download the
+// smallest file that fills the slot described by sizes. Without srcsets (derivatives not built
+// yet) it falls back to a plain <img> of the original.
+function pictureHTML(image, alt, sizes, attributes = '') {
+    const dimensions = image.width ? ` width="${image.width}" height="${image.height}"` : '';
+    const srcset = image.srcset ? ` srcset="${image.srcset}" sizes="${sizes}"` : '';
+    const sources = (image.sources || []).map(source =>
+        `<source type="${source.type}" srcset="${source.srcset}" sizes="${sizes}">`).join('');
+    return `<picture>${sources}<img src="${image.src}"${srcset}${dimensions} alt="${alt}"${attributes}></picture>`;
+}
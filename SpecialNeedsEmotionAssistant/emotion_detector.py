@@ -1,14 +1,45 @@
 import cv2
 import numpy as np
-from tensorflow.keras.models import load_model
 import os
 import traceback  
+from inference_backends import create_backend
+from inference_scheduler import InferenceScheduler
+from face_detectors import create_face_detector, detect_at_scale
+from instrumentation import stage_timer, record_stage_error
+
+# Trained models in pretrained_models/. 'student' is the distilled depthwise-separable
+# model from `train_model.py --mode distill` (about 6x fewer FLOPs per face).
+EMOTION_MODELS = {
+    'baseline': 'emotion_model_augmented_weighted.h5',
+    'student': 'emotion_model_student.h5',
+}
+# FER2013 class order, as output by the models.
+EMOTION_LABELS = ('Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral')
+
+
+def model_path_for(model='baseline', model_filename=None):
+    """Path of the model EmotionDetector loads for these arguments (model_filename overrides the named model)."""
+    if model not in EMOTION_MODELS:
+        raise ValueError(f"Unknown emotion model '{model}'. Choose from {list(EMOTION_MODELS)}.")
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    app_root = os.path.dirname(script_dir) if os.path.basename(script_dir) == 'SpecialNeedsEmotionAssistant' else script_dir
+    return os.path.join(app_root, 'pretrained_models', model_filename or EMOTION_MODELS[model])
+
 
 class EmotionDetector:
-    def __init__(self, padding_ratio=0.1, confidence_threshold=0.30):
+    def __init__(self, padding_ratio=0.1, confidence_threshold=0.30, backend='auto', num_threads=None,
+                 face_detector='haar', detect_every=1, detection_scale=1.0, model_filename=None,
+                 model='baseline', frame_gate=None):
         self.padding_ratio = padding_ratio
         self.confidence_threshold = confidence_threshold
-        self.emotion_labels = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
+        self.backend_name = backend
+        self.num_threads = num_threads
+        self.scheduler = None
+        # Face detection runs on the grayscale frame resized by this factor; crops stay full resolution.
+        self.detection_scale = min(1.0, max(0.1, float(detection_scale)))
+        self.emotion_labels = list(EMOTION_LABELS)
+        # Optional FrameGate: reuses earlier results for streams whose frames barely change.
+        self.frame_gate = frame_gate
         print(f"Emotion Detector initialized with confidence_threshold={self.confidence_threshold}")
 
 
@@ -17,19 +48,22 @@ class EmotionDetector:
             app_root = os.path.dirname(script_dir)
         else:
             app_root = script_dir 
-        self.model_filename = 'emotion_model_augmented_weighted.h5'
-     
-        model_path = os.path.join(app_root, 'pretrained_models', self.model_filename)
+        # model_filename overrides the named model: any .h5/.keras file or an exported
+        # .tflite/.onnx artifact (e.g. the int8 one from export_model.py).
+        model_path = model_path_for(model, model_filename)
+        self.model_name = model
+        self.model_filename = model_filename or EMOTION_MODELS[model]
+        self.model_path = model_path
 
         print(f"Attempting to load model from: {model_path} (App root: {app_root})")
 
         if os.path.exists(model_path):
             try:
                
-                self.model = load_model(model_path)
-                print(f"Emotion model loaded successfully from: {model_path}")
+                self.model = create_backend(backend, model_path, num_threads=num_threads)
+                print(f"Emotion model loaded successfully from: {model_path} using {self.model!r}")
             except Exception as e:
-                print(f"FATAL ERROR: Failed to load Keras model from {model_path}. Error: {e}")
+                print(f"FATAL ERROR: Failed to load emotion model from {model_path} with backend '{backend}'. Error: {e}")
                 traceback.print_exc()
                 raise  
         else:
@@ -79,97 +113,252 @@ class EmotionDetector:
                 print(f"Checked paths: {cascade_path} (Exists: {os.path.exists(cascade_path)}), {opencv_cascade_path} (Exists: {os.path.exists(opencv_cascade_path)})")
                 raise FileNotFoundError(f"Haar cascade file '{haar_cascade_filename}' not found in checked locations.")
 
-    def detect_emotion(self, frame):
+        # The cascade above is always loaded so Haar stays available as the fallback detector.
+        models_dir = os.path.join(app_root, 'pretrained_models')
+        try:
+            self.face_detector = create_face_detector(face_detector, models_dir, cascade=self.face_cascade, detect_every=detect_every)
+        except (FileNotFoundError, cv2.error) as e:
+            print(f"Warning: Face detector '{face_detector}' unavailable ({e}). Falling back to Haar cascade.")
+            self.face_detector = create_face_detector('haar', models_dir, cascade=self.face_cascade, detect_every=detect_every)
+
+    def _extract_face_rois(self, gray_orig, faces):
+        """
+        Crops, pads and resizes every detected face into one model-ready batch.
+
+        Returns:
+            (face_boxes, batch) where batch has shape (N, 48, 48, 1), float32
+            in [0, 1], and face_boxes[i] is the (x, y, w, h) box of batch[i].
+        """
+        with stage_timer('crop_resize'):
+            return self._crop_and_resize(gray_orig, faces)
+
+    def _crop_and_resize(self, gray_orig, faces):
+        orig_height, orig_width = gray_orig.shape[:2]
+        face_boxes = []
+        rois = []
+        for (x, y, w, h) in faces:
+
+            pad_w = int(w * self.padding_ratio)
+            pad_h = int(h * self.padding_ratio)
+            y1 = max(0, y - pad_h)
+            y2 = min(orig_height, y + h + pad_h)
+            x1 = max(0, x - pad_w)
+            x2 = min(orig_width, x + w + pad_w)
+            roi_gray_padded = gray_orig[y1:y2, x1:x2]
+            if roi_gray_padded.size == 0:
+                continue
+
+            try:
+                roi_gray_resized = cv2.resize(roi_gray_padded, (48, 48), interpolation=cv2.INTER_AREA)
+            except cv2.error as e:
+                print(f"Warning: cv2.resize error on ROI: {e}")
+                continue
+
+            face_boxes.append((x, y, w, h))
+            rois.append(roi_gray_resized)
+
+        if not rois:
+            return [], np.empty((0, 48, 48, 1), dtype='float32')
+
+        batch = np.stack(rois).astype('float32')
+        batch /= 255.0
+        return face_boxes, batch[..., np.newaxis]
+
+    def enable_micro_batching(self, max_batch_size=32, max_wait_ms=5.0):
+        """
+        Routes predictions through a shared InferenceScheduler so ROIs from
+        concurrent callers (e.g. several Flask request threads) are merged
+        into one forward pass.
+        """
+        if self.scheduler is None:
+            self.scheduler = InferenceScheduler(self.model.predict, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        return self.scheduler
+
+    def disable_micro_batching(self):
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self.scheduler = None
+
+    def after_fork(self):
+        """
+        Makes a detector created before fork() usable in the child process: the
+        inference backend is reloaded unless it is fork-safe, and the
+        micro-batching worker thread (which does not survive a fork) is restarted.
+        """
+        if not getattr(self.model, 'fork_safe', False):
+            print(f"Reloading {self.model!r} in worker process {os.getpid()}")
+            self.model = create_backend(self.backend_name, self.model_path, num_threads=self.num_threads)
+        if self.scheduler is not None:
+            old = self.scheduler
+            self.scheduler = InferenceScheduler(self.model.predict, max_batch_size=old.max_batch_size,
+                                                max_wait_ms=old.max_wait * 1000.0)
+
+    def _classify_batch(self, batch):
+        """Runs a single forward pass over a (N, 48, 48, 1) batch of face ROIs."""
+        with stage_timer('predict'):
+            if self.scheduler is not None:
+                return self.scheduler.predict(batch)
+            return self.model.predict(batch)
+
+    def _label_prediction(self, prediction):
+        """Maps one softmax row to (final_label, confidence) using the threshold."""
+        confidence = float(np.max(prediction))
+        emotion_index = int(np.argmax(prediction))
+
+        if emotion_index >= len(self.emotion_labels):
+            print(f"Warning: Predicted index {emotion_index} out of bounds for labels {self.emotion_labels}. Defaulting to Neutral.")
+            predicted_label = "Neutral"
+        else:
+            predicted_label = self.emotion_labels[emotion_index]
+
+        if confidence >= self.confidence_threshold:
+            final_label = predicted_label
+        else:
+            final_label = "Neutral"
+        return final_label, confidence
+
+    def _to_grayscale(self, frame):
+        if frame.ndim == 2:
+            return frame
+        with stage_timer('grayscale'):
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def _detect_in_gray(self, gray_orig, stream_state=None):
+        orig_height, orig_width = gray_orig.shape[:2]
+        if orig_width <= 0 or orig_height <= 0:
+            return []
+        with stage_timer('detect'):
+            return detect_at_scale(self.face_detector, gray_orig, self.detection_scale, stream_state)
+
+    def _detect_faces(self, frame, stream_state=None):
+        """Converts a frame to grayscale (unless it already is) and runs the face detector on it."""
+        gray_orig = self._to_grayscale(frame)
+        return gray_orig, self._detect_in_gray(gray_orig, stream_state)
+
+    def _merge_gated_results(self, gated, predicted):
+        """
+        Puts cached and freshly predicted faces of one gated frame back in
+        detection order and records the frame with the gate.
+        """
+        gate_state, thumbnail, face_boxes, batch, cached, misses = gated
+        results = [None] * len(face_boxes)
+        for i, (label, confidence) in cached.items():
+            results[i] = (face_boxes[i], label, confidence)
+        for i, result in zip(misses, predicted):
+            results[i] = result
+        if all(result is not None and result[1] != "Error" for result in results):
+            self.frame_gate.update(gate_state, thumbnail, results, {i: batch[i] for i in misses})
+        return [result for result in results if result is not None]
+
+    def _predict_face_batches(self, face_boxes_per_frame, batches):
+        """
+        Classifies the face ROIs of one or more frames with a single model call
+        and splits the labelled results back out per frame.
+        """
+        results_per_frame = [[] for _ in batches]
+        counts = [len(b) for b in batches]
+        if sum(counts) == 0:
+            return results_per_frame
+
+        all_rois = np.concatenate([b for b in batches if len(b)], axis=0)
+        try:
+            predictions = self._classify_batch(all_rois)
+        except Exception as pred_err:
+            print(f"Error during model prediction: {pred_err}")
+            for i, face_boxes in enumerate(face_boxes_per_frame):
+                results_per_frame[i] = [(face_box, "Error", 0.0) for face_box in face_boxes]
+            return results_per_frame
+
+        with stage_timer('label'):
+            offset = 0
+            for i, face_boxes in enumerate(face_boxes_per_frame):
+                for face_box, prediction in zip(face_boxes, predictions[offset:offset + counts[i]]):
+                    final_label, confidence = self._label_prediction(prediction)
+                    results_per_frame[i].append((face_box, final_label, confidence))
+                offset += counts[i]
+        return results_per_frame
+
+    def detect_emotion(self, frame, stream_state=None):
         """
         Detects faces, predicts emotions using the loaded model, applies
         confidence threshold (defaulting to Neutral), and returns results.
+        All faces in the frame are classified in a single batched model call.
 
         Args:
-            frame: The input BGR frame from the webcam.
+            frame: The input BGR frame from the webcam, or an already grayscale 2-D frame.
+            stream_state: Optional dict holding per-stream detector state (used by
+                the tracking face detector); pass the same dict for every frame
+                of one camera/session.
 
         Returns:
             A list of tuples [((x, y, w, h), final_label, confidence)] for all detected faces.
             'final_label' will be the predicted emotion if confidence >= threshold,
             otherwise it will be 'Neutral'.
         """
-        detected_results = []
         if frame is None or frame.size == 0:
             return []
+        return self.detect_emotion_batch([frame], [stream_state])[0]
 
-        try:
-        
-            gray_orig = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            orig_height, orig_width = gray_orig.shape[:2]
-            if orig_width <= 0 or orig_height <= 0:
-                return [] 
+    def detect_emotion_batch(self, frames, stream_states=None):
+        """
+        Runs detection on several frames and classifies every face from every
+        frame in one batched model call.
 
-           
-            faces = self.face_cascade.detectMultiScale(
-                gray_orig, scaleFactor=1.1, minNeighbors=5, minSize=(40, 40)
-            )
-
-          
-            for (x, y, w, h) in faces:
-             
-                pad_w = int(w * self.padding_ratio)
-                pad_h = int(h * self.padding_ratio)
-                y1 = max(0, y - pad_h)
-                y2 = min(orig_height, y + h + pad_h)
-                x1 = max(0, x - pad_w)
-                x2 = min(orig_width, x + w + pad_w)
-                roi_gray_padded = gray_orig[y1:y2, x1:x2]
-                if roi_gray_padded.size == 0:
-                    continue
+        Args:
+            frames: An iterable of BGR (or 2-D grayscale) frames.
+            stream_states: Optional list of per-stream state dicts, one per frame.
+
+        Returns:
+            A list with one entry per input frame, each in the same
+            [((x, y, w, h), final_label, confidence)] format as detect_emotion.
+            Frames that are empty or fail to process yield an empty list.
+        """
+        frames = list(frames)
+        if stream_states is None:
+            stream_states = [None] * len(frames)
+        face_boxes_per_frame = [[] for _ in frames]
+        batches = [np.empty((0, 48, 48, 1), dtype='float32') for _ in frames]
+        # With a frame gate: whole-frame reuse hits, and per-face lookups for the other frames.
+        reused = [None] * len(frames)
+        gated = [None] * len(frames)
 
+        try:
+            for i, frame in enumerate(frames):
+                if frame is None or frame.size == 0:
+                    continue
                 try:
-                    roi_gray_resized = cv2.resize(roi_gray_padded, (48, 48), interpolation=cv2.INTER_AREA)
+                    gray_orig = self._to_grayscale(frame)
+                    gate_state = None
+                    if self.frame_gate is not None and stream_states[i] is not None:
+                        gate_state = self.frame_gate.state_for(stream_states[i])
+                        reused[i], thumbnail = self.frame_gate.reuse_frame(gate_state, gray_orig)
+                        if reused[i] is not None:
+                            continue
+                    faces = self._detect_in_gray(gray_orig, stream_states[i])
+                    face_boxes, batch = self._extract_face_rois(gray_orig, faces)
+                    if gate_state is not None:
+                        cached, misses = self.frame_gate.match_faces(gate_state, face_boxes, batch)
+                        gated[i] = (gate_state, thumbnail, face_boxes, batch, cached, misses)
+                        face_boxes, batch = [face_boxes[j] for j in misses], batch[misses]
+                    face_boxes_per_frame[i], batches[i] = face_boxes, batch
                 except cv2.error as e:
-                    print(f"Warning: cv2.resize error on ROI: {e}")
-                    continue 
+                    print(f"OpenCV Error during detection: {e}")
+                    traceback.print_exc()
 
-                roi_processed = roi_gray_resized.astype('float32') / 255.0
-                roi_processed = np.expand_dims(roi_processed, axis=-1)
-                roi_processed = np.expand_dims(roi_processed, axis=0)
+            results = self._predict_face_batches(face_boxes_per_frame, batches)
+            for i in range(len(frames)):
+                if reused[i] is not None:
+                    results[i] = reused[i]
+                elif gated[i] is not None:
+                    results[i] = self._merge_gated_results(gated[i], results[i])
+            return results
 
-                
-                try:
-                    predictions = self.model.predict(roi_processed, verbose=0)
-                except Exception as pred_err:
-                    print(f"Error during model prediction: {pred_err}")
-                    final_label = "Error"
-                    confidence = 0.0
-                    face_box = (x, y, w, h)
-                    detected_results.append((face_box, final_label, confidence))
-                    continue 
-
-                confidence = np.max(predictions[0])
-                emotion_index = np.argmax(predictions[0])
-
-                if emotion_index >= len(self.emotion_labels):
-                    print(f"Warning: Predicted index {emotion_index} out of bounds for labels {self.emotion_labels}. Defaulting to Neutral.")
-                    predicted_label = "Neutral"
-                else:
-                    predicted_label = self.emotion_labels[emotion_index]
-
-                if confidence >= self.confidence_threshold:
-                    final_label = predicted_label
-                else:
-                    final_label = "Neutral"
-
-                face_box = (x, y, w, h)
-                detected_results.append((face_box, final_label, confidence))
-
-            return detected_results
-
-        except cv2.error as e:
-            print(f"OpenCV Error during detection: {e}")
-            traceback.print_exc()
-            return []
         except AttributeError as e:
             print(f"Attribute Error (model/cascade likely not loaded): {e}")
             traceback.print_exc()
             raise
         except Exception as e:
+            record_stage_error('detect_emotion')
             print(f"General Error during emotion detection: {type(e).__name__}: {e}")
             traceback.print_exc()
-            return []
\ No newline at end of file
+            return [[] for _ in frames]
@@ -0,0 +1,166 @@
+import datetime
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from instrumentation import REGISTRY
+
+EVENTS_WRITTEN = REGISTRY.counter('emotion_events_written_total', 'Usage events written to the event log.')
+EVENTS_DROPPED = REGISTRY.counter(
+    'emotion_events_dropped_total', 'Usage events not written, by reason (queue_full, sampled, error).', ['reason'])
+
+
+class EventLogger:
+    """
+    Append-only JSON-lines event log written by a background thread.
+
+    log() only puts a small tuple on a bounded queue, so the request path never
+    serialises or touches the disk. The writer thread drains the queue in
+    batches of up to batch_size events or every flush_interval seconds,
+    appends them to path (one JSON object per line) and fsyncs at most every
+    fsync_interval seconds, so a crash loses at most a few seconds of events.
+    When the queue is full new events are dropped and counted rather than
+    blocking the caller. Each batch is a single O_APPEND write, so several
+    worker processes can share one log file without interleaving lines.
+
+    sample_rates maps event types to the fraction of events to keep, e.g.
+    {'practice_detection_smoothed': 0.1} for the per-frame practice events.
+    """
+
+    def __init__(self, path, max_queue=10000, batch_size=256, flush_interval=1.0, fsync_interval=5.0,
+                 sample_rates=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.sample_rates = dict(sample_rates or {})
+        self.max_queue = max_queue
+        self._written = 0
+        self._dropped = 0
+        self._sampled_out = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._start()
+
+    def _start(self):
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._closed = threading.Event()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._last_fsync = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='event-log-writer', daemon=True)
+        self._thread.start()
+
+    def after_fork(self):
+        """Restarts the writer in a forked child; the parent's thread does not exist there."""
+        if self._closed.is_set():
+            return
+        os.close(self._fd)
+        self._start()
+
+    def log(self, event_type, data):
+        """Queues an event. Returns False if it was sampled out, dropped or the logger is closed."""
+        rate = self.sample_rates.get(event_type)
+        if rate is not None and rate < 1.0 and random.random() >= rate:
+            self._sampled_out += 1
+            EVENTS_DROPPED.inc(reason='sampled')
+            return False
+        if self._closed.is_set():
+            return False
+        try:
+            self._queue.put_nowait((time.time(), event_type, data))
+            return True
+        except queue.Full:
+            self._dropped += 1
+            EVENTS_DROPPED.inc(reason='queue_full')
+            return False
+
+    def _next_batch(self):
+        """Blocks for the first event (up to flush_interval), then takes whatever else is queued."""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _format(self, timestamp, event_type, data):
+        return json.dumps({
+            'timestamp': datetime.datetime.fromtimestamp(timestamp).isoformat(),
+            'event_type': event_type,
+            'data': data,
+        }, default=str)
+
+    def _write(self, batch):
+        lines = []
+        for event in batch:
+            try:
+                lines.append(self._format(*event))
+            except (TypeError, ValueError) as e:
+                print(f"Error preparing log entry: {e}")
+                EVENTS_DROPPED.inc(reason='error')
+        if lines:
+            try:
+                payload = ('\n'.join(lines) + '\n').encode('utf-8')
+                while payload:
+                    payload = payload[os.write(self._fd, payload):]
+                self._written += len(lines)
+                EVENTS_WRITTEN.inc(len(lines))
+            except OSError as e:
+                print(f"Error writing event log {self.path}: {e}")
+                EVENTS_DROPPED.inc(len(lines), reason='error')
+        for _ in batch:
+            self._queue.task_done()
+
+    def _fsync(self, force=False):
+        now = time.monotonic()
+        if force or now - self._last_fsync >= self.fsync_interval:
+            try:
+                os.fsync(self._fd)
+            except OSError as e:
+                print(f"Error syncing event log {self.path}: {e}")
+            self._last_fsync = now
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            self._fsync()
+        self._fsync(force=True)
+
+    def flush(self, timeout=5.0):
+        """Waits until every queued event has been written. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=5.0):
+        """Writes out the remaining events, fsyncs and closes the file."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"Warning: event log writer did not finish within {timeout}s; "
+                  f"{self._queue.qsize()} events not written.")
+            return
+        os.close(self._fd)
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'queued': self._queue.qsize(),
+            'written': self._written,
+            'dropped': self._dropped,
+            'sampled_out': self._sampled_out,
+        }
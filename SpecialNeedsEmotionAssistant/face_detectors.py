@@ -0,0 +1,228 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# Model files for the DNN detectors. They are not bundled; download them into
+# pretrained_models/ to enable the detector:
+#   YuNet: https://github.com/opencv/opencv_zoo/tree/main/models/face_detection_yunet
+#   SSD:   https://github.com/opencv/opencv/tree/4.x/samples/dnn/face_detector
+YUNET_MODEL_FILENAME = 'face_detection_yunet_2023mar.onnx'
+SSD_PROTOTXT_FILENAME = 'deploy.prototxt'
+SSD_WEIGHTS_FILENAME = 'res10_300x300_ssd_iter_140000.caffemodel'
+
+FACE_DETECTORS = ('haar', 'yunet', 'ssd')
+# Smallest face (in pixels of the downscaled frame) the Haar detector looks for after
+# its min_size is scaled down with the detection scale.
+MIN_SCALED_FACE_SIZE = 10
+
+
+class FaceDetector:
+    """
+    Common interface for face detectors. detect() takes a 2-D uint8 grayscale
+    frame and returns a list of integer (x, y, w, h) boxes. stream_state is an
+    optional per-stream dict for detectors that carry state between frames.
+    scale is the factor gray was downscaled by from the full-resolution frame
+    (see detect_at_scale); detectors with a minimum face size in pixels shrink
+    it accordingly.
+    """
+    name = 'base'
+
+    def detect(self, gray, stream_state=None, scale=1.0):
+        raise NotImplementedError
+
+
+class HaarFaceDetector(FaceDetector):
+    """The original OpenCV Haar cascade detector."""
+    name = 'haar'
+
+    def __init__(self, cascade, scale_factor=1.1, min_neighbors=5, min_size=(40, 40)):
+        self.cascade = cascade
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, gray, stream_state=None, scale=1.0):
+        min_size = self.min_size
+        if scale < 1.0:
+            # Keep the smallest detectable face the same size in the full-resolution frame.
+            min_size = tuple(max(MIN_SCALED_FACE_SIZE, int(round(side * scale))) for side in self.min_size)
+        faces = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=min_size
+        )
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+class YuNetFaceDetector(FaceDetector):
+    """OpenCV's cv2.FaceDetectorYN (YuNet) CNN detector."""
+    name = 'yunet'
+
+    def __init__(self, model_path, score_threshold=0.8, nms_threshold=0.3):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet model not found at {model_path}")
+        self.detector = cv2.FaceDetectorYN.create(model_path, "", (320, 320), score_threshold, nms_threshold)
+        self._input_size = (320, 320)
+        self._lock = threading.Lock()
+
+    def detect(self, gray, stream_state=None, scale=1.0):
+        height, width = gray.shape[:2]
+        bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        with self._lock:
+            if self._input_size != (width, height):
+                self.detector.setInputSize((width, height))
+                self._input_size = (width, height)
+            _, faces = self.detector.detect(bgr)
+        if faces is None:
+            return []
+        return [tuple(int(v) for v in face[:4]) for face in faces]
+
+
+class SSDFaceDetector(FaceDetector):
+    """ResNet-10 SSD face detector run through cv2.dnn."""
+    name = 'ssd'
+
+    def __init__(self, prototxt_path, weights_path, confidence_threshold=0.5):
+        for path in (prototxt_path, weights_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"SSD face detector file not found at {path}")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt_path, weights_path)
+        self.confidence_threshold = confidence_threshold
+        self._lock = threading.Lock()
+
+    def detect(self, gray, stream_state=None, scale=1.0):
+        height, width = gray.shape[:2]
+        bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        blob = cv2.dnn.blobFromImage(bgr, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()[0, 0]
+        boxes = []
+        for detection in detections[detections[:, 2] >= self.confidence_threshold]:
+            x1, y1, x2, y2 = (detection[3:7] * np.array([width, height, width, height])).astype(int)
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(width, x2), min(height, y2)
+            if x2 > x1 and y2 > y1:
+                boxes.append((int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+        return boxes
+
+
+class TrackingFaceDetector(FaceDetector):
+    """
+    Runs the wrapped detector only every detect_every frames and follows the
+    boxes in between with pyramidal Lucas-Kanade optical flow. Each stream
+    keeps its own state dict; a box that loses too many tracked points
+    forces a fresh detection on the next frame.
+    """
+    name = 'tracking'
+
+    def __init__(self, base_detector, detect_every=5, min_tracked_points=6):
+        self.base_detector = base_detector
+        self.detect_every = max(1, int(detect_every))
+        self.min_tracked_points = min_tracked_points
+        self._default_state = {}
+
+    def detect(self, gray, stream_state=None, scale=1.0):
+        state = self._default_state if stream_state is None else stream_state
+        frame_index = state.get('frame_index', 0)
+        prev_gray = state.get('prev_gray')
+        boxes = state.get('boxes')
+
+        needs_detection = (
+            frame_index % self.detect_every == 0
+            or prev_gray is None
+            or prev_gray.shape != gray.shape
+            or not boxes
+            or state.get('lost', False)
+        )
+        if needs_detection:
+            boxes = self.base_detector.detect(gray, scale=scale)
+            state['frame_index'] = 0
+            state['lost'] = False
+        else:
+            boxes, lost = self._track(prev_gray, gray, boxes)
+            state['lost'] = lost
+
+        state['frame_index'] = state.get('frame_index', 0) + 1
+        state['prev_gray'] = gray.copy()
+        state['boxes'] = boxes
+        return list(boxes)
+
+    def _track(self, prev_gray, gray, boxes):
+        height, width = gray.shape[:2]
+        tracked = []
+        lost = False
+        for (x, y, w, h) in boxes:
+            mask = np.zeros_like(prev_gray)
+            mask[y:y + h, x:x + w] = 255
+            points = cv2.goodFeaturesToTrack(prev_gray, maxCorners=40, qualityLevel=0.01, minDistance=3, mask=mask)
+            if points is None or len(points) < self.min_tracked_points:
+                lost = True
+                continue
+            new_points, status, _err = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, winSize=(15, 15), maxLevel=2)
+            good = status.reshape(-1) == 1
+            if good.sum() < self.min_tracked_points:
+                lost = True
+                continue
+            old_pts = points.reshape(-1, 2)[good]
+            new_pts = new_points.reshape(-1, 2)[good]
+            dx, dy = np.median(new_pts - old_pts, axis=0)
+
+            # Scale change from the spread of the points around their centre.
+            old_spread = np.median(np.linalg.norm(old_pts - old_pts.mean(axis=0), axis=1))
+            new_spread = np.median(np.linalg.norm(new_pts - new_pts.mean(axis=0), axis=1))
+            scale = float(new_spread / old_spread) if old_spread > 1e-3 else 1.0
+            scale = min(max(scale, 0.8), 1.25)
+
+            cx, cy = x + w / 2.0 + dx, y + h / 2.0 + dy
+            nw, nh = w * scale, h * scale
+            nx, ny = int(round(cx - nw / 2.0)), int(round(cy - nh / 2.0))
+            nx, ny = max(0, nx), max(0, ny)
+            nw, nh = min(int(round(nw)), width - nx), min(int(round(nh)), height - ny)
+            if nw <= 0 or nh <= 0:
+                lost = True
+                continue
+            tracked.append((nx, ny, nw, nh))
+        return tracked, lost
+
+
+def detect_at_scale(detector, gray, scale=1.0, stream_state=None):
+    """
+    Runs detector on a copy of gray resized by scale (< 1 downscales) and maps
+    the boxes back to full-resolution coordinates. Face crops can then still be
+    taken from the full-resolution frame.
+    """
+    if scale >= 1.0:
+        return detector.detect(gray, stream_state)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    height, width = gray.shape[:2]
+    boxes = []
+    for (x, y, w, h) in detector.detect(small, stream_state, scale=scale):
+        x1, y1 = int(round(x / scale)), int(round(y / scale))
+        x2, y2 = min(width, int(round((x + w) / scale))), min(height, int(round((y + h) / scale)))
+        boxes.append((x1, y1, x2 - x1, y2 - y1))
+    return boxes
+
+
+def create_face_detector(name, models_dir, cascade=None, detect_every=1):
+    """
+    Builds a face detector by name ('haar', 'yunet' or 'ssd'). When
+    detect_every > 1 it is wrapped in a TrackingFaceDetector so full
+    detection only runs on every detect_every-th frame of a stream.
+    """
+    if name == 'haar':
+        if cascade is None:
+            raise ValueError("The Haar detector needs a loaded cv2.CascadeClassifier")
+        detector = HaarFaceDetector(cascade)
+    elif name == 'yunet':
+        detector = YuNetFaceDetector(os.path.join(models_dir, YUNET_MODEL_FILENAME))
+    elif name == 'ssd':
+        detector = SSDFaceDetector(os.path.join(models_dir, SSD_PROTOTXT_FILENAME),
+                                   os.path.join(models_dir, SSD_WEIGHTS_FILENAME))
+    else:
+        raise ValueError(f"Unknown face detector '{name}'. Choose from {FACE_DETECTORS}.")
+
+    if detect_every > 1:
+        detector = TrackingFaceDetector(detector, detect_every=detect_every)
+    print(f"Face detector ready: {name} (detect_every={detect_every})")
+    return detector
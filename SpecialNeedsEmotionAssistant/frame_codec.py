@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+
+# Formats accepted by decode_frame_bytes: an encoded JPEG/PNG image, or raw
+# 8-bit grayscale pixels (row-major, width * height bytes).
+FRAME_FORMATS = ('jpeg', 'gray')
+MAX_RAW_FRAME_PIXELS = 1920 * 1080
+
+
+def decode_frame_bytes(payload, frame_format='jpeg', width=None, height=None):
+    """
+    Decodes an uploaded practice frame without going through base64.
+
+    Args:
+        payload: bytes-like object holding the frame.
+        frame_format: 'jpeg' for an encoded image (decoded straight to
+            grayscale, which is all the detector needs) or 'gray' for raw
+            8-bit luminance.
+        width, height: Frame size, required for 'gray'.
+
+    Returns:
+        A 2-D uint8 grayscale frame. Raw frames are a zero-copy view of payload.
+
+    Raises:
+        ValueError: if the payload is empty, malformed or the format is unknown.
+    """
+    if not payload:
+        raise ValueError("Empty frame payload")
+    buffer = np.frombuffer(payload, dtype=np.uint8)
+
+    if frame_format == 'jpeg':
+        frame = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+        if frame is None:
+            raise ValueError("Could not decode image")
+        return frame
+
+    if frame_format == 'gray':
+        try:
+            width, height = int(width), int(height)
+        except (TypeError, ValueError):
+            raise ValueError("Raw grayscale frames need integer width and height")
+        if width <= 0 or height <= 0 or width * height > MAX_RAW_FRAME_PIXELS:
+            raise ValueError(f"Invalid raw frame size {width}x{height}")
+        if buffer.size != width * height:
+            raise ValueError(f"Raw frame has {buffer.size} bytes, expected {width * height} for {width}x{height}")
+        return buffer.reshape(height, width)
+
+    raise ValueError(f"Unknown frame format '{frame_format}'. Expected one of {FRAME_FORMATS}.")
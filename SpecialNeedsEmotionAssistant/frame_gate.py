@@ -0,0 +1,181 @@
+"""
+Change gating for practice streams: reuse earlier results when the camera
+image has barely changed.
+
+Learners sit fairly still, so consecutive frames are often nearly identical.
+FrameGate checks two levels before running the expensive stages:
+
+    frame  The frame is shrunk to a small thumbnail (INTER_AREA averages out
+           sensor noise), and its mean absolute difference from the last fully
+           processed frame is measured. Below frame_threshold grey levels, the
+           previous boxes and labels are returned without face detection or
+           inference. Off unless frame_threshold > 0: a face covers only a
+           few thumbnail pixels, so a changed expression on a still head can
+           stay under the threshold. Only enable it where that is acceptable.
+    face   Otherwise each detected face's 48x48 ROI is compared with the ROI
+           last classified for the overlapping box (IoU >= min_iou). Below
+           face_threshold grey levels, the cached label is reused and only the
+           remaining faces go to the model.
+
+Results are never reused more than max_reuse times in a row, so slow drift
+(lighting, a gradually changing expression) is still picked up. The state
+lives in the stream's state dict (the practice session's detector_state).
+Each session keeps at most max_faces cached faces, least recently used first
+out. Hits and misses are counted per level, both on the gate and as
+emotion_frame_gate_total{level, result} on /metrics.
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from instrumentation import REGISTRY
+
+GATE_LOOKUPS = REGISTRY.counter(
+    'emotion_frame_gate_total', 'Change-gate lookups, by level (frame, face) and result (hit, miss).',
+    ['level', 'result'])
+
+STATE_KEY = 'frame_gate'
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class _CachedFace:
+    __slots__ = ('box', 'roi', 'label', 'confidence', 'reuse_count')
+
+    def __init__(self, box, roi, label, confidence):
+        self.box = box
+        self.roi = roi
+        self.label = label
+        self.confidence = confidence
+        self.reuse_count = 0
+
+
+class GateState:
+    """Per-stream gate state: the last processed frame and a bounded face cache."""
+    __slots__ = ('thumbnail', 'results', 'reuse_count', 'faces')
+
+    def __init__(self):
+        self.thumbnail = None
+        self.results = None
+        self.reuse_count = 0
+        self.faces = OrderedDict()
+
+
+class FrameGate:
+    def __init__(self, frame_threshold=0.0, face_threshold=4.0, max_reuse=15, max_faces=8, min_iou=0.5,
+                 thumbnail_size=(32, 24)):
+        self.frame_threshold = frame_threshold
+        # ROIs are compared in the model's [0, 1] scale.
+        self.face_threshold = face_threshold / 255.0
+        self.max_reuse = max_reuse
+        self.max_faces = max_faces
+        self.min_iou = min_iou
+        self.thumbnail_size = thumbnail_size
+        self._lock = threading.Lock()
+        self._counts = {('frame', 'hit'): 0, ('frame', 'miss'): 0, ('face', 'hit'): 0, ('face', 'miss'): 0}
+        self._next_face_id = 0
+
+    def _count(self, level, result, amount=1):
+        if amount:
+            with self._lock:
+                self._counts[(level, result)] += amount
+            GATE_LOOKUPS.inc(amount, level=level, result=result)
+
+    def state_for(self, stream_state):
+        state = stream_state.get(STATE_KEY)
+        if state is None:
+            state = stream_state[STATE_KEY] = GateState()
+        return state
+
+    def reuse_frame(self, state, gray):
+        """
+        Returns (results, thumbnail). results is the previous frame's result list
+        if gray barely changed since the last processed frame, else None.
+        With the frame level disabled, both are None and nothing is counted.
+        """
+        if self.frame_threshold <= 0:
+            return None, None
+        thumbnail = cv2.resize(gray, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+        previous = state.thumbnail
+        if (previous is not None and state.results is not None and state.reuse_count < self.max_reuse
+                and previous.shape == thumbnail.shape
+                and cv2.norm(thumbnail, previous, cv2.NORM_L1) / thumbnail.size < self.frame_threshold):
+            state.reuse_count += 1
+            self._count('frame', 'hit')
+            return list(state.results), thumbnail
+        self._count('frame', 'miss')
+        return None, thumbnail
+
+    def match_faces(self, state, face_boxes, batch):
+        """
+        Looks up each face ROI in the stream's cache.
+
+        Returns:
+            (cached, misses): cached maps a face index to its reused
+            (label, confidence); misses lists the indices that need inference.
+        """
+        cached = {}
+        misses = []
+        for i, (box, roi) in enumerate(zip(face_boxes, batch)):
+            entry_id = self._find_face(state, box)
+            entry = state.faces.get(entry_id)
+            if (entry is not None and entry.reuse_count < self.max_reuse
+                    and float(np.mean(np.abs(roi - entry.roi))) < self.face_threshold):
+                entry.box = box
+                entry.reuse_count += 1
+                state.faces.move_to_end(entry_id)
+                cached[i] = (entry.label, entry.confidence)
+            else:
+                misses.append(i)
+        self._count('face', 'hit', len(cached))
+        self._count('face', 'miss', len(misses))
+        return cached, misses
+
+    def _find_face(self, state, box):
+        best_id, best_iou = None, self.min_iou
+        for entry_id, entry in state.faces.items():
+            overlap = box_iou(box, entry.box)
+            if overlap >= best_iou:
+                best_id, best_iou = entry_id, overlap
+        return best_id
+
+    def update(self, state, thumbnail, results, face_rois):
+        """
+        Records a fully processed frame. face_rois maps the index of each newly
+        classified face in results to its ROI.
+        """
+        state.thumbnail = thumbnail
+        state.results = list(results)
+        state.reuse_count = 0
+        for i, roi in face_rois.items():
+            box, label, confidence = results[i]
+            entry_id = self._find_face(state, box)
+            if entry_id is None:
+                with self._lock:
+                    entry_id = self._next_face_id
+                    self._next_face_id += 1
+            state.faces[entry_id] = _CachedFace(box, roi.copy(), label, confidence)
+            state.faces.move_to_end(entry_id)
+        while len(state.faces) > self.max_faces:
+            state.faces.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        stats = {}
+        for level in ('frame', 'face'):
+            hits, misses = counts[(level, 'hit')], counts[(level, 'miss')]
+            stats[f'{level}_hits'] = hits
+            stats[f'{level}_misses'] = misses
+            stats[f'{level}_hit_rate'] = hits / (hits + misses) if hits + misses else 0.0
+        return stats
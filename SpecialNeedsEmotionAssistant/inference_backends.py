@@ -0,0 +1,313 @@
+import importlib.util
+import os
+import threading
+import traceback
+
+import numpy as np
+
+
+class InferenceBackend:
+    """
+    Common interface for running the FER CNN on a batch of face ROIs.
+
+    Subclasses load a model artifact once and implement predict(), which takes
+    a float32 array of shape (N, 48, 48, 1) in [0, 1] and returns an (N, 7)
+    array of class probabilities.
+    """
+    name = 'base'
+    # Whether a loaded instance keeps working in a forked child process (e.g. a
+    # gunicorn worker after preload). Runtimes that started thread pools in the
+    # parent are not, since those threads do not exist in the child.
+    fork_safe = False
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+
+    def predict(self, batch):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.model_path})"
+
+
+class KerasBackend(InferenceBackend):
+    """Calls the Keras model directly through a traced tf.function, bypassing model.predict."""
+    name = 'keras'
+
+    def __init__(self, model_path):
+        super().__init__(model_path)
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+        self._forward = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec(shape=(None, 48, 48, 1), dtype=tf.float32)],
+        )
+
+    def predict(self, batch):
+        return self._forward(np.asarray(batch, dtype=np.float32)).numpy()
+
+
+class TFLiteBackend(InferenceBackend):
+    """Runs a converted .tflite model, using tflite_runtime when available instead of full TensorFlow."""
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None):
+        super().__init__(model_path)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        # Single-threaded interpreters start no worker threads.
+        self.fork_safe = num_threads == 1
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # The interpreter keeps internal buffers, so calls must not overlap.
+        self._lock = threading.Lock()
+
+    def _quantize_input(self, batch):
+        dtype = self._input['dtype']
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = self._input['quantization']
+        return np.clip(np.round(batch / scale + zero_point), np.iinfo(dtype).min, np.iinfo(dtype).max).astype(dtype)
+
+    def _dequantize_output(self, output):
+        if self._output['dtype'] == np.float32:
+            return output
+        scale, zero_point = self._output['quantization']
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input['index'], [len(batch), 48, 48, 1])
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self._input['index'], self._quantize_input(batch))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output['index']).copy()
+        return self._dequantize_output(output)
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """Runs a converted .onnx model with ONNX Runtime on the CPU execution provider."""
+    name = 'onnxruntime'
+
+    def __init__(self, model_path, num_threads=None):
+        super().__init__(model_path)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.fork_safe = num_threads == 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self._input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+class OpenCVDNNBackend(InferenceBackend):
+    """Runs a converted .onnx model through cv2.dnn, which needs no extra packages."""
+    name = 'opencv'
+
+    def __init__(self, model_path):
+        super().__init__(model_path)
+        import cv2
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        with self._lock:
+            self.net.setInput(np.ascontiguousarray(batch, dtype=np.float32))
+            return self.net.forward()
+
+
+# Order tried when backend='auto': fastest lightweight runtimes first, Keras last.
+AUTO_BACKEND_ORDER = ['onnxruntime', 'tflite', 'opencv', 'keras']
+
+# Modules each backend needs at runtime (any one of them is enough).
+_RUNTIME_MODULES = {
+    'keras': ['tensorflow'],
+    'tflite': ['tflite_runtime', 'tensorflow'],
+    'onnxruntime': ['onnxruntime'],
+    'opencv': ['cv2'],
+}
+
+_CONVERTED_EXTENSIONS = {
+    'tflite': '.tflite',
+    'onnxruntime': '.onnx',
+    'opencv': '.onnx',
+}
+
+
+def _runtime_available(backend_name):
+    return any(importlib.util.find_spec(module) is not None for module in _RUNTIME_MODULES[backend_name])
+
+
+def _is_up_to_date(artifact_path, source_path):
+    return (os.path.exists(artifact_path)
+            and (not os.path.exists(source_path) or os.path.getmtime(artifact_path) >= os.path.getmtime(source_path)))
+
+
+def load_float32_keras_model(keras_model_path):
+    """
+    Loads a Keras model for conversion. Models trained with a mixed-precision
+    policy are rebuilt with float32 layers (their variables are float32
+    already), since the converters cannot lower float16/bfloat16 compute.
+    """
+    import tensorflow as tf
+    model = tf.keras.models.load_model(keras_model_path, compile=False)
+    if all(layer.compute_dtype in (None, 'float32') for layer in model.layers):
+        return model
+    config = model.get_config()
+    for layer_config in config.get('layers', []):
+        if 'dtype' in layer_config.get('config', {}):
+            layer_config['config']['dtype'] = 'float32'
+    float32_model = model.__class__.from_config(config)
+    float32_model.set_weights(model.get_weights())
+    return float32_model
+
+
+def convert_keras_model(keras_model_path, output_path):
+    """
+    Converts a Keras .h5 model into a .tflite or .onnx artifact, picked from
+    the extension of output_path. This is the only step that needs TensorFlow
+    (and tf2onnx for ONNX); later startups load the artifact directly.
+    """
+    import tensorflow as tf
+    print(f"Converting {keras_model_path} -> {output_path} (one-time)...")
+    model = load_float32_keras_model(keras_model_path)
+
+    # Write to a temporary file first so a concurrent startup never sees a partial artifact.
+    tmp_path = output_path + '.tmp'
+    if output_path.endswith('.tflite'):
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        with open(tmp_path, 'wb') as f:
+            f.write(converter.convert())
+    elif output_path.endswith('.onnx'):
+        import tf2onnx
+        spec = (tf.TensorSpec((None, 48, 48, 1), tf.float32, name='input'),)
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=tmp_path)
+    else:
+        raise ValueError(f"Unsupported conversion target: {output_path}")
+    os.replace(tmp_path, output_path)
+    print(f"Converted model saved to {output_path}")
+    return output_path
+
+
+def _artifact_path(backend_name, keras_model_path):
+    return os.path.splitext(keras_model_path)[0] + _CONVERTED_EXTENSIONS[backend_name]
+
+
+def _needs_conversion(backend_name, model_path):
+    return (backend_name != 'keras' and model_path.endswith('.h5')
+            and not _is_up_to_date(_artifact_path(backend_name, model_path), model_path))
+
+
+def _resolve_model_path(backend_name, keras_model_path, convert):
+    """Returns the artifact path for backend_name, converting the .h5 once if needed."""
+    if backend_name == 'keras' or not keras_model_path.endswith('.h5'):
+        return keras_model_path
+    artifact_path = _artifact_path(backend_name, keras_model_path)
+    if not _is_up_to_date(artifact_path, keras_model_path):
+        if not convert:
+            raise FileNotFoundError(f"No up-to-date converted model at {artifact_path}")
+        convert_keras_model(keras_model_path, artifact_path)
+    return artifact_path
+
+
+def _backend_for_path(model_path):
+    """Picks a backend from an artifact's extension."""
+    if model_path.endswith('.tflite'):
+        return 'tflite'
+    if model_path.endswith('.onnx'):
+        return 'onnxruntime'
+    return 'keras'
+
+
+def _create(backend_name, model_path, num_threads):
+    if backend_name == 'keras':
+        return KerasBackend(model_path)
+    if backend_name == 'tflite':
+        return TFLiteBackend(model_path, num_threads=num_threads)
+    if backend_name == 'onnxruntime':
+        return OnnxRuntimeBackend(model_path, num_threads=num_threads)
+    if backend_name == 'opencv':
+        return OpenCVDNNBackend(model_path)
+    raise ValueError(f"Unknown inference backend '{backend_name}'. Choose from {AUTO_BACKEND_ORDER + ['auto']}.")
+
+
+def plan_backend(backend_name, model_path):
+    """
+    Predicts what create_backend() will do for model_path without loading
+    anything. Returns (backend_name, uses_tensorflow): the backend it would
+    end up with (None if none can load), and whether getting there imports
+    TensorFlow in this process. That happens with the Keras backend, when the
+    .h5 has to be converted (also by an 'auto' candidate whose conversion then
+    fails), and with TFLite when tflite-runtime is not installed.
+    """
+    if backend_name != 'auto':
+        candidates = [backend_name]
+    elif not model_path.endswith('.h5'):
+        candidates = [_backend_for_path(model_path)]
+    else:
+        candidates = [c for c in AUTO_BACKEND_ORDER if _runtime_available(c)]
+    has_tensorflow = importlib.util.find_spec('tensorflow') is not None
+    has_tf2onnx = importlib.util.find_spec('tf2onnx') is not None
+    uses_tensorflow = False
+    for candidate in candidates:
+        converts = _needs_conversion(candidate, model_path)
+        if (candidate == 'keras' or converts
+                or (candidate == 'tflite' and importlib.util.find_spec('tflite_runtime') is None)):
+            uses_tensorflow = uses_tensorflow or has_tensorflow
+        if not converts:
+            return candidate, uses_tensorflow
+        if has_tensorflow and (_CONVERTED_EXTENSIONS[candidate] == '.tflite' or has_tf2onnx):
+            return candidate, uses_tensorflow
+    return None, uses_tensorflow
+
+
+def create_backend(backend_name, model_path, convert=True, num_threads=None):
+    """
+    Builds an inference backend for the emotion model.
+
+    Args:
+        backend_name: 'auto', 'keras', 'tflite', 'onnxruntime' or 'opencv'.
+        model_path: Path to the source model. A .h5 file is converted once to
+            the format the backend needs; a .tflite/.onnx file is used as-is.
+        convert: Allow converting the .h5 when no up-to-date artifact exists.
+        num_threads: Optional CPU thread count for runtimes that support it.
+
+    With 'auto', backends are tried in AUTO_BACKEND_ORDER and the first one
+    that loads is returned; the Keras backend is the final fallback.
+    """
+    if backend_name != 'auto':
+        return _create(backend_name, _resolve_model_path(backend_name, model_path, convert), num_threads)
+
+    if not model_path.endswith('.h5'):
+        return _create(_backend_for_path(model_path), model_path, num_threads)
+
+    for candidate in AUTO_BACKEND_ORDER:
+        if not _runtime_available(candidate):
+            print(f"Info: Inference backend '{candidate}' skipped: runtime not installed.")
+            continue
+        try:
+            backend = _create(candidate, _resolve_model_path(candidate, model_path, convert), num_threads)
+            print(f"Inference backend selected: {candidate}")
+            return backend
+        except Exception as e:
+            print(f"Info: Inference backend '{candidate}' unavailable: {type(e).__name__}: {e}")
+            if candidate == AUTO_BACKEND_ORDER[-1]:
+                traceback.print_exc()
+                raise
+    raise RuntimeError("No inference backend could be loaded. Install tensorflow, tflite-runtime or onnxruntime.")
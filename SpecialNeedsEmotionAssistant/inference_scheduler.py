@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _PendingRequest:
+    __slots__ = ('rois', 'future', 'enqueued_at')
+
+    def __init__(self, rois):
+        self.rois = rois
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class InferenceScheduler:
+    """
+    Dynamic micro-batching in front of a predict function.
+
+    Request threads submit their face ROIs and wait on a Future. A single worker
+    thread takes the first waiting request, keeps collecting more for up to
+    max_wait_ms (or until max_batch_size ROIs are gathered), runs one batched
+    forward pass and hands each request its slice of the predictions.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, stats_window=1000):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stopped = False
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._wait_times = deque(maxlen=stats_window)
+        self.total_batches = 0
+        self.total_requests = 0
+        self.total_rois = 0
+
+        self._worker = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+        self._worker.start()
+        print(f"Inference scheduler started (max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms})")
+
+    def submit(self, rois):
+        """Queues a (N, 48, 48, 1) ROI batch and returns a Future for its (N, 7) predictions."""
+        if self._stopped:
+            raise RuntimeError("Inference scheduler has been stopped")
+        request = _PendingRequest(rois)
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, rois):
+        """Blocking helper with the same signature as InferenceBackend.predict."""
+        return self.submit(rois).result()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        pending = [first]
+        roi_count = len(first.rois)
+        deadline = time.monotonic() + self.max_wait
+        while roi_count < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            pending.append(request)
+            roi_count += len(request.rois)
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            if pending is None:
+                return
+
+            started = time.monotonic()
+            try:
+                predictions = self.predict_fn(np.concatenate([p.rois for p in pending], axis=0))
+            except Exception as e:
+                print(f"Error during batched prediction: {e}")
+                traceback.print_exc()
+                for p in pending:
+                    p.future.set_exception(e)
+                continue
+
+            offset = 0
+            for p in pending:
+                p.future.set_result(predictions[offset:offset + len(p.rois)])
+                offset += len(p.rois)
+
+            with self._stats_lock:
+                self.total_batches += 1
+                self.total_requests += len(pending)
+                self.total_rois += offset
+                self._batch_sizes.append(offset)
+                self._wait_times.extend(started - p.enqueued_at for p in pending)
+
+    def stats(self):
+        """Returns queue depth plus batch-size and wait-time figures over the recent window."""
+        with self._stats_lock:
+            batch_sizes = np.array(self._batch_sizes, dtype=np.float64)
+            wait_ms = np.array(self._wait_times, dtype=np.float64) * 1000.0
+            return {
+                'queue_depth': self._queue.qsize(),
+                'total_batches': self.total_batches,
+                'total_requests': self.total_requests,
+                'total_rois': self.total_rois,
+                'batch_size_mean': float(batch_sizes.mean()) if batch_sizes.size else 0.0,
+                'batch_size_max': int(batch_sizes.max()) if batch_sizes.size else 0,
+                'wait_ms_mean': float(wait_ms.mean()) if wait_ms.size else 0.0,
+                'wait_ms_p95': float(np.percentile(wait_ms, 95)) if wait_ms.size else 0.0,
+            }
+
+    def stop(self, timeout=2.0):
+        """Stops the worker once the requests already queued have been served."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._queue.put(None)
+        self._worker.join(timeout)
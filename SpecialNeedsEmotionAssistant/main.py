@@ -2,18 +2,20 @@
 
 import cv2
 import time
-import pandas as pd
 from pygame import mixer
 try:
-    from emotion_detector import EmotionDetector
+    from emotion_detector import EmotionDetector, EMOTION_LABELS
 except ImportError:
     print("ERROR: Cannot find emotion_detector.py in the same folder as main.py")
     import sys 
     sys.exit(1)
+from session_store import SessionStore, PracticeSession
+from instrumentation import stage_timer, record_stage_error, FACES_DETECTED
+from event_log import EventLogger
+from frame_gate import FrameGate
 import pyttsx3
 import os
 import threading
-from collections import deque
 import sys
 import random
 import json 
@@ -24,53 +26,146 @@ class EmotionLearningTool:
     Provides backend logic for an emotion learning web application.
     Manages resources and provides methods for learning, practice, and quizzes.
     Includes backend smoothing for practice mode detections.
+
+    Startup is staged: emojis and learning content (all the learn and quiz
+    pages need) load synchronously, while the emotion detector, the pygame
+    mixer and the TTS engine load concurrently in background threads. Practice
+    frames are answered with {"loading": True} until is_ready(); with
+    background_load=False the constructor waits for them (and raises if the
+    detector fails). startup_timings records how long each stage took.
     """
-    def __init__(self, confidence_threshold=0.25, history_len=7): 
+    def __init__(self, confidence_threshold=0.25, history_len=7, inference_backend='auto',
+                 max_sessions=5000, session_ttl=600, micro_batch_wait_ms=0, max_batch_size=32,
+                 face_detector='haar', detect_every=1, detection_scale=1.0, model_filename=None,
+                 emotion_model='baseline', practice_log_sample_rate=1.0, inference_threads=None,
+                 background_load=True, frame_diff_threshold=0.0, face_diff_threshold=0.0, max_result_reuse=15): 
         print("Initializing Emotion Learning Tool Backend...")
+        self._startup_start = time.perf_counter()
+        self.startup_timings = {}
+        self.detector_ready = threading.Event()
+        self.detector_error = None
         self.detector = None
         self.engine = None
         self.sounds = {}
         self.emojis = {}
         self.learning_content = {}
+        # Bumped whenever learning_content changes, so cached API payloads are rebuilt.
+        self.content_version = 0
 
         self.confidence_threshold = confidence_threshold
         self.padding_ratio = 0.1
         self.history_len = history_len 
-
-        self.prediction_history = deque(maxlen=self.history_len)
-        self.last_stable_emotion = 'Neutral'
+        self.inference_backend = inference_backend
+        self.micro_batch_wait_ms = micro_batch_wait_ms
+        self.max_batch_size = max_batch_size
+        self.face_detector = face_detector
+        self.detect_every = detect_every
+        self.detection_scale = detection_scale
+        self.model_filename = model_filename
+        self.emotion_model = emotion_model
+        self.practice_log_sample_rate = practice_log_sample_rate
+        self.inference_threads = inference_threads
+        # Change gating (see frame_gate.py): thresholds in grey levels, 0 disables that level.
+        self.frame_gate = None
+        if frame_diff_threshold > 0 or face_diff_threshold > 0:
+            self.frame_gate = FrameGate(frame_threshold=frame_diff_threshold, face_threshold=face_diff_threshold,
+                                        max_reuse=max_result_reuse)
+
+        # Smoothing state is kept per practice session so concurrent learners don't share a window.
+        self.sessions = SessionStore(
+            lambda: PracticeSession(self.history_len),
+            max_sessions=max_sessions,
+            ttl_seconds=session_ttl
+        )
 
      
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         self.assets_path = os.path.join(self.script_dir, 'assets')
         self.project_root = os.path.dirname(self.script_dir)
         self.log_dir = os.path.join(self.project_root, 'logs')
-        self.log_path = os.path.join(self.log_dir, 'learning_tool_log.csv')
-
-        
-        self._load_detector()
-        self._load_assets() 
-        self._initialize_mixer()
-        self._initialize_tts()
-        self._load_learning_content()
-
-  
-        self.log = []
-        os.makedirs(self.log_dir, exist_ok=True)
-        print(f"Log file will be saved to: {self.log_path}")
-        print("Emotion Learning Tool Backend Initialized Successfully.")
+        self.log_path = os.path.join(self.log_dir, 'learning_tool_log.jsonl')
+
+        # Events are appended by a background writer; per-frame practice events can be sampled.
+        self.event_logger = EventLogger(
+            self.log_path,
+            sample_rates={'practice_detection_smoothed': self.practice_log_sample_rate}
+        )
+        print(f"Events are logged to: {self.log_path}")
+
+        self._run_startup_stage('assets', self._load_assets)
+        self._run_startup_stage('learning_content', self._load_learning_content)
+        self.startup_timings['content_ready'] = time.perf_counter() - self._startup_start
+
+        self._startup_threads = [
+            threading.Thread(target=self._run_startup_stage, args=(name, target), name=f'startup-{name}', daemon=True)
+            for name, target in (('detector', self._load_detector),
+                                 ('audio', self._initialize_mixer),
+                                 ('tts', self._initialize_tts))
+        ]
+        for thread in self._startup_threads:
+            thread.start()
+        self._startup_monitor = threading.Thread(target=self._report_startup, name='startup-report', daemon=True)
+        self._startup_monitor.start()
+
+        if not background_load:
+            self.wait_for_startup()
+            if self.detector_error is not None:
+                raise self.detector_error
+        print("Emotion Learning Tool Backend Initialized Successfully."
+              + (" Detector loading in background." if not self.is_ready() else ""))
+
+    def _run_startup_stage(self, name, target):
+        start = time.perf_counter()
+        try:
+            target()
+        except Exception as e:
+            # A detector failure is reported through is_ready()/detector_error rather than
+            # killing the server; audio and TTS already fall back to disabled on their own.
+            if name != 'detector':
+                raise
+            self.detector_error = e
+        finally:
+            self.startup_timings[name] = time.perf_counter() - start
+
+    def _report_startup(self):
+        for thread in self._startup_threads:
+            thread.join()
+        self.startup_timings['total'] = time.perf_counter() - self._startup_start
+        stages = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in self.startup_timings.items())
+        print(f"Backend startup complete: {stages}")
+
+    def wait_for_startup(self, timeout=None):
+        """Waits for the background startup stages. Returns is_ready()."""
+        self._startup_monitor.join(timeout)
+        return self.is_ready()
+
+    def is_ready(self):
+        """True once the emotion detector is loaded and practice frames can be processed."""
+        return self.detector_ready.is_set()
 
     def _load_detector(self):
         try:
             self.detector = EmotionDetector(
                 padding_ratio=self.padding_ratio,
-                confidence_threshold=self.confidence_threshold 
+                confidence_threshold=self.confidence_threshold,
+                backend=self.inference_backend,
+                num_threads=self.inference_threads,
+                face_detector=self.face_detector,
+                detect_every=self.detect_every,
+                detection_scale=self.detection_scale,
+                model_filename=self.model_filename,
+                model=self.emotion_model,
+                frame_gate=self.frame_gate
             )
            
             if not hasattr(self.detector, 'model_filename'):
                 
                  self.detector.model_filename = "emotion_model_augmented_weighted.h5"
             print(f"Emotion Detector loaded using model: {self.detector.model_filename}")
+            if self.micro_batch_wait_ms > 0:
+                self.detector.enable_micro_batching(max_batch_size=self.max_batch_size, max_wait_ms=self.micro_batch_wait_ms)
+            self.startup_timings['detector_ready'] = time.perf_counter() - self._startup_start
+            self.detector_ready.set()
         except FileNotFoundError as e: print(f"FATAL ERROR loading detector: {e}"); raise
         except Exception as e: print(f"FATAL ERROR loading detector: {e}"); raise
 
@@ -95,15 +190,9 @@ class EmotionLearningTool:
         """Loads emoji assets."""
         emoji_folder = os.path.join(self.assets_path, 'emojis')
         self.emojis = {}
-        
-        if not self.detector:
-             print("Error: Detector not loaded before loading assets. Cannot get emotion labels.")
-             all_possible_emotions = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral'] # Fallback
-        else:
-             all_possible_emotions = getattr(self.detector, 'emotion_labels', ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral'])
 
         print("Loading emojis...")
-        for emotion in all_possible_emotions:
+        for emotion in EMOTION_LABELS:
             filename = f"{emotion.lower()}.png"
             path = os.path.join(emoji_folder, filename)
             if os.path.exists(path):
@@ -120,27 +209,25 @@ class EmotionLearningTool:
             return 
 
         sound_folder = os.path.join(self.assets_path, 'sounds')
-        self.sounds = {}
-
-        if not self.detector:
-             print("Error: Detector not loaded before loading sounds. Cannot get emotion labels.")
-             all_possible_emotions = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral'] # Fallback
-        else:
-            all_possible_emotions = getattr(self.detector, 'emotion_labels', ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral'])
+        sounds = {}
 
-       
         sound_mapping = {'Neutral': 'neutral.mp3'} 
 
         print("Loading sounds...")
-        for emotion in all_possible_emotions:
+        for emotion in EMOTION_LABELS:
             filename = sound_mapping.get(emotion, f"{emotion.lower()}.mp3")
             path = os.path.join(sound_folder, filename)
             if os.path.exists(path):
                 try:
-                     self.sounds[emotion] = mixer.Sound(path)
+                     sounds[emotion] = mixer.Sound(path)
                 except Exception as e:
                      print(f"Warning: Could not load sound '{path}' for {emotion}. Error: {e}")
-           
+
+        # Sounds load in the background, after the learning content was built.
+        self.sounds = sounds
+        for emotion, content in self.learning_content.items():
+            content['sound_available'] = emotion in sounds
+        self.content_version += 1
         print(f"Loaded sounds for: {list(self.sounds.keys())}")
 
     def _load_learning_content(self):
@@ -170,14 +257,8 @@ class EmotionLearningTool:
            
 
         print(f"Found potential content folders: {emotions_with_folders}")
-        if not self.detector:
-             print("Error: Detector not loaded before loading learning content. Cannot get emotion labels.")
-             model_labels = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral'] 
-        else:
-             model_labels = getattr(self.detector, 'emotion_labels', ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral'])
 
-        
-        for emotion in model_labels:
+        for emotion in EMOTION_LABELS:
             emotion_data = descriptions_data.get(emotion, {})
             description_text = emotion_data.get("description", f"This is {emotion}.") 
             key_features_list = emotion_data.get("key_features", [])
@@ -201,6 +282,7 @@ class EmotionLearningTool:
                 "sound_available": emotion in self.sounds
             }
 
+        self.content_version += 1
         print(f"Loaded learning content for: {list(self.learning_content.keys())}")
 
     def get_learn_data(self, emotion_name):
@@ -257,60 +339,52 @@ class EmotionLearningTool:
             "correct_emoji_path": correct_emoji_path
         }
 
-    def process_practice_frame(self, frame_data):
-        """Processes a frame for practice mode, applying smoothing."""
-        if self.detector is None: return {"error": "Detector not loaded."}
+    def process_practice_frame(self, frame_data, session_id='default'):
+        """Processes a frame for practice mode, applying per-session smoothing."""
+        if not self.is_ready():
+            if self.detector_error is not None:
+                return {"error": "Detector failed to load."}
+            return {"error": "Detector is still loading.", "loading": True}
         if frame_data is None or not isinstance(frame_data, np.ndarray) or frame_data.size == 0:
             return {"error": "Invalid frame data received."}
 
+        session = self.sessions.get(session_id)
         raw_emotion_label = None
-        smoothed_emotion = self.last_stable_emotion 
 
         try:
-            detection_results = self.detector.detect_emotion(frame_data)
+            detection_results = self.detector.detect_emotion(frame_data, stream_state=session.detector_state)
+            FACES_DETECTED.inc(len(detection_results))
 
             if detection_results:
         
                 _box, raw_emotion_label, _confidence = detection_results[0]
-                self.prediction_history.append(raw_emotion_label)
-            else:
-                
-                self.prediction_history.append(None) 
-
-            
-            valid_history = [e for e in self.prediction_history if e is not None]
-
-           
-            if len(valid_history) >= max(2, self.history_len // 2 + 1): 
-                 try:
-                     
-                     smoothed_emotion = max(set(valid_history), key=valid_history.count)
-                 except ValueError:
-                   
-                     smoothed_emotion = self.last_stable_emotion
-            else:
-                 smoothed_emotion = self.last_stable_emotion
 
-            self.last_stable_emotion = smoothed_emotion
+            with stage_timer('smoothing'):
+                smoothed_emotion = session.smooth(raw_emotion_label)
 
             result = {
                 'emotion': smoothed_emotion,
                 'emoji_path': self.emojis.get(smoothed_emotion),
                 'sound_available': smoothed_emotion in self.sounds
             }
-            self.log_event('practice_detection_smoothed', {'raw': raw_emotion_label, 'smoothed': smoothed_emotion})
+            self.log_event('practice_detection_smoothed', {'session': session_id, 'raw': raw_emotion_label, 'smoothed': smoothed_emotion})
             return result
 
         except Exception as e:
+            record_stage_error('process_frame')
             print(f"Error during practice frame processing: {e}"); import traceback; traceback.print_exc()
           
             return {
-                'emotion': self.last_stable_emotion,
-                'emoji_path': self.emojis.get(self.last_stable_emotion),
-                'sound_available': self.last_stable_emotion in self.sounds,
+                'emotion': session.last_stable_emotion,
+                'emoji_path': self.emojis.get(session.last_stable_emotion),
+                'sound_available': session.last_stable_emotion in self.sounds,
                 'error': f"Processing error occurred"
             }
 
+    def end_practice_session(self, session_id):
+        """Discards the smoothing state of a practice session."""
+        return self.sessions.pop(session_id) is not None
+
     def play_sound(self, emotion_name):
         """Plays the loaded sound cue for the given emotion."""
         if mixer.get_init() and isinstance(emotion_name, str) and emotion_name in self.sounds:
@@ -366,38 +440,45 @@ class EmotionLearningTool:
              print(f"Generic error in TTS thread: {e}")
 
     def log_event(self, event_type, data):
-        """Adds an event to the internal log list."""
-        try:
-            serializable_data = json.loads(json.dumps(data, default=str))
-            log_entry = {
-                'timestamp': pd.Timestamp.now().isoformat(),
-                'event_type': event_type,
-                'data': serializable_data
-            }
-            self.log.append(log_entry)
-        except Exception as e:
-            print(f"Error preparing log entry: {e}")
+        """Queues an event for the background log writer (serialised off the request path)."""
+        self.event_logger.log(event_type, data)
 
     def save_log(self):
-        """Saves the internal log list to a CSV file."""
-        if not self.log:
-            print("No new log entries to save.")
-            return
-
-        print("Saving log file...")
-        try:
-            log_df = pd.DataFrame(self.log)
-            os.makedirs(self.log_dir, exist_ok=True)
-            write_header = not os.path.exists(self.log_path)
-            log_df.to_csv(self.log_path, index=False, mode='a', header=write_header)
-            print(f"Log data saved to {self.log_path}")
-            self.log = [] 
-        except Exception as e:
-            print(f"Error saving log file: {e}")
+        """Waits for queued events to be written to the JSON-lines log."""
+        if not self.event_logger.flush():
+            print(f"Warning: event log flush timed out: {self.event_logger.stats()}")
+
+    def get_inference_stats(self):
+        """Returns micro-batching scheduler metrics, or None when batching is disabled."""
+        if self.detector is None or self.detector.scheduler is None:
+            return None
+        return self.detector.scheduler.stats()
+
+    def get_frame_gate_stats(self):
+        """Returns change-gate hit/miss counts and hit rates, or None when gating is disabled."""
+        if self.frame_gate is None:
+            return None
+        return self.frame_gate.stats()
+
+    def active_session_count(self):
+        """Number of practice sessions currently holding smoothing state."""
+        return len(self.sessions)
+
+    def after_fork(self):
+        """
+        Called in each worker process forked from a preloading server (see
+        gunicorn.conf.py): restarts the threads that do not survive fork() and
+        reloads the inference backend if it cannot be shared copy-on-write.
+        """
+        if self.detector is not None:
+            self.detector.after_fork()
+        self.event_logger.after_fork()
 
     def shutdown(self):
         """Cleans up resources (mixer, save logs)."""
         print("Shutting down Emotion Learning Tool Backend...")
+        if self.detector is not None:
+            self.detector.disable_micro_batching()
         if self.engine:
             try:
                 self.engine.stop() 
@@ -409,7 +490,8 @@ class EmotionLearningTool:
                 print("Pygame mixer quit.")
             except Exception as e:
                  print(f"Error quitting mixer: {e}")
-        self.save_log()
+        self.event_logger.close()
+        print(f"Event log closed: {self.event_logger.stats()}")
         print("Backend shutdown complete.")
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class PracticeSession:
+    """Smoothing state for one learner's practice stream."""
+    __slots__ = ('prediction_history', 'last_stable_emotion', 'last_seen', 'detector_state')
+
+    def __init__(self, history_len):
+        self.prediction_history = deque(maxlen=history_len)
+        self.last_stable_emotion = 'Neutral'
+        # Per-stream state for detectors that track faces across frames.
+        self.detector_state = {}
+        self.last_seen = time.monotonic()
+
+    def smooth(self, raw_emotion_label):
+        """
+        Records one raw prediction (None when no face was found) and returns the
+        majority emotion over the history window. The previous stable emotion
+        is kept until enough frames in the window have a face.
+        """
+        self.prediction_history.append(raw_emotion_label)
+        valid_history = [e for e in self.prediction_history if e is not None]
+        if len(valid_history) >= max(2, self.prediction_history.maxlen // 2 + 1):
+            self.last_stable_emotion = max(set(valid_history), key=valid_history.count)
+        return self.last_stable_emotion
+
+
+class SessionStore:
+    """
+    Bounded LRU store of per-session state with idle-time expiry.
+
+    Entries are kept in least-recently-used order, so both the capacity limit
+    and the TTL are enforced by popping from the front of an OrderedDict:
+    get() is O(1) amortised and memory never exceeds max_sessions entries.
+    """
+
+    def __init__(self, factory, max_sessions=5000, ttl_seconds=600):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, session_id):
+        """Returns the state for session_id, creating it if it is new or has expired."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is not None and now - state.last_seen > self.ttl_seconds:
+                del self._sessions[session_id]
+                self.evictions += 1
+                state = None
+            if state is None:
+                state = self.factory()
+                self._sessions[session_id] = state
+            else:
+                self._sessions.move_to_end(session_id)
+            state.last_seen = now
+            self._evict(now)
+            return state
+
+    def pop(self, session_id):
+        """Drops a session's state, e.g. when the learner stops the camera."""
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def _evict(self, now):
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - oldest.last_seen > self.ttl_seconds:
+                del self._sessions[oldest_id]
+                self.evictions += 1
+            else:
+                break
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
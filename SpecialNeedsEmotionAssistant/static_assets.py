@@ -0,0 +1,91 @@
+"""
+HTTP caching helpers for the static assets and the learn/quiz API.
+
+StaticAssetVersions gives every file under the static folder a short content
+hash. app.py appends it to each url_for('static', ...) URL as ?v=<hash>, and
+serves versioned URLs with a far-future immutable Cache-Control. Any change
+to a file changes its URL, so browsers never need to revalidate.
+
+PrecomputedJSON holds a response body serialised once, together with its
+strong ETag, so repeated requests cost a dict lookup. A matching
+If-None-Match gets a 304 with no body.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from flask import Response
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unversioned URLs and API payloads may change, so clients revalidate them (cheap with ETags).
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+class StaticAssetVersions:
+    """Content hash per static file, computed on first use and then cached."""
+
+    def __init__(self, static_folder, hash_length=12):
+        self.static_folder = os.path.abspath(static_folder)
+        self.hash_length = hash_length
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def version(self, filename):
+        """Returns the content hash of filename (relative to the static folder), or None if it does not exist."""
+        try:
+            return self._versions[filename]
+        except KeyError:
+            pass
+        path = os.path.abspath(os.path.join(self.static_folder, filename))
+        digest = None
+        if path.startswith(self.static_folder + os.sep) and os.path.isfile(path):
+            sha = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 16), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()[:self.hash_length]
+        with self._lock:
+            self._versions[filename] = digest
+        return digest
+
+    def clear(self):
+        """Forgets every hash, e.g. after assets were regenerated on disk."""
+        with self._lock:
+            self._versions.clear()
+
+
+class PrecomputedJSON:
+    """A JSON response body serialised once, with a strong ETag."""
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.sha256(self.body).hexdigest()[:20]
+
+    def response(self, request, cache_control=REVALIDATE_CACHE_CONTROL):
+        response = Response(self.body, mimetype='application/json')
+        response.set_etag(self.etag)
+        response.headers['Cache-Control'] = cache_control
+        return response.make_conditional(request)
+
+
+class PrecomputedResponses:
+    """
+    A dict of PrecomputedJSON built by build() and rebuilt only when the key
+    passed to get() changes (e.g. the learning content version).
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._key = None
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if key != self._key:
+            with self._lock:
+                if key != self._key:
+                    self._responses = {name: PrecomputedJSON(payload) for name, payload in self._build().items()}
+                    self._key = key
+        return self._responses
@@ -0,0 +1,327 @@
+"""
+Offline emotion analysis of recorded sessions (video files or image folders).
+
+Every input is split into chunks of --chunk-frames frames. A process pool
+decodes the chunks in parallel, and each worker runs its frames through its
+own EmotionDetector in batches of --batch-frames. The output directory gets
+two timelines:
+
+    faces.csv / faces.parquet    one row per detected face: source, frame, time,
+                                 box, emotion, confidence
+    frames.csv / frames.parquet  one row per analysed frame: face count plus the
+                                 emotion of the largest face
+
+Finished chunks are written to <output>/parts/ as they complete, so an
+interrupted run resumes where it stopped when started again with the same
+settings (--restart discards earlier parts). --stride N analyses every Nth
+frame. Throughput in frames/s is reported while running and in summary.json.
+
+    python analyze_recordings.py recordings/*.mp4 snapshots/ --output analysis --stride 5 --workers 4
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+sna_path = os.path.join(project_root, 'SpecialNeedsEmotionAssistant')
+if sna_path not in sys.path:
+    sys.path.insert(0, sna_path)
+
+import cv2
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v', '.mpg', '.mpeg')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+FACE_COLUMNS = ['source', 'frame', 'timestamp_s', 'image', 'face', 'x', 'y', 'w', 'h', 'emotion', 'confidence']
+FRAME_COLUMNS = ['source', 'frame', 'timestamp_s', 'image', 'faces', 'emotion', 'confidence']
+# Settings that change the parts; a resumed run must use the same ones.
+RUN_SETTINGS = ('stride', 'chunk_frames', 'backend', 'model', 'model_file', 'face_detector', 'detection_scale',
+                'confidence_threshold')
+
+
+def find_sources(paths):
+    """
+    Expands the inputs into sources: each video file is one source, and the
+    images directly inside a directory form one image-sequence source.
+    """
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.listdir(path))
+            images = [os.path.join(path, n) for n in names if n.lower().endswith(IMAGE_EXTENSIONS)]
+            if images:
+                sources.append({'path': os.path.abspath(path), 'kind': 'images', 'images': images, 'fps': None,
+                                'frame_count': len(images)})
+            for name in names:
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    sources.append(video_source(os.path.join(path, name)))
+        elif os.path.isfile(path):
+            sources.append(video_source(path))
+        else:
+            print(f"Warning: skipping {path}: not found")
+    return sources
+
+
+def video_source(path):
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        print(f"Warning: could not open video {path}")
+        frame_count, fps = 0, None
+    else:
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or None
+    capture.release()
+    return {'path': os.path.abspath(path), 'kind': 'video', 'fps': fps, 'frame_count': max(0, frame_count)}
+
+
+def plan_chunks(source, chunk_frames):
+    """
+    (start, end) frame ranges for a source. The last range of a video is
+    open-ended (end None), since container frame counts can be inaccurate.
+    """
+    count = source['frame_count']
+    if source['kind'] == 'video' and count <= 0:
+        return [(0, None)]
+    starts = list(range(0, count, chunk_frames)) or [0]
+    chunks = [(start, min(start + chunk_frames, count)) for start in starts]
+    if source['kind'] == 'video':
+        chunks[-1] = (chunks[-1][0], None)
+    return chunks
+
+
+def part_path(parts_dir, source, start):
+    digest = hashlib.sha1(source['path'].encode('utf-8')).hexdigest()[:12]
+    return os.path.join(parts_dir, f'{digest}_{start:09d}.csv')
+
+
+_detector = None
+
+
+def _init_worker(detector_kwargs):
+    global _detector
+    # One inference thread per process; the pool provides the parallelism.
+    cv2.setNumThreads(1)
+    from emotion_detector import EmotionDetector
+    _detector = EmotionDetector(num_threads=1, **detector_kwargs)
+
+
+def _iter_frames(source, start, end, stride):
+    """Yields (frame_index, frame, image_name) for every stride-th frame of [start, end)."""
+    first = start + (-start) % stride
+    if source['kind'] == 'images':
+        for index in range(first, end, stride):
+            frame = cv2.imread(source['images'][index])
+            yield index, frame, os.path.basename(source['images'][index])
+        return
+    capture = cv2.VideoCapture(source['path'])
+    try:
+        if first > 0:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, first)
+        index = first
+        while end is None or index < end:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield index, frame, ''
+            # grab() skips frames without converting them.
+            for _ in range(stride - 1):
+                index += 1
+                if (end is not None and index >= end) or not capture.grab():
+                    return
+            index += 1
+    finally:
+        capture.release()
+
+
+def analyse_chunk(source, start, end, stride, batch_frames, output_path):
+    """Worker: classifies one chunk and writes its face rows to output_path. Returns (frames, faces, seconds)."""
+    started = time.perf_counter()
+    rows = []
+    frames_done = 0
+    batch = []
+
+    def flush():
+        results = _detector.detect_emotion_batch([frame for _, frame, _ in batch])
+        for (index, _frame, image), faces in zip(batch, results):
+            timestamp = f"{index / source['fps']:.3f}" if source['fps'] else ''
+            if not faces:
+                rows.append([source['path'], index, timestamp, image, -1, '', '', '', '', '', ''])
+            for face_index, ((x, y, w, h), label, confidence) in enumerate(faces):
+                rows.append([source['path'], index, timestamp, image, face_index, x, y, w, h, label,
+                             f'{confidence:.4f}'])
+        batch.clear()
+
+    for index, frame, image in _iter_frames(source, start, end, stride):
+        if frame is None:
+            print(f"Warning: could not decode frame {index} of {source['path']}")
+            continue
+        batch.append((index, frame, image))
+        frames_done += 1
+        if len(batch) >= batch_frames:
+            flush()
+    if batch:
+        flush()
+
+    # Written under a temporary name and renamed, so a part file is always complete.
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FACE_COLUMNS)
+        writer.writerows(rows)
+    os.replace(tmp_path, output_path)
+    return frames_done, sum(1 for row in rows if row[4] != -1), time.perf_counter() - started
+
+
+def prepare_output(output_dir, settings, restart):
+    """Creates the output directory, or checks that an existing run used the same settings."""
+    parts_dir = os.path.join(output_dir, 'parts')
+    settings_path = os.path.join(output_dir, 'run.json')
+    if restart and os.path.isdir(parts_dir):
+        shutil.rmtree(parts_dir)
+    if os.path.exists(settings_path) and os.path.isdir(parts_dir):
+        with open(settings_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        if previous != settings:
+            changed = [k for k in settings if previous.get(k) != settings[k]]
+            print(f"Error: {output_dir} holds a run with different settings ({', '.join(changed)}). "
+                  f"Use --restart to discard it or choose another --output.")
+            sys.exit(1)
+    os.makedirs(parts_dir, exist_ok=True)
+    with open(settings_path, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, indent=2)
+    return parts_dir
+
+
+def merge_parts(part_files, output_dir, output_format):
+    """Combines the part files into the per-face and per-frame timelines."""
+    import pandas as pd
+    parts = [pd.read_csv(path, keep_default_na=False) for path in part_files]
+    faces = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=FACE_COLUMNS)
+    faces = faces.sort_values(['source', 'frame', 'face'], kind='stable').reset_index(drop=True)
+
+    detected = faces[faces['face'] != -1].copy()
+    detected[['x', 'y', 'w', 'h']] = detected[['x', 'y', 'w', 'h']].astype(int)
+    detected['confidence'] = detected['confidence'].astype(float)
+    detected['area'] = detected['w'].astype(float) * detected['h'].astype(float)
+    largest = detected.sort_values('area', ascending=False, kind='stable').drop_duplicates(['source', 'frame'])
+    frames = faces.drop_duplicates(['source', 'frame'])[['source', 'frame', 'timestamp_s', 'image']]
+    counts = detected.groupby(['source', 'frame']).size().rename('faces').reset_index()
+    frames = frames.merge(counts, on=['source', 'frame'], how='left')
+    frames = frames.merge(largest[['source', 'frame', 'emotion', 'confidence']], on=['source', 'frame'], how='left')
+    frames['faces'] = frames['faces'].fillna(0).astype(int)
+    frames = frames[FRAME_COLUMNS].sort_values(['source', 'frame']).reset_index(drop=True)
+    faces = detected[FACE_COLUMNS].reset_index(drop=True)
+
+    written = []
+    for name, table in (('faces', faces), ('frames', frames)):
+        path = os.path.join(output_dir, f'{name}.{output_format}')
+        if output_format == 'parquet':
+            table.to_parquet(path, index=False)
+        else:
+            table.to_csv(path, index=False)
+        written.append(path)
+    return written, len(frames), len(faces)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help="Video files and/or directories of images or videos")
+    parser.add_argument('--output', default='analysis', help="Output directory")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="Timeline format (parquet needs pyarrow)")
+    parser.add_argument('--stride', type=int, default=1, help="Analyse every Nth frame")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--chunk-frames', type=int, default=300, help="Frames per work unit (the resume granularity)")
+    parser.add_argument('--batch-frames', type=int, default=16, help="Frames per detector batch within a worker")
+    parser.add_argument('--restart', action='store_true', help="Discard progress from an earlier run")
+    parser.add_argument('--backend', default='auto', help="Inference backend (auto, keras, tflite, onnxruntime, opencv)")
+    parser.add_argument('--model', default='baseline', help="Named model ('baseline' or 'student')")
+    parser.add_argument('--model-file', help="Model file in pretrained_models/ (overrides --model)")
+    parser.add_argument('--face-detector', default='haar', help="haar, yunet or ssd")
+    parser.add_argument('--detection-scale', type=float, default=1.0)
+    parser.add_argument('--confidence-threshold', type=float, default=0.30)
+    args = parser.parse_args()
+
+    if args.stride < 1 or args.chunk_frames < 1 or args.batch_frames < 1:
+        parser.error("--stride, --chunk-frames and --batch-frames must be at least 1")
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("Error: --format parquet needs pyarrow (pip install pyarrow).")
+            sys.exit(1)
+
+    sources = find_sources(args.inputs)
+    if not sources:
+        print("Error: no videos or images found.")
+        sys.exit(1)
+    settings = {key: getattr(args, key) for key in RUN_SETTINGS}
+    parts_dir = prepare_output(args.output, settings, args.restart)
+
+    tasks = []
+    skipped = 0
+    for source in sources:
+        for start, end in plan_chunks(source, args.chunk_frames):
+            path = part_path(parts_dir, source, start)
+            if os.path.exists(path):
+                skipped += 1
+            else:
+                tasks.append((source, start, end, path))
+    all_parts = [part_path(parts_dir, s, start) for s in sources for start, _ in plan_chunks(s, args.chunk_frames)]
+    print(f"{len(sources)} sources, {len(all_parts)} chunks ({skipped} already done), {args.workers} workers, "
+          f"stride {args.stride}")
+
+    detector_kwargs = dict(backend=args.backend, model=args.model, model_filename=args.model_file,
+                           face_detector=args.face_detector, detection_scale=args.detection_scale,
+                           confidence_threshold=args.confidence_threshold)
+    started = time.perf_counter()
+    frames_done = faces_done = failed = 0
+    busy_seconds = 0.0
+    if tasks:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(detector_kwargs,)) as pool:
+            futures = {pool.submit(analyse_chunk, source, start, end, args.stride, args.batch_frames, path):
+                       (source['path'], start) for source, start, end, path in tasks}
+            for done, future in enumerate(as_completed(futures), 1):
+                source_path, start = futures[future]
+                try:
+                    frames, faces, seconds = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Error analysing {source_path} from frame {start}: {type(e).__name__}: {e}")
+                    continue
+                frames_done += frames
+                faces_done += faces
+                busy_seconds += seconds
+                elapsed = time.perf_counter() - started
+                print(f"[{done}/{len(tasks)}] {os.path.basename(source_path)} @ {start}: {frames} frames, "
+                      f"{faces} faces | {frames_done / elapsed:.1f} frames/s overall")
+    elapsed = time.perf_counter() - started
+
+    if failed:
+        print(f"{failed} chunks failed; run the same command again to retry them.")
+    finished_parts = [path for path in all_parts if os.path.exists(path)]
+    written, frame_rows, face_rows = merge_parts(finished_parts, args.output, args.format)
+    throughput = frames_done / elapsed if elapsed > 0 and frames_done else 0.0
+    # Excludes worker start-up (model loading), which dominates short runs.
+    per_worker = frames_done / busy_seconds if busy_seconds > 0 else 0.0
+    print(f"Analysed {frames_done} frames in {elapsed:.1f}s ({throughput:.1f} frames/s, "
+          f"{per_worker:.1f} frames/s per busy worker) this run; timelines: {frame_rows} frames, {face_rows} faces")
+    for path in written:
+        print(f"Saved {path}")
+
+    with open(os.path.join(args.output, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'sources': [s['path'] for s in sources], 'settings': settings, 'workers': args.workers,
+            'chunks': len(all_parts), 'chunks_resumed': skipped, 'chunks_failed': failed,
+            'frames_this_run': frames_done, 'faces_this_run': faces_done, 'seconds_this_run': elapsed,
+            'frames_per_sec': throughput, 'frames_per_sec_per_worker': per_worker, 'timeline_frames': frame_rows, 'timeline_faces': face_rows,
+        }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
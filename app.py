@@ -1,11 +1,14 @@
-from flask import Flask, jsonify, render_template, request, url_for
+from flask import Flask, Response, g, jsonify, render_template, request, send_file, send_from_directory, url_for
 import sys
 import os
 import base64
 import numpy as np
 import cv2
 import time
+import json
+import mimetypes
 import atexit
+import threading
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sna_path = os.path.join(script_dir, 'SpecialNeedsEmotionAssistant')
@@ -15,6 +18,12 @@ if sna_path not in sys.path:
 try:
    
     from main import EmotionLearningTool
+    from frame_codec import decode_frame_bytes
+    from static_assets import (StaticAssetVersions, PrecomputedResponses, IMMUTABLE_CACHE_CONTROL,
+                               REVALIDATE_CACHE_CONTROL)
+    from asset_cache import AssetCache, DEFAULT_IMAGE_WIDTHS, ENCODING_EXTENSIONS
+    import instrumentation
+    from instrumentation import stage_timer, FRAMES_PROCESSED, REQUEST_BUCKETS
 except ImportError as e:
     print(f"ERROR: Could not import EmotionLearningTool from {os.path.join(sna_path, 'main.py')}")
     print(f"Check that the file exists and contains the class. Current sys.path includes: {sys.path}")
@@ -25,20 +34,104 @@ except FileNotFoundError as e:
     print(f"ERROR: Could not find main.py in {sna_path}")
     sys.exit(1)
 
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:
+    Sock = None
+    print("Info: flask-sock not installed; practice streaming over WebSocket is disabled (HTTP polling still works).")
+
 app = Flask(__name__,
         
             static_folder=os.path.join(sna_path, 'assets'),
             template_folder='templates')
+sock = Sock(app) if Sock is not None else None
+static_versions = StaticAssetVersions(app.static_folder)
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    """Appends ?v=<content hash> to every static URL, so the file can be cached forever."""
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        version = static_versions.version(values['filename'])
+        if version:
+            values['v'] = version
 
 
 CONFIDENCE_THRESHOLD_FOR_DETECTOR = 0.25 
 SMOOTHING_HISTORY_LENGTH = 7     
+MAX_PRACTICE_SESSIONS = 5000     
+PRACTICE_SESSION_TTL_SECONDS = 600
+# Micro-batching: collect face ROIs from concurrent requests for up to this many ms
+# (or MAX_INFERENCE_BATCH_SIZE ROIs) and run them as one batch. 0 disables it.
+MICRO_BATCH_WAIT_MS = float(os.environ.get('EMOTION_MICRO_BATCH_WAIT_MS', '5'))
+MAX_INFERENCE_BATCH_SIZE = int(os.environ.get('EMOTION_MAX_BATCH_SIZE', '32'))
+# Face detector: 'haar', 'yunet' or 'ssd'. With FACE_DETECT_EVERY > 1, full detection runs
+# on every Nth frame of a session and boxes are tracked with optical flow in between.
+FACE_DETECTOR = os.environ.get('EMOTION_FACE_DETECTOR', 'haar')
+FACE_DETECT_EVERY = int(os.environ.get('EMOTION_FACE_DETECT_EVERY', '1'))
+# Face detection resolution as a fraction of the uploaded frame (see benchmarks/detection_scale_benchmark.py).
+DETECTION_SCALE = float(os.environ.get('EMOTION_DETECTION_SCALE', '1.0'))
+# One of 'auto', 'keras', 'tflite', 'onnxruntime', 'opencv'. 'auto' converts the .h5 once
+# and prefers the lightest runtime that is installed.
+INFERENCE_BACKEND = os.environ.get('EMOTION_INFERENCE_BACKEND', 'auto')
+# 'baseline' or 'student' (the distilled compact model from `train_model.py --mode distill`).
+EMOTION_MODEL = os.environ.get('EMOTION_MODEL', 'baseline')
+# Change gating: reuse the previous result when a session's frame (downsampled) or a face ROI
+# differs from the last processed one by less than this many grey levels on average. 0 disables.
+# The frame level is off by default: a face covers only a few pixels of the whole-frame thumbnail,
+# so a changed expression can stay under the threshold and a stale label would be shown.
+FRAME_DIFF_THRESHOLD = float(os.environ.get('EMOTION_FRAME_DIFF_THRESHOLD', '0'))
+FACE_DIFF_THRESHOLD = float(os.environ.get('EMOTION_FACE_DIFF_THRESHOLD', '4.0'))
+# Consecutive reuses before the frame or face is processed again regardless.
+MAX_RESULT_REUSE = int(os.environ.get('EMOTION_MAX_RESULT_REUSE', '15'))
+# Fraction of per-frame practice events written to the event log (1.0 keeps all of them).
+PRACTICE_LOG_SAMPLE_RATE = float(os.environ.get('EMOTION_PRACTICE_LOG_SAMPLE_RATE', '1.0'))
+# Model file in pretrained_models/, e.g. an int8 .tflite produced by export_model.py. Empty uses the default .h5.
+MODEL_FILENAME = os.environ.get('EMOTION_MODEL_FILE') or None
+# CPU threads per process for the inference runtime and for OpenCV. Under gunicorn these are
+# per worker, so workers x threads should not exceed the cores (see gunicorn.conf.py).
+# Unset leaves each library's default (usually one thread per core).
+INFERENCE_THREADS = int(os.environ['EMOTION_INFERENCE_THREADS']) if os.environ.get('EMOTION_INFERENCE_THREADS') else None
+OPENCV_THREADS = int(os.environ['EMOTION_OPENCV_THREADS']) if os.environ.get('EMOTION_OPENCV_THREADS') else None
+if OPENCV_THREADS is not None:
+    cv2.setNumThreads(OPENCV_THREADS)
+# Load the emotion model (and audio/TTS) in background threads so the learn and quiz pages are
+# served immediately; /readyz reports when practice frames can be processed. 0 loads before serving.
+BACKGROUND_LOAD = os.environ.get('EMOTION_BACKGROUND_LOAD', '1') != '0'
+# Responsive image derivatives and precompressed CSS/JS (see asset_cache.py). The cache is brought
+# up to date in a background thread at startup; set EMOTION_BUILD_ASSETS=0 when build_assets.py
+# runs as a deployment step instead. Original files are served for anything not built yet.
+ASSET_CACHE_DIR = os.environ.get('EMOTION_ASSET_CACHE_DIR') or os.path.join(script_dir, 'asset_cache')
+BUILD_ASSETS = os.environ.get('EMOTION_BUILD_ASSETS', '1') != '0'
+IMAGE_WIDTHS = ([int(w) for w in os.environ['EMOTION_IMAGE_WIDTHS'].split(',')]
+                if os.environ.get('EMOTION_IMAGE_WIDTHS') else DEFAULT_IMAGE_WIDTHS)
+
+asset_cache = AssetCache(app.static_folder, ASSET_CACHE_DIR, widths=IMAGE_WIDTHS, versions=static_versions)
+asset_cache.load()
+if BUILD_ASSETS:
+    asset_cache.start_build()
 
 print("Initializing backend tool...")
 try:
     learning_tool = EmotionLearningTool(
         confidence_threshold=CONFIDENCE_THRESHOLD_FOR_DETECTOR,
-        history_len=SMOOTHING_HISTORY_LENGTH
+        history_len=SMOOTHING_HISTORY_LENGTH,
+        inference_backend=INFERENCE_BACKEND,
+        max_sessions=MAX_PRACTICE_SESSIONS,
+        session_ttl=PRACTICE_SESSION_TTL_SECONDS,
+        micro_batch_wait_ms=MICRO_BATCH_WAIT_MS,
+        max_batch_size=MAX_INFERENCE_BATCH_SIZE,
+        face_detector=FACE_DETECTOR,
+        detect_every=FACE_DETECT_EVERY,
+        detection_scale=DETECTION_SCALE,
+        model_filename=MODEL_FILENAME,
+        emotion_model=EMOTION_MODEL,
+        practice_log_sample_rate=PRACTICE_LOG_SAMPLE_RATE,
+        inference_threads=INFERENCE_THREADS,
+        background_load=BACKGROUND_LOAD,
+        frame_diff_threshold=FRAME_DIFF_THRESHOLD,
+        face_diff_threshold=FACE_DIFF_THRESHOLD,
+        max_result_reuse=MAX_RESULT_REUSE
         )
 except FileNotFoundError as e:
     
@@ -49,7 +142,142 @@ except Exception as e:
     import traceback
     traceback.print_exc()
     sys.exit(1)
-print(f"Backend tool initialized with confidence_threshold={CONFIDENCE_THRESHOLD_FOR_DETECTOR}, history_len={SMOOTHING_HISTORY_LENGTH}.")
+HTTP_REQUESTS = instrumentation.REGISTRY.counter(
+    'emotion_http_requests_total', 'HTTP requests handled, by endpoint, method and status.', ['endpoint', 'method', 'status'])
+HTTP_ERRORS = instrumentation.REGISTRY.counter(
+    'emotion_http_errors_total', 'HTTP requests answered with a 5xx status.', ['endpoint'])
+HTTP_REQUEST_SECONDS = instrumentation.REGISTRY.histogram(
+    'emotion_http_request_duration_seconds', 'HTTP request latency.', ['endpoint'], buckets=REQUEST_BUCKETS)
+websocket_connections = 0
+websocket_lock = threading.Lock()
+instrumentation.REGISTRY.gauge(
+    'emotion_active_practice_sessions', 'Practice sessions holding smoothing state.', learning_tool.active_session_count)
+instrumentation.REGISTRY.gauge(
+    'emotion_websocket_connections', 'Open practice WebSocket streams.', lambda: websocket_connections)
+instrumentation.REGISTRY.gauge(
+    'emotion_inference_queue_depth', 'Face batches waiting for the micro-batching scheduler.',
+    lambda: (learning_tool.get_inference_stats() or {}).get('queue_depth'))
+instrumentation.REGISTRY.gauge(
+    'emotion_detector_ready', 'Whether the emotion model is loaded (1) or still loading (0).',
+    lambda: int(learning_tool.is_ready()))
+
+print(f"Backend tool initialized with confidence_threshold={CONFIDENCE_THRESHOLD_FOR_DETECTOR}, history_len={SMOOTHING_HISTORY_LENGTH}, inference_backend={INFERENCE_BACKEND}.")
+
+# Endpoints whose requests stay open for a whole stream are not timed.
+UNTIMED_ENDPOINTS = {'ws_practice_stream'}
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Counts every response by endpoint and status and records its latency."""
+    endpoint = request.endpoint or 'unmatched'
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if response.status_code >= 500:
+        HTTP_ERRORS.inc(endpoint=endpoint)
+    start = g.pop('request_start', None)
+    if start is not None and endpoint not in UNTIMED_ENDPOINTS:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+    return response
+
+@app.before_request
+def serve_precompressed_static():
+    """Serves the brotli/gzip variant of a static CSS/JS file from the asset cache when the client accepts it."""
+    if request.endpoint != 'static' or request.method not in ('GET', 'HEAD'):
+        return None
+    filename = request.view_args['filename']
+    accepted = [encoding for encoding in ENCODING_EXTENSIONS if request.accept_encodings.quality(encoding) > 0]
+    match = asset_cache.precompressed(filename, accepted)
+    if match is None:
+        return None
+    path, encoding = match
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                         conditional=True)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.after_request
+def set_static_cache_headers(response):
+    """Versioned static URLs are immutable; unversioned ones are revalidated with Last-Modified/ETag."""
+    if request.endpoint == 'static' and response.status_code in (200, 206, 304):
+        filename = request.view_args['filename']
+        version = request.args.get('v')
+        if version and version == static_versions.version(filename):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+        if asset_cache.has_precompressed(filename):
+            response.vary.add('Accept-Encoding')
+    return response
+
+_static_urls = {}
+
+def static_url(filename):
+    """url_for('static', ...) memoised per file (the URL only changes with the file's content hash)."""
+    key = (request.script_root, filename)
+    url = _static_urls.get(key)
+    if url is None:
+        url = _static_urls[key] = url_for('static', filename=filename)
+    return url
+
+_responsive_images = {}
+
+def responsive_image(filename):
+    """
+    srcset-ready URLs for a static image, memoised per asset cache build:
+    {"src", "srcset", "sources": [{"type", "srcset"}], "width", "height"}.
+    srcset lists the JPEG/PNG derivatives by width and src is the largest;
+    sources holds the WebP srcset for a <picture>. Before the image has been
+    built only src (the original file) is given.
+    """
+    key = (request.script_root, filename, asset_cache.version)
+    image = _responsive_images.get(key)
+    if image is not None:
+        return image
+    entry = asset_cache.image(filename)
+    if entry is None:
+        image = {"src": static_url(filename)}
+    else:
+        variants = entry['variants']
+        srcsets = {mimetype: ', '.join(f"{url_for('derived_asset', name=name)} {width}w" for width, name in v)
+                   for mimetype, v in variants.items()}
+        fallback = next((mimetype for mimetype in variants if mimetype != 'image/webp'), 'image/webp')
+        image = {"src": url_for('derived_asset', name=variants[fallback][-1][1]), "srcset": srcsets[fallback],
+                 "sources": [{"type": mimetype, "srcset": srcset} for mimetype, srcset in srcsets.items()
+                             if mimetype != fallback],
+                 "width": entry['width'], "height": entry['height']}
+    _responsive_images[key] = image
+    return image
+
+@app.route('/assets-derived/<name>')
+def derived_asset(name):
+    """Image derivatives from the asset cache. Their names start with the source's content hash, so they never change."""
+    response = send_from_directory(asset_cache.image_cache_dir, name)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: request counts/latency, per-stage frame timings, errors and active sessions."""
+    return Response(instrumentation.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: the emotion model is loaded and practice frames can be processed."""
+    timings = {name: round(seconds, 3) for name, seconds in learning_tool.startup_timings.items()}
+    if not learning_tool.is_ready():
+        status = "failed" if learning_tool.detector_error is not None else "loading"
+        return jsonify({"status": status, "pid": os.getpid(), "startup_seconds": timings}), 503
+    detector = learning_tool.detector
+    return jsonify({"status": "ready", "pid": os.getpid(), "model": detector.model_filename,
+                    "backend": detector.model.name, "startup_seconds": timings})
 
 @app.route('/')
 def index():
@@ -73,27 +301,40 @@ def quiz_page():
     """Renders the quiz page."""
     return render_template('quiz.html')
 
+def build_learn_data_payloads():
+    """Learn payloads for every emotion with their static URLs expanded (needs a request context)."""
+    payloads = {}
+    for emotion_name in learning_tool.learning_content:
+        data = dict(learning_tool.get_learn_data(emotion_name))
+        try:
+            if data.get('emoji_path'):
+                data['emoji_url'] = static_url(data['emoji_path'])
+            if data.get('image_paths'):
+                data['image_urls'] = [static_url(p) for p in data['image_paths']]
+                data['images'] = [responsive_image(p) for p in data['image_paths']]
+        except Exception as e:
+            print(f"Error generating static URLs in learn_data for {emotion_name}: {e}")
+        payloads[emotion_name] = data
+    return payloads
+
+learn_data_responses = PrecomputedResponses(build_learn_data_payloads)
+
 @app.route('/api/learn_data/<emotion_name>')
 def api_get_learn_data(emotion_name):
-    """Gets learning content (desc, features, images) for a specific emotion."""
-    data = learning_tool.get_learn_data(emotion_name)
-    try:
-        
-        if 'emoji_path' in data and data['emoji_path']:
-             data['emoji_url'] = url_for('static', filename=data['emoji_path'])
-        if 'image_paths' in data and data['image_paths']:
-            data['image_urls'] = [url_for('static', filename=p) for p in data['image_paths']]
-    except Exception as e:
-        print(f"Error generating static URLs in learn_data for {emotion_name}: {e}")
-    return jsonify(data)
+    """Gets learning content (desc, features, images) for a specific emotion, pre-serialised with an ETag."""
+    responses = learn_data_responses.get((learning_tool.content_version, asset_cache.version, request.script_root))
+    if emotion_name in responses:
+        return responses[emotion_name].response(request)
+    return jsonify(learning_tool.get_learn_data(emotion_name))
 
 @app.route('/api/quiz_question')
 def api_get_quiz_question():
-    """Gets data for a new quiz question."""
+    """Gets data for a new quiz question, with srcset-ready image URLs."""
     data = learning_tool.get_quiz_question()
     try:
         if 'image_path' in data and data['image_path']:
-            data['image_url'] = url_for('static', filename=data['image_path'])
+            data['image_url'] = static_url(data['image_path'])
+            data['image'] = responsive_image(data['image_path'])
     except Exception as e:
         print(f"Error generating static URL for quiz image: {e}")
     return jsonify(data)
@@ -111,7 +352,7 @@ def api_check_quiz_answer():
 
     try:
         if 'correct_emoji_path' in result and result['correct_emoji_path']:
-            result['correct_emoji_url'] = url_for('static', filename=result['correct_emoji_path'])
+            result['correct_emoji_url'] = static_url(result['correct_emoji_path'])
         else:
             result['correct_emoji_url'] = None
     except Exception as e:
@@ -121,6 +362,25 @@ def api_check_quiz_answer():
 
     return jsonify(result) 
 
+def get_practice_session_id(data=None):
+    """Identifies the practice session of a request: explicit id first, then the client address."""
+    session_id = request.headers.get('X-Session-Id')
+    if not session_id and isinstance(data, dict):
+        session_id = data.get('sessionId')
+    if not session_id:
+        session_id = request.remote_addr or 'default'
+    return str(session_id)[:128]
+
+def add_practice_emoji_url(result):
+    """Adds the static emoji URL to a practice result."""
+    try:
+        if 'emotion' in result and result['emotion'] and 'emoji_path' in result and result['emoji_path']:
+            result['emoji_url'] = static_url(result['emoji_path'])
+    except Exception as e:
+        print(f"Error generating emoji URL for practice result: {e}")
+        result.pop('emoji_url', None) 
+    return result
+
 @app.route('/api/process_frame', methods=['POST'])
 def api_process_practice_frame():
     """Receives a frame, processes it for emotion, returns smoothed result."""
@@ -130,26 +390,136 @@ def api_process_practice_frame():
 
     try:
    
-        header, encoded = data['imageData'].split(",", 1)
-        image_data_decoded = base64.b64decode(encoded)
-        np_arr = np.frombuffer(image_data_decoded, np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        if frame is None:
-            raise ValueError("Could not decode image")
+        with stage_timer('base64_decode'):
+            header, encoded = data['imageData'].split(",", 1)
+            image_data_decoded = base64.b64decode(encoded)
+        with stage_timer('imdecode'):
+            np_arr = np.frombuffer(image_data_decoded, np.uint8)
+            frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError("Could not decode image")
     except Exception as e:
         print(f"Error decoding image data: {e}")
         return jsonify({"error": f"Error decoding image: {e}"}), 400
 
-    result = learning_tool.process_practice_frame(frame) 
+    result = learning_tool.process_practice_frame(frame, session_id=get_practice_session_id(data)) 
+    if result.get('loading'):
+        return jsonify(result), 503, {'Retry-After': '1'}
+    FRAMES_PROCESSED.inc(transport='json')
+
+    with stage_timer('serialize'):
+        return jsonify(add_practice_emoji_url(result))
+
+@app.route('/api/process_frame_binary', methods=['POST'])
+def api_process_practice_frame_binary():
+    """
+    Binary variant of /api/process_frame. Accepts either a raw body
+    (application/octet-stream or image/jpeg) or multipart/form-data with a
+    'frame' file. The frame is a JPEG by default; with format 'gray' it is raw
+    8-bit grayscale and needs width and height. Format, size and session id come
+    from X-Frame-Format / X-Frame-Width / X-Frame-Height / X-Session-Id headers
+    or the matching multipart form fields.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('frame')
+        if upload is None:
+            return jsonify({"error": "Missing 'frame' file in multipart upload"}), 400
+        payload = upload.read()
+        fields = request.form
+    else:
+        payload = request.get_data(cache=False)
+        fields = {}
+
+    frame_format = request.headers.get('X-Frame-Format') or fields.get('format', 'jpeg')
+    width = request.headers.get('X-Frame-Width') or fields.get('width')
+    height = request.headers.get('X-Frame-Height') or fields.get('height')
 
-   
     try:
-        if 'emotion' in result and result['emotion'] and 'emoji_path' in result and result['emoji_path']:
-            result['emoji_url'] = url_for('static', filename=result['emoji_path'])
-    except Exception as e:
-        print(f"Error generating emoji URL for practice result: {e}")
-        result.pop('emoji_url', None) 
-    return jsonify(result)
+        with stage_timer('imdecode'):
+            frame = decode_frame_bytes(payload, frame_format, width, height)
+    except ValueError as e:
+        print(f"Error decoding binary frame: {e}")
+        return jsonify({"error": f"Error decoding image: {e}"}), 400
+
+    result = learning_tool.process_practice_frame(frame, session_id=get_practice_session_id(fields))
+    if result.get('loading'):
+        return jsonify(result), 503, {'Retry-After': '1'}
+    FRAMES_PROCESSED.inc(transport='binary')
+    with stage_timer('serialize'):
+        return jsonify(add_practice_emoji_url(result))
+
+if sock is not None:
+    @sock.route('/ws/practice')
+    def ws_practice_stream(ws):
+        """
+        Streams practice frames over one persistent WebSocket. Text messages set
+        the frame format ({"format": "jpeg"} or {"format": "gray", "width": w,
+        "height": h}); binary messages are frames. Each frame is answered with
+        the smoothed result as JSON. If frames pile up while one is being
+        processed, only the newest is kept, so the learner never sees stale results.
+        """
+        global websocket_connections
+        session_id = str(request.args.get('session') or request.remote_addr or 'default')[:128]
+        frame_meta = {'format': 'jpeg'}
+        with websocket_lock:
+            websocket_connections += 1
+
+        def apply_meta(message):
+            try:
+                frame_meta.update(json.loads(message))
+            except (ValueError, TypeError) as e:
+                print(f"Ignoring malformed stream metadata: {e}")
+
+        try:
+            while True:
+                message = ws.receive()
+                if isinstance(message, str):
+                    apply_meta(message)
+                    continue
+
+                newer = ws.receive(timeout=0)
+                while newer is not None:
+                    if isinstance(newer, str):
+                        apply_meta(newer)
+                    else:
+                        message = newer
+                    newer = ws.receive(timeout=0)
+
+                try:
+                    with stage_timer('imdecode'):
+                        frame = decode_frame_bytes(message, frame_meta.get('format', 'jpeg'),
+                                                   frame_meta.get('width'), frame_meta.get('height'))
+                except ValueError as e:
+                    ws.send(json.dumps({"error": f"Error decoding image: {e}"}))
+                    continue
+
+                result = learning_tool.process_practice_frame(frame, session_id=session_id)
+                if not result.get('loading'):
+                    FRAMES_PROCESSED.inc(transport='websocket')
+                with stage_timer('serialize'):
+                    reply = json.dumps(add_practice_emoji_url(result), default=str)
+                ws.send(reply)
+        except ConnectionClosed:
+            pass
+        finally:
+            with websocket_lock:
+                websocket_connections -= 1
+            learning_tool.end_practice_session(session_id)
+
+@app.route('/api/end_session', methods=['POST'])
+def api_end_practice_session():
+    """Releases the smoothing state of a practice session when the learner stops the camera."""
+    data = request.get_json(silent=True)
+    ended = learning_tool.end_practice_session(get_practice_session_id(data))
+    return jsonify({"status": "success", "ended": ended})
+
+@app.route('/api/inference_stats')
+def api_inference_stats():
+    """Reports micro-batching queue depth, batch sizes and wait times, and change-gate hit rates."""
+    stats = learning_tool.get_inference_stats()
+    response = {"micro_batching": False} if stats is None else dict(stats, micro_batching=True)
+    response['frame_gate'] = learning_tool.get_frame_gate_stats()
+    return jsonify(response)
 
 @app.route('/api/play_sound/<emotion_name>')
 def api_play_sound(emotion_name):
@@ -180,6 +550,9 @@ def shutdown_server():
 atexit.register(shutdown_server)
 
 if __name__ == '__main__':
-    print("Starting Flask server for Emotion Learning Tool...")
-    
-    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=True)
\ No newline at end of file
+    # Development server. The reloader imports the app (and loads the model) a second time,
+    # so it is only on with EMOTION_DEBUG=1; for production use gunicorn (see gunicorn.conf.py).
+    debug = os.environ.get('EMOTION_DEBUG', '0') == '1'
+    port = int(os.environ.get('PORT', '5000'))
+    print(f"Starting Flask development server for Emotion Learning Tool on port {port} (debug={debug})...")
+    app.run(debug=debug, host='0.0.0.0', port=port, use_reloader=debug, threaded=True)
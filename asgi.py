@@ -0,0 +1,16 @@
+"""
+ASGI entry point for uvicorn and other ASGI servers (needs `asgiref`):
+
+    uvicorn asgi:application --workers 4
+
+The Flask app runs in asgiref's thread pool. uvicorn starts its workers as
+fresh processes, so each one loads its own copy of the model; prefer gunicorn
+(gunicorn.conf.py) to share a preloaded model. The /ws/practice WebSocket is
+a WSGI-only route and is not available here; the practice page falls back to
+HTTP polling.
+"""
+from asgiref.wsgi import WsgiToAsgi
+
+from wsgi import application as wsgi_application
+
+application = WsgiToAsgi(wsgi_application)
@@ -0,0 +1,137 @@
+"""
+Measures face-detection time and recall against the detection scale factor.
+
+Runs the Haar detector on the bundled face images (learning content and site
+photos) at full resolution and at each scale in --scales. Full-resolution
+detections are the reference: recall at a scale is the share of reference
+boxes matched (IoU >= --iou) by the rescaled boxes at that scale.
+
+    python benchmarks/detection_scale_benchmark.py --scales 1.0 0.75 0.5 0.35 --upscale 640
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sna_path = os.path.join(project_root, 'SpecialNeedsEmotionAssistant')
+if sna_path not in sys.path:
+    sys.path.insert(0, sna_path)
+
+from face_detectors import HaarFaceDetector, detect_at_scale
+
+DEFAULT_IMAGE_GLOBS = [
+    os.path.join(sna_path, 'assets', 'learning_content', 'images', '*', '*.jpeg'),
+    os.path.join(sna_path, 'assets', 'images', 'person_*.jpg'),
+    os.path.join(sna_path, 'assets', 'images', 'teacher-*.jpg'),
+]
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def count_matches(reference, candidates, threshold):
+    unmatched = list(candidates)
+    matched = 0
+    for ref in reference:
+        best = max(unmatched, key=lambda c: iou(ref, c), default=None)
+        if best is not None and iou(ref, best) >= threshold:
+            matched += 1
+            unmatched.remove(best)
+    return matched
+
+
+def load_images(patterns, upscale_width):
+    images = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                continue
+            if upscale_width and image.shape[1] < upscale_width:
+                factor = upscale_width / image.shape[1]
+                image = cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_LINEAR)
+            images.append((path, image))
+    return images
+
+
+def time_detection(detector, gray, scale, repeats):
+    timings = []
+    boxes = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        boxes = detect_at_scale(detector, gray, scale)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return boxes, float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.75, 0.5, 0.35, 0.25])
+    parser.add_argument('--images', nargs='+', default=DEFAULT_IMAGE_GLOBS, help="Glob patterns of face images")
+    parser.add_argument('--upscale', type=int, default=640, help="Upscale smaller images to this width (0 disables)")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--iou', type=float, default=0.5)
+    parser.add_argument('--output', help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    cascade_path = os.path.join(project_root, 'haarcascade_frontalface_default.xml')
+    if not os.path.exists(cascade_path):
+        cascade_path = os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+    detector = HaarFaceDetector(cv2.CascadeClassifier(cascade_path))
+
+    images = load_images(args.images, args.upscale)
+    if not images:
+        print("No images found for the benchmark.")
+        sys.exit(1)
+    print(f"Benchmarking {len(images)} images, scales={args.scales}")
+
+    reference = {path: detect_at_scale(detector, gray, 1.0) for path, gray in images}
+    total_reference = sum(len(boxes) for boxes in reference.values())
+
+    results = []
+    for scale in args.scales:
+        times = []
+        matched = 0
+        detected = 0
+        for path, gray in images:
+            boxes, elapsed_ms = time_detection(detector, gray, scale, args.repeats)
+            times.append(elapsed_ms)
+            detected += len(boxes)
+            matched += count_matches(reference[path], boxes, args.iou)
+        results.append({
+            'scale': scale,
+            'time_ms_mean': float(np.mean(times)),
+            'time_ms_p95': float(np.percentile(times, 95)),
+            'recall': matched / total_reference if total_reference else None,
+            'detections': detected,
+        })
+
+    print(f"Reference faces (scale 1.0): {total_reference}")
+    print(f"{'scale':>6} {'mean ms':>9} {'p95 ms':>9} {'recall':>8} {'faces':>6}")
+    for r in results:
+        recall = f"{r['recall']:.3f}" if r['recall'] is not None else 'n/a'
+        print(f"{r['scale']:>6.2f} {r['time_ms_mean']:>9.2f} {r['time_ms_p95']:>9.2f} {recall:>8} {r['detections']:>6}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'images': len(images), 'reference_faces': total_reference, 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+"""
+Per-stage latency benchmark for the practice-mode detection pipeline.
+
+Builds frames at several resolutions: synthetic frames with 0-10 faces (crops
+of the bundled face images pasted on a textured background), plus the bundled
+photos themselves. With --pipeline stages (the default) each frame goes through
+the steps of /api/process_frame -> process_practice_frame -> detect_emotion
+one by one, calling the detector's internal stages directly so each is timed
+separately:
+
+    decode       base64 + cv2.imdecode of the JPEG upload (JSON endpoint)
+    decode_gray  decode_frame_bytes straight to grayscale (binary/WebSocket endpoints)
+    grayscale    BGR -> gray conversion
+    detect       face detection (at --detection-scale)
+    crop_resize  padded crops resized into the (N, 48, 48, 1) model batch
+    predict      one forward pass over every face of the frame
+    smoothing    labelling plus the per-session majority vote
+    total        sum of the stages above, excluding decode_gray
+
+This measures the raw cost of every frame: the change gate (frame_gate.py) and
+the micro-batching scheduler are bypassed. --pipeline detect_emotion instead
+calls detect_emotion() with both enabled, using the app's defaults (or the
+--frame-diff-threshold, --face-diff-threshold, --max-result-reuse,
+--micro-batch-wait-ms and --max-batch-size options), and reports decode,
+decode_gray, detect_emotion, smoothing and total, plus the gate's hit rates.
+Each scenario repeats the same frames, like a still camera, so this shows the
+cost the app actually pays rather than the per-stage breakdown.
+
+Reports p50/p95/p99 latency per stage and frames/s for every face detector
+and inference backend combination. Unavailable detectors or backends are
+skipped. Results go to JSON so runs can be compared across commits.
+
+    python benchmarks/inference_benchmark.py --detectors haar yunet --backends keras tflite \\
+        --output benchmark_results/inference.json
+"""
+import argparse
+import base64
+import glob
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sna_path = os.path.join(project_root, 'SpecialNeedsEmotionAssistant')
+if sna_path not in sys.path:
+    sys.path.insert(0, sna_path)
+
+from emotion_detector import EmotionDetector
+from face_detectors import FACE_DETECTORS
+from frame_codec import decode_frame_bytes
+from frame_gate import FrameGate
+from inference_backends import AUTO_BACKEND_ORDER
+from session_store import PracticeSession
+
+PIPELINE_STAGES = {
+    'stages': ('decode', 'decode_gray', 'grayscale', 'detect', 'crop_resize', 'predict', 'smoothing', 'total'),
+    'detect_emotion': ('decode', 'decode_gray', 'detect_emotion', 'smoothing', 'total'),
+}
+DEFAULT_RESOLUTIONS = ['320x240', '640x480', '1280x720']
+DEFAULT_FACE_COUNTS = [0, 1, 2, 5, 10]
+FACE_IMAGE_GLOBS = [
+    os.path.join(sna_path, 'assets', 'learning_content', 'images', '*', '*.jpeg'),
+    os.path.join(sna_path, 'assets', 'images', 'person_*.jpg'),
+    os.path.join(sna_path, 'assets', 'images', 'teacher-*.jpg'),
+]
+
+
+def parse_resolution(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def load_face_sources(patterns, cascade):
+    """Returns (photos, face_crops): the bundled BGR images and the Haar face crops found in them."""
+    photos, crops = [], []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is None:
+                continue
+            photos.append(image)
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            for (x, y, w, h) in cascade.detectMultiScale(gray, 1.1, 5, minSize=(40, 40)):
+                crops.append(image[y:y + h, x:x + w])
+    return photos, crops
+
+
+def textured_background(width, height, rng):
+    base = cv2.resize(rng.integers(60, 200, size=(6, 8, 3), dtype=np.uint8), (width, height),
+                      interpolation=cv2.INTER_CUBIC)
+    noise = rng.normal(0, 8, size=(height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def synthetic_frame(width, height, face_count, crops, rng):
+    """Pastes face_count crops onto a background in a grid, one face per cell."""
+    frame = textured_background(width, height, rng)
+    if face_count == 0 or not crops:
+        return frame
+    cols = math.ceil(math.sqrt(face_count * width / height))
+    rows = math.ceil(face_count / cols)
+    cell_w, cell_h = width // cols, height // rows
+    size = int(min(cell_w, cell_h) * 0.8)
+    for i in range(face_count):
+        row, col = divmod(i, cols)
+        face = cv2.resize(crops[rng.integers(len(crops))], (size, size), interpolation=cv2.INTER_AREA)
+        x = col * cell_w + (cell_w - size) // 2
+        y = row * cell_h + (cell_h - size) // 2
+        frame[y:y + size, x:x + size] = face
+    return frame
+
+
+def fit_to_resolution(image, width, height):
+    """Letterboxes a photo into a width x height frame."""
+    scale = min(width / image.shape[1], height / image.shape[0])
+    resized = cv2.resize(image, (max(1, int(image.shape[1] * scale)), max(1, int(image.shape[0] * scale))))
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    y, x = (height - resized.shape[0]) // 2, (width - resized.shape[1]) // 2
+    frame[y:y + resized.shape[0], x:x + resized.shape[1]] = resized
+    return frame
+
+
+def build_scenarios(resolutions, face_counts, photos, crops, jpeg_quality, seed):
+    """Returns scenarios as dicts with a name, resolution and JPEG-encoded frames."""
+    rng = np.random.default_rng(seed)
+    scenarios = []
+    for width, height in resolutions:
+        frame_sets = [(f'{count}_faces', [synthetic_frame(width, height, count, crops, rng)]) for count in face_counts]
+        if photos:
+            frame_sets.append(('photos', [fit_to_resolution(photo, width, height) for photo in photos]))
+        for name, frames in frame_sets:
+            encoded = [cv2.imencode('.jpg', f, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])[1].tobytes() for f in frames]
+            scenarios.append({'name': name, 'resolution': f'{width}x{height}', 'jpegs': encoded})
+    return scenarios
+
+
+def decode_upload(jpeg_bytes, timings):
+    """Times both upload decode paths and returns the BGR frame."""
+    clock = time.perf_counter
+    payload = base64.b64encode(jpeg_bytes)
+    t0 = clock()
+    frame = cv2.imdecode(np.frombuffer(base64.b64decode(payload), np.uint8), cv2.IMREAD_COLOR)
+    timings['decode'] = clock() - t0
+
+    t0 = clock()
+    decode_frame_bytes(jpeg_bytes, 'jpeg')
+    timings['decode_gray'] = clock() - t0
+    return frame
+
+
+def run_frame(detector, jpeg_bytes, session):
+    """Runs one uploaded frame through every stage, returning {stage: ms} and the face count."""
+    timings = {}
+    clock = time.perf_counter
+    frame = decode_upload(jpeg_bytes, timings)
+
+    t0 = clock()
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    timings['grayscale'] = clock() - t0
+
+    t0 = clock()
+    _gray, faces = detector._detect_faces(gray, session.detector_state)
+    timings['detect'] = clock() - t0
+
+    t0 = clock()
+    boxes, batch = detector._extract_face_rois(gray, faces)
+    timings['crop_resize'] = clock() - t0
+
+    t0 = clock()
+    predictions = detector._classify_batch(batch) if len(batch) else []
+    timings['predict'] = clock() - t0
+
+    t0 = clock()
+    labels = [detector._label_prediction(p) for p in predictions]
+    session.smooth(labels[0][0] if labels else None)
+    timings['smoothing'] = clock() - t0
+
+    timings['total'] = sum(v for k, v in timings.items() if k != 'decode_gray')
+    return {k: v * 1000.0 for k, v in timings.items()}, len(boxes)
+
+
+def run_frame_detect_emotion(detector, jpeg_bytes, session):
+    """Runs one uploaded frame through detect_emotion() as the app does (gate and scheduler included)."""
+    timings = {}
+    clock = time.perf_counter
+    frame = decode_upload(jpeg_bytes, timings)
+
+    t0 = clock()
+    results = detector.detect_emotion(frame, session.detector_state)
+    timings['detect_emotion'] = clock() - t0
+
+    t0 = clock()
+    session.smooth(results[0][1] if results else None)
+    timings['smoothing'] = clock() - t0
+
+    timings['total'] = sum(v for k, v in timings.items() if k != 'decode_gray')
+    return {k: v * 1000.0 for k, v in timings.items()}, len(results)
+
+
+def summarize(samples):
+    values = np.asarray(samples)
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean()),
+    }
+
+
+def benchmark_scenario(detector, scenario, iterations, warmup, history_len, pipeline='stages', gate_factory=None):
+    session = PracticeSession(history_len)
+    stage_names = PIPELINE_STAGES[pipeline]
+    run = run_frame if pipeline == 'stages' else run_frame_detect_emotion
+    jpegs = scenario['jpegs']
+    for i in range(warmup):
+        run(detector, jpegs[i % len(jpegs)], session)
+    if gate_factory is not None:
+        # Fresh counters (and session state) so the hit rates cover only the timed frames.
+        detector.frame_gate = gate_factory()
+        session = PracticeSession(history_len)
+
+    samples = {stage: [] for stage in stage_names}
+    faces = []
+    for i in range(iterations):
+        timings, face_count = run(detector, jpegs[i % len(jpegs)], session)
+        for stage in stage_names:
+            samples[stage].append(timings[stage])
+        faces.append(face_count)
+
+    stages = {stage: summarize(values) for stage, values in samples.items()}
+    total_seconds = sum(samples['total']) / 1000.0
+    return {
+        'scenario': scenario['name'],
+        'resolution': scenario['resolution'],
+        'iterations': iterations,
+        'faces_detected_mean': float(np.mean(faces)),
+        'frames_per_sec': iterations / total_seconds if total_seconds > 0 else None,
+        'stages': stages,
+        'frame_gate': detector.frame_gate.stats() if gate_factory is not None else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, stage_names):
+    header = f"{'detector':<8} {'backend':<11} {'res':<9} {'scenario':<9} {'faces':>5} {'fps':>7}"
+    header += ''.join(f" {stage[:11]:>11}" for stage in stage_names)
+    print(header + "   (p50/p95 ms)")
+    for r in results:
+        line = (f"{r['detector']:<8} {r['backend']:<11} {r['resolution']:<9} {r['scenario']:<9} "
+                f"{r['faces_detected_mean']:>5.1f} {r['frames_per_sec'] or 0:>7.1f}")
+        for stage in stage_names:
+            s = r['stages'][stage]
+            line += f" {s['p50_ms']:>5.2f}/{s['p95_ms']:<5.2f}"
+        if r.get('frame_gate'):
+            line += f"  gate frame {r['frame_gate']['frame_hit_rate']:.0%} face {r['frame_gate']['face_hit_rate']:.0%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--detectors', nargs='+', default=list(FACE_DETECTORS), choices=FACE_DETECTORS)
+    parser.add_argument('--backends', nargs='+', default=list(AUTO_BACKEND_ORDER), choices=AUTO_BACKEND_ORDER)
+    parser.add_argument('--model', default='baseline', help="Named model ('baseline' or 'student')")
+    parser.add_argument('--model-file', help="Model file in pretrained_models/ (overrides --model)")
+    parser.add_argument('--resolutions', nargs='+', default=DEFAULT_RESOLUTIONS, help="WIDTHxHEIGHT")
+    parser.add_argument('--faces', type=int, nargs='+', default=DEFAULT_FACE_COUNTS, help="Synthetic face counts")
+    parser.add_argument('--iterations', type=int, default=50, help="Timed frames per scenario")
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--detection-scale', type=float, default=1.0)
+    parser.add_argument('--pipeline', choices=list(PIPELINE_STAGES), default='stages',
+                        help="'stages' times each step with gating and micro-batching bypassed; "
+                             "'detect_emotion' runs the app's path with both enabled")
+    parser.add_argument('--frame-diff-threshold', type=float, default=0.0, help="detect_emotion pipeline only")
+    parser.add_argument('--face-diff-threshold', type=float, default=4.0, help="detect_emotion pipeline only")
+    parser.add_argument('--max-result-reuse', type=int, default=15, help="detect_emotion pipeline only")
+    parser.add_argument('--micro-batch-wait-ms', type=float, default=5.0, help="detect_emotion pipeline only")
+    parser.add_argument('--max-batch-size', type=int, default=32, help="detect_emotion pipeline only")
+    parser.add_argument('--jpeg-quality', type=int, default=70, help="Matches the browser upload quality")
+    parser.add_argument('--history-len', type=int, default=7)
+    parser.add_argument('--num-threads', type=int, help="CPU threads for the inference runtime")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    cascade_path = os.path.join(project_root, 'haarcascade_frontalface_default.xml')
+    if not os.path.exists(cascade_path):
+        cascade_path = os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+    photos, crops = load_face_sources(FACE_IMAGE_GLOBS, cv2.CascadeClassifier(cascade_path))
+    if not crops:
+        print("No faces found in the bundled images; synthetic frames will have no faces.")
+    scenarios = build_scenarios([parse_resolution(r) for r in args.resolutions], args.faces,
+                                photos, crops, args.jpeg_quality, args.seed)
+    print(f"{len(scenarios)} scenarios from {len(photos)} bundled photos ({len(crops)} face crops)")
+
+    stage_names = PIPELINE_STAGES[args.pipeline]
+    gate_factory = None
+    if args.pipeline == 'detect_emotion' and (args.frame_diff_threshold > 0 or args.face_diff_threshold > 0):
+        def gate_factory():
+            return FrameGate(frame_threshold=args.frame_diff_threshold, face_threshold=args.face_diff_threshold,
+                             max_reuse=args.max_result_reuse)
+
+    results, skipped = [], []
+    for detector_name in args.detectors:
+        for backend_name in args.backends:
+            try:
+                detector = EmotionDetector(backend=backend_name, num_threads=args.num_threads,
+                                           face_detector=detector_name, detection_scale=args.detection_scale,
+                                           model=args.model, model_filename=args.model_file)
+            except Exception as e:
+                print(f"Skipping {detector_name}/{backend_name}: {e}")
+                skipped.append({'detector': detector_name, 'backend': backend_name, 'reason': str(e)})
+                continue
+            actual_detector = type(detector.face_detector).__name__
+            if detector_name != 'haar' and actual_detector.startswith('Haar'):
+                print(f"Skipping {detector_name}/{backend_name}: detector fell back to Haar")
+                skipped.append({'detector': detector_name, 'backend': backend_name, 'reason': 'detector model missing'})
+                continue
+            if args.pipeline == 'detect_emotion' and args.micro_batch_wait_ms > 0:
+                detector.enable_micro_batching(max_batch_size=args.max_batch_size, max_wait_ms=args.micro_batch_wait_ms)
+            for scenario in scenarios:
+                if gate_factory is not None:
+                    detector.frame_gate = gate_factory()
+                result = benchmark_scenario(detector, scenario, args.iterations, args.warmup, args.history_len,
+                                            args.pipeline, gate_factory)
+                result.update(detector=detector_name, backend=backend_name)
+                results.append(result)
+            detector.disable_micro_batching()
+
+    if not results:
+        print("No detector/backend combination could be benchmarked.")
+        sys.exit(1)
+    print_results(results, stage_names)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'git_revision': git_revision(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'platform': platform.platform(),
+                'python': platform.python_version(),
+                'opencv': cv2.__version__,
+                'model': args.model_file or args.model,
+                'detection_scale': args.detection_scale,
+                'pipeline': args.pipeline,
+                'iterations': args.iterations,
+                'stages': list(stage_names),
+                'results': results,
+                'skipped': skipped,
+            }, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Compares training input throughput (samples/second) of the old
+ImageDataGenerator.flow augmentation with the tf.data pipeline in
+fer_pipeline.py, using the same augmentation ranges and batch size.
+
+    python benchmarks/input_pipeline_benchmark.py --batches 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from fer_dataset import DATASET_PATH, load_fer2013
+from fer_pipeline import build_dataset, measure_throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', default=os.path.join(project_root, DATASET_PATH))
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batches', type=int, default=200)
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help="Use N random images instead of FER2013 (no dataset needed)")
+    parser.add_argument('--output', help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        images = rng.integers(0, 256, size=(args.synthetic, 48, 48), dtype=np.uint8)
+        labels = rng.integers(0, 7, size=args.synthetic)
+    else:
+        images, labels, _usage = load_fer2013(args.csv, usage='Training')
+    images = np.asarray(images)
+    labels = np.asarray(labels, dtype=np.int64)
+    print(f"Benchmarking on {len(labels)} images, batch_size={args.batch_size}, batches={args.batches}")
+
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    from tensorflow.keras.utils import to_categorical
+
+    X = images.astype('float32').reshape(-1, 48, 48, 1) / 255.0
+    generator = ImageDataGenerator(rotation_range=15, width_shift_range=0.1, height_shift_range=0.1,
+                                   shear_range=0.1, zoom_range=0.1, horizontal_flip=True, fill_mode='nearest')
+    flow = generator.flow(X, to_categorical(labels, 7), batch_size=args.batch_size, seed=42)
+    start = time.perf_counter()
+    generator_sps = measure_throughput(flow, args.batches)
+    print(f"ImageDataGenerator.flow: {generator_sps:,.0f} samples/s ({time.perf_counter() - start:.1f}s)")
+
+    dataset = build_dataset(images, labels, batch_size=args.batch_size, training=True, seed=42).repeat()
+    start = time.perf_counter()
+    pipeline_sps = measure_throughput(dataset, args.batches)
+    print(f"tf.data pipeline:        {pipeline_sps:,.0f} samples/s ({time.perf_counter() - start:.1f}s)")
+    print(f"Speed-up: {pipeline_sps / generator_sps:.1f}x")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'images': int(len(labels)), 'batch_size': args.batch_size, 'batches': args.batches,
+                'image_data_generator_samples_per_sec': generator_sps,
+                'tf_data_samples_per_sec': pipeline_sps,
+            }, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
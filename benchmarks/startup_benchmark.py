@@ -0,0 +1,130 @@
+"""
+Measures server cold start: how long until the learn/quiz pages are served
+and until the emotion model is ready for practice frames.
+
+Each run starts a fresh Python process that imports app.py (building the
+EmotionLearningTool), requests /learn and /api/quiz_question through the
+Flask test client, then waits for /readyz. Runs are repeated with background
+loading on (EMOTION_BACKGROUND_LOAD=1, the default) and off (everything loads
+before the first request, as before staged startup), and the median of each
+timing is reported along with the per-stage timings (detector, audio, tts, ...)
+recorded by the tool.
+
+    python benchmarks/startup_benchmark.py --runs 3 --output benchmark_results/startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+
+RESULT_MARKER = 'STARTUP_RESULT '
+
+# Runs in the child process; times are relative to the start of the script (after interpreter startup).
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {project_root!r})
+import app
+imported = time.perf_counter() - start
+client = app.app.test_client()
+assert client.get('/learn').status_code == 200
+assert client.get('/api/quiz_question').status_code == 200
+first_page = time.perf_counter() - start
+app.learning_tool.wait_for_startup()
+status = client.get('/readyz').status_code
+ready = time.perf_counter() - start
+app.learning_tool.shutdown()
+print({RESULT_MARKER!r} + json.dumps({{
+    'import_seconds': imported, 'first_page_seconds': first_page, 'ready_seconds': ready,
+    'readyz_status': status, 'stages': app.learning_tool.startup_timings,
+}}))
+"""
+
+
+def run_once(background_load, extra_env):
+    env = dict(os.environ, **extra_env)
+    env['EMOTION_BACKGROUND_LOAD'] = '1' if background_load else '0'
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', PROBE], cwd=project_root, env=env,
+                               capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+            result['process_wall_seconds'] = wall
+            return result
+    print(completed.stdout[-2000:])
+    print(completed.stderr[-2000:])
+    raise RuntimeError(f"Startup probe failed with exit code {completed.returncode}")
+
+
+def summarize(runs):
+    keys = ('import_seconds', 'first_page_seconds', 'ready_seconds', 'process_wall_seconds')
+    summary = {key: float(np.median([r[key] for r in runs])) for key in keys}
+    stage_names = sorted({name for r in runs for name in r['stages']})
+    summary['stages'] = {name: float(np.median([r['stages'][name] for r in runs if name in r['stages']]))
+                         for name in stage_names}
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help="Fresh processes per mode")
+    parser.add_argument('--modes', nargs='+', default=['background', 'eager'], choices=['background', 'eager'])
+    parser.add_argument('--backend', help="EMOTION_INFERENCE_BACKEND for the runs")
+    parser.add_argument('--model-file', help="EMOTION_MODEL_FILE for the runs")
+    parser.add_argument('--output', help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    extra_env = {}
+    if args.backend:
+        extra_env['EMOTION_INFERENCE_BACKEND'] = args.backend
+    if args.model_file:
+        extra_env['EMOTION_MODEL_FILE'] = args.model_file
+
+    results = {}
+    for mode in args.modes:
+        runs = [run_once(mode == 'background', extra_env) for _ in range(args.runs)]
+        results[mode] = {'summary': summarize(runs), 'runs': runs}
+
+    print(f"\n{'mode':<11} {'import s':>9} {'first page s':>13} {'ready s':>8} {'process s':>10}   stages (s)")
+    for mode, result in results.items():
+        s = result['summary']
+        stages = ', '.join(f"{name} {seconds:.2f}" for name, seconds in s['stages'].items())
+        print(f"{mode:<11} {s['import_seconds']:>9.2f} {s['first_page_seconds']:>13.2f} "
+              f"{s['ready_seconds']:>8.2f} {s['process_wall_seconds']:>10.2f}   {stages}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'git_revision': git_revision(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'platform': platform.platform(),
+                'python': platform.python_version(),
+                'runs': args.runs,
+                'backend': args.backend,
+                'model_file': args.model_file,
+                'results': results,
+            }, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Builds the static asset cache ahead of time: WebP and JPEG/PNG derivatives of
+the page and learning-content images at several widths, plus gzip (and, with
+the brotli module, brotli) precompressed CSS/JS. See
+SpecialNeedsEmotionAssistant/asset_cache.py.
+
+The app builds the same cache in the background at startup (unless
+EMOTION_BUILD_ASSETS=0), so running this is optional. It is useful as a
+deployment step, so the first requests already get the small files.
+
+    python build_assets.py
+    python build_assets.py --widths 240 480 960 --prune
+"""
+import argparse
+import os
+import shutil
+import sys
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+sna_path = os.path.join(project_root, 'SpecialNeedsEmotionAssistant')
+if sna_path not in sys.path:
+    sys.path.insert(0, sna_path)
+
+from asset_cache import AssetCache, DEFAULT_IMAGE_WIDTHS, brotli
+
+DEFAULT_CACHE_DIR = os.path.join(project_root, 'asset_cache')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--static-folder', default=os.path.join(sna_path, 'assets'))
+    parser.add_argument('--cache-dir', default=os.environ.get('EMOTION_ASSET_CACHE_DIR') or DEFAULT_CACHE_DIR)
+    parser.add_argument('--widths', type=int, nargs='+', default=list(DEFAULT_IMAGE_WIDTHS),
+                        help="Image widths to generate (plus each image's own width)")
+    parser.add_argument('--webp-quality', type=int, default=80)
+    parser.add_argument('--jpeg-quality', type=int, default=82)
+    parser.add_argument('--prune', action='store_true', help="Delete cache files that are no longer referenced")
+    parser.add_argument('--rebuild', action='store_true', help="Discard the existing cache and build from scratch")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.isdir(args.cache_dir):
+        shutil.rmtree(args.cache_dir)
+    cache = AssetCache(args.static_folder, args.cache_dir, widths=args.widths,
+                       webp_quality=args.webp_quality, jpeg_quality=args.jpeg_quality)
+    cache.load()
+    if brotli is None:
+        print("Info: brotli not installed; only gzip variants are built (pip install brotli).")
+    stats = cache.build(prune=args.prune)
+
+    mb = 1024 * 1024
+    print(f"Images: {stats['image_bytes_original'] / mb:.2f} MB originals, "
+          f"{stats['image_bytes_smallest'] / mb:.2f} MB as the smallest full-width derivative")
+    if stats['text_bytes_original']:
+        print(f"CSS/JS: {stats['text_bytes_original'] / mb:.2f} MB, {stats['text_bytes_gzip'] / mb:.2f} MB gzipped "
+              f"({stats['text_files']} files)")
+    if 'files_pruned' in stats:
+        print(f"Pruned {stats['files_pruned']} unreferenced files")
+    print(f"Cache: {cache.cache_dir}")
+
+
+if __name__ == '__main__':
+    main()
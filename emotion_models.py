@@ -0,0 +1,88 @@
+"""
+Model architectures for the FER2013 emotion classifier.
+
+Both take a 48x48x1 face crop scaled to [0, 1] and output softmax
+probabilities over the 7 FER2013 emotions, so either can be served by
+EmotionDetector.
+
+    baseline  The original Sequential CNN (64->128->256->512 3x3 convs, Dense 256).
+    student   A compact depthwise-separable CNN, trained by distillation from
+              the baseline (train_model.py --mode distill).
+"""
+IMG_HEIGHT, IMG_WIDTH = 48, 48
+NUM_CLASSES = 7
+ARCHITECTURES = ('baseline', 'student')
+
+
+def build_baseline_model(num_classes=NUM_CLASSES):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Input, Conv2D, MaxPooling2D, Flatten, Dense, Dropout, BatchNormalization
+    return Sequential([
+        Input(shape=(IMG_HEIGHT, IMG_WIDTH, 1)),
+        Conv2D(64, (3, 3), activation='relu', padding='same'), BatchNormalization(), MaxPooling2D(2, 2),
+        Conv2D(128, (3, 3), activation='relu', padding='same'), BatchNormalization(), MaxPooling2D(2, 2),
+        Conv2D(256, (3, 3), activation='relu', padding='same'), BatchNormalization(), MaxPooling2D(2, 2),
+        Conv2D(512, (3, 3), activation='relu', padding='same'), BatchNormalization(), MaxPooling2D(2, 2),
+        Flatten(), Dense(256, activation='relu'), BatchNormalization(), Dropout(0.5),
+        # Keep the softmax in float32 so mixed-precision training stays numerically stable.
+        Dense(num_classes, activation='softmax', dtype='float32'),
+    ], name='baseline')
+
+
+def build_student_model(num_classes=NUM_CLASSES):
+    """
+    Depthwise-separable student: one regular 3x3 stem conv, then separable
+    blocks that double the channels at each resolution, and global average
+    pooling instead of the baseline's 4608->256 dense layer.
+    """
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import (Input, Conv2D, SeparableConv2D, MaxPooling2D, GlobalAveragePooling2D,
+                                         Dense, Dropout, BatchNormalization, ReLU)
+
+    def separable_block(filters):
+        return [SeparableConv2D(filters, (3, 3), padding='same', use_bias=False), BatchNormalization(), ReLU()]
+
+    return Sequential([
+        Input(shape=(IMG_HEIGHT, IMG_WIDTH, 1)),
+        Conv2D(32, (3, 3), padding='same', use_bias=False), BatchNormalization(), ReLU(),
+        *separable_block(64), MaxPooling2D(2, 2),
+        *separable_block(128), MaxPooling2D(2, 2),
+        *separable_block(256), MaxPooling2D(2, 2),
+        *separable_block(512),
+        GlobalAveragePooling2D(), Dropout(0.3),
+        Dense(num_classes, activation='softmax', dtype='float32'),
+    ], name='student')
+
+
+def build_model(architecture='baseline', num_classes=NUM_CLASSES):
+    if architecture == 'baseline':
+        return build_baseline_model(num_classes)
+    if architecture == 'student':
+        return build_student_model(num_classes)
+    raise ValueError(f"Unknown architecture '{architecture}'. Choose from {ARCHITECTURES}.")
+
+
+def count_flops(model):
+    """
+    Multiply-accumulates for one image through the conv, separable-conv and
+    dense layers (the rest is negligible), times two to report FLOPs.
+    """
+    from tensorflow.keras.layers import Conv2D, Dense, DepthwiseConv2D, SeparableConv2D
+    macs = 0
+    for layer in model.layers:
+        out_shape = layer.output.shape
+        if isinstance(layer, SeparableConv2D):
+            kh, kw = layer.kernel_size
+            in_channels = layer.input.shape[-1]
+            spatial = out_shape[1] * out_shape[2]
+            macs += spatial * kh * kw * in_channels * layer.depth_multiplier
+            macs += spatial * in_channels * layer.depth_multiplier * layer.filters
+        elif isinstance(layer, DepthwiseConv2D):
+            kh, kw = layer.kernel_size
+            macs += out_shape[1] * out_shape[2] * kh * kw * out_shape[3]
+        elif isinstance(layer, Conv2D):
+            kh, kw = layer.kernel_size
+            macs += out_shape[1] * out_shape[2] * kh * kw * layer.input.shape[-1] * layer.filters
+        elif isinstance(layer, Dense):
+            macs += layer.input.shape[-1] * layer.units
+    return 2 * int(macs)
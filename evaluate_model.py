@@ -0,0 +1,193 @@
+"""
+Evaluates a trained emotion model on the FER2013 test splits.
+
+Images come from the memory-mapped FER2013 cache (see fer_dataset.py) and are
+classified in large batches through the same inference backend EmotionDetector
+would use (--backend), so .h5, int8 .tflite and .onnx models can be compared
+directly. For each split (PublicTest and PrivateTest by default) it reports:
+
+    accuracy             argmax of the model output
+    deployed accuracy    with EmotionDetector's confidence threshold applied
+                         (low-confidence predictions become Neutral)
+    per-class            precision, recall, F1 and support
+    confusion matrix     rows are true labels, columns predictions
+
+It also checks that every label list in the repo matches the FER2013 class
+order the models are trained on (fer_dataset.EMOTION_LABELS), including any
+list defined in real_time_emotion.py.
+
+    python evaluate_model.py --backend tflite --model-file emotion_model_augmented_weighted_int8.tflite
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+sna_path = os.path.join(project_root, 'SpecialNeedsEmotionAssistant')
+if sna_path not in sys.path:
+    sys.path.insert(0, sna_path)
+
+from fer_dataset import DATASET_PATH, EMOTION_LABELS, open_fer2013
+
+TEST_SPLITS = ('PublicTest', 'PrivateTest')
+# Scripts that might define their own label list, checked by check_label_orders().
+LABEL_LIST_SCRIPTS = ('real_time_emotion.py',)
+
+
+def find_label_lists(path):
+    """Returns {name: labels} for module-level list/tuple literals of emotion names in a script."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    found = {}
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Assign) or not isinstance(node.value, (ast.List, ast.Tuple)):
+            continue
+        values = [elt.value for elt in node.value.elts if isinstance(elt, ast.Constant)]
+        if len(values) == len(EMOTION_LABELS) and set(values) == set(EMOTION_LABELS):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    found[target.id] = values
+    return found
+
+
+def check_label_orders(detector_labels):
+    """Compares each label list against the FER2013 order. Returns a list of mismatches."""
+    reference = list(EMOTION_LABELS)
+    candidates = {'EmotionDetector.emotion_labels': list(detector_labels)}
+    for script in LABEL_LIST_SCRIPTS:
+        path = os.path.join(project_root, script)
+        if os.path.exists(path):
+            for name, labels in find_label_lists(path).items():
+                candidates[f'{script}:{name}'] = labels
+
+    mismatches = []
+    for name, labels in candidates.items():
+        if labels == reference:
+            print(f"Label order OK: {name}")
+            continue
+        differences = [f"{i}: {labels[i]} (expected {reference[i]})" for i in range(len(reference))
+                       if labels[i] != reference[i]]
+        print(f"LABEL ORDER MISMATCH: {name} -> " + ', '.join(differences))
+        mismatches.append({'name': name, 'labels': labels, 'differences': differences})
+    return mismatches
+
+
+def predict_split(backend, images, batch_size):
+    """Runs the model over uint8 (N, 48, 48) images in batches. Returns (N, 7) probabilities."""
+    outputs = []
+    for start in range(0, len(images), batch_size):
+        batch = np.asarray(images[start:start + batch_size], dtype=np.float32)
+        batch /= 255.0
+        outputs.append(np.asarray(backend.predict(batch[..., np.newaxis]), dtype=np.float32))
+    return np.concatenate(outputs) if outputs else np.empty((0, len(EMOTION_LABELS)), dtype=np.float32)
+
+
+def confusion_matrix(true, predicted, num_classes=len(EMOTION_LABELS)):
+    return np.bincount(true * num_classes + predicted, minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+
+def per_class_metrics(matrix):
+    true_positives = np.diag(matrix).astype(np.float64)
+    predicted = matrix.sum(axis=0)
+    support = matrix.sum(axis=1)
+    precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=predicted > 0)
+    recall = np.divide(true_positives, support, out=np.zeros_like(true_positives), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(precision),
+                   where=(precision + recall) > 0)
+    return [{'label': label, 'precision': float(p), 'recall': float(r), 'f1': float(f), 'support': int(s)}
+            for label, p, r, f, s in zip(EMOTION_LABELS, precision, recall, f1, support)]
+
+
+def evaluate_split(backend, dataset, split, batch_size, confidence_threshold):
+    indices = dataset.indices_for_usage(split)
+    if len(indices) == 0:
+        return None
+    true = np.asarray(dataset.labels[indices], dtype=np.int64)
+    start = time.perf_counter()
+    probabilities = predict_split(backend, dataset.images[indices], batch_size)
+    seconds = time.perf_counter() - start
+
+    predicted = probabilities.argmax(axis=1)
+    # EmotionDetector reports Neutral below the confidence threshold.
+    deployed = np.where(probabilities.max(axis=1) >= confidence_threshold, predicted, EMOTION_LABELS.index('Neutral'))
+    matrix = confusion_matrix(true, predicted)
+    classes = per_class_metrics(matrix)
+    return {
+        'split': split,
+        'images': int(len(true)),
+        'accuracy': float(np.mean(predicted == true)),
+        'deployed_accuracy': float(np.mean(deployed == true)),
+        'macro_f1': float(np.mean([c['f1'] for c in classes])),
+        'seconds': seconds,
+        'images_per_sec': len(true) / seconds if seconds > 0 else None,
+        'per_class': classes,
+        'confusion_matrix': matrix.tolist(),
+    }
+
+
+def print_report(result):
+    print(f"\n{result['split']}: {result['images']} images in {result['seconds']:.2f}s "
+          f"({result['images_per_sec']:.0f} images/s)")
+    print(f"accuracy {result['accuracy']:.4f}  deployed accuracy {result['deployed_accuracy']:.4f}  "
+          f"macro F1 {result['macro_f1']:.4f}")
+    print(f"{'class':<10} {'precision':>9} {'recall':>8} {'f1':>8} {'support':>8}")
+    for c in result['per_class']:
+        print(f"{c['label']:<10} {c['precision']:>9.4f} {c['recall']:>8.4f} {c['f1']:>8.4f} {c['support']:>8d}")
+    print("confusion matrix (rows: true, columns: predicted)")
+    print(' ' * 10 + ''.join(f"{label[:7]:>8}" for label in EMOTION_LABELS))
+    for label, row in zip(EMOTION_LABELS, result['confusion_matrix']):
+        print(f"{label:<10}" + ''.join(f"{count:>8d}" for count in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='baseline', help="Named model ('baseline' or 'student')")
+    parser.add_argument('--model-file', help="Model file in pretrained_models/ (overrides --model)")
+    parser.add_argument('--backend', default='auto', help="Inference backend (auto, keras, tflite, onnxruntime, opencv)")
+    parser.add_argument('--num-threads', type=int, help="CPU threads for the inference runtime")
+    parser.add_argument('--csv', default=os.path.join(project_root, DATASET_PATH))
+    parser.add_argument('--splits', nargs='+', default=list(TEST_SPLITS), choices=['Training', *TEST_SPLITS])
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--confidence-threshold', type=float, default=0.30,
+                        help="Threshold for the deployed accuracy (EmotionDetector's default)")
+    parser.add_argument('--output', help="Optional path for a JSON report")
+    args = parser.parse_args()
+
+    from emotion_detector import EmotionDetector
+    detector = EmotionDetector(confidence_threshold=args.confidence_threshold, backend=args.backend,
+                               num_threads=args.num_threads, model_filename=args.model_file, model=args.model)
+    mismatches = check_label_orders(detector.emotion_labels)
+
+    dataset = open_fer2013(args.csv)
+    results = []
+    for split in args.splits:
+        result = evaluate_split(detector.model, dataset, split, args.batch_size, args.confidence_threshold)
+        if result is None:
+            print(f"Warning: no '{split}' rows in {args.csv}")
+            continue
+        print_report(result)
+        results.append(result)
+    if not results:
+        print("Error: nothing to evaluate.")
+        sys.exit(1)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'model': detector.model_filename, 'backend': repr(detector.model), 'labels': list(EMOTION_LABELS),
+                'confidence_threshold': args.confidence_threshold, 'label_mismatches': mismatches,
+                'results': results,
+            }, f, indent=2)
+        print(f"Report saved to {args.output}")
+    if mismatches:
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
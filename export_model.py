@@ -0,0 +1,239 @@
+"""
+Exports compressed variants of the trained emotion model for CPU serving.
+
+From the Keras .h5 model this writes, next to it in pretrained_models/:
+
+    <name>_float32.tflite        plain conversion (the accuracy/latency baseline)
+    <name>_dynamic.tflite        dynamic-range int8 (int8 weights, float activations)
+    <name>_int8.tflite           full-integer int8, calibrated on a FER2013 Training subset
+    <name>_pruned.h5             magnitude-pruned Keras model (conv/dense kernels)
+    <name>_pruned_int8.tflite    pruned + full-integer int8
+
+and reports file size (raw and gzipped, which is where pruning's zeros pay off),
+single-face latency and accuracy on the validation split (PublicTest) against
+the float32 baseline. Any of the .tflite files can be loaded by EmotionDetector
+directly, e.g. EMOTION_MODEL_FILE=emotion_model_augmented_weighted_int8.tflite.
+
+    python export_model.py --sparsity 0.5 --finetune-epochs 2
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+sna_path = os.path.join(project_root, 'SpecialNeedsEmotionAssistant')
+if sna_path not in sys.path:
+    sys.path.insert(0, sna_path)
+
+from fer_dataset import DATASET_PATH, EMOTION_LABELS, open_fer2013
+from inference_backends import KerasBackend, TFLiteBackend, load_float32_keras_model
+
+DEFAULT_MODEL_PATH = os.path.join(project_root, 'pretrained_models', 'emotion_model_augmented_weighted.h5')
+VALIDATION_SPLIT = 'PublicTest'
+CALIBRATION_SPLIT = 'Training'
+
+
+def to_model_input(images):
+    """uint8 (N, 48, 48) -> float32 (N, 48, 48, 1) in [0, 1], as EmotionDetector feeds the model."""
+    return (np.asarray(images, dtype=np.float32) / 255.0)[..., np.newaxis]
+
+
+def calibration_subset(dataset, size, seed=0):
+    """Class-stratified sample of Training images for full-integer calibration."""
+    rng = np.random.default_rng(seed)
+    training = set(dataset.indices_for_usage(CALIBRATION_SPLIT).tolist())
+    per_class = max(1, size // len(EMOTION_LABELS))
+    picked = []
+    for label in range(len(EMOTION_LABELS)):
+        candidates = [i for i in dataset.indices_for_class(label) if i in training]
+        if candidates:
+            picked.extend(rng.choice(candidates, size=min(per_class, len(candidates)), replace=False))
+    if not picked:
+        raise ValueError(f"No '{CALIBRATION_SPLIT}' images available for calibration.")
+    return to_model_input(dataset.images[np.sort(picked)])
+
+
+def convert_to_tflite(model, output_path, mode='float32', calibration_images=None):
+    """
+    Converts a Keras model to TFLite.
+
+    Args:
+        mode: 'float32', 'dynamic' (int8 weights only) or 'int8' (int8 weights,
+            activations, input and output; needs calibration_images).
+    """
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if mode in ('dynamic', 'int8'):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == 'int8':
+        if calibration_images is None:
+            raise ValueError("Full-integer quantization needs calibration images.")
+
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(converter.convert())
+    os.replace(tmp_path, output_path)
+    print(f"Saved {mode} TFLite model to {output_path}")
+    return output_path
+
+
+def magnitude_masks(model, sparsity):
+    """Per-layer masks that zero the smallest-magnitude sparsity fraction of each conv/dense kernel."""
+    masks = {}
+    for layer in model.layers:
+        if not hasattr(layer, 'kernel') or layer.kernel is None:
+            continue
+        kernel = layer.kernel.numpy()
+        threshold = np.quantile(np.abs(kernel), sparsity)
+        masks[layer.name] = np.abs(kernel) > threshold
+    return masks
+
+
+def apply_masks(model, masks):
+    for layer in model.layers:
+        if layer.name in masks:
+            layer.kernel.assign(layer.kernel.numpy() * masks[layer.name])
+
+
+def prune_model(model_path, sparsity, dataset=None, finetune_epochs=0, batch_size=64, learning_rate=1e-4):
+    """
+    Loads the model and prunes its kernels by magnitude. With finetune_epochs > 0
+    it is fine-tuned on the Training split, re-applying the masks after every
+    batch so pruned weights stay zero.
+    """
+    import tensorflow as tf
+    model = load_float32_keras_model(model_path)
+    masks = magnitude_masks(model, sparsity)
+    apply_masks(model, masks)
+    print(f"Pruned {len(masks)} layers to {sparsity:.0%} sparsity.")
+
+    if finetune_epochs > 0 and dataset is not None:
+        from fer_pipeline import build_dataset
+        train_idx = dataset.indices_for_usage(CALIBRATION_SPLIT)
+        train_ds = build_dataset(dataset.images[train_idx], dataset.labels[train_idx],
+                                 batch_size=batch_size, training=True)
+        keep_pruned = tf.keras.callbacks.LambdaCallback(on_train_batch_end=lambda batch, logs: apply_masks(model, masks))
+        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                      loss='categorical_crossentropy', metrics=['accuracy'])
+        model.fit(train_ds, epochs=finetune_epochs, callbacks=[keep_pruned], verbose=2)
+    return model
+
+
+def gzipped_size(path):
+    with open(path, 'rb') as f:
+        return len(gzip.compress(f.read(), compresslevel=9))
+
+
+def evaluate(backend, images, labels, batch_size=256):
+    predictions = []
+    for start in range(0, len(images), batch_size):
+        predictions.append(np.argmax(backend.predict(to_model_input(images[start:start + batch_size])), axis=1))
+    return float(np.mean(np.concatenate(predictions) == labels)) if len(labels) else None
+
+
+def single_face_latency_ms(backend, image, repeats=200, warmup=10):
+    batch = to_model_input(image[np.newaxis])
+    for _ in range(warmup):
+        backend.predict(batch)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend.predict(batch)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(timings)), float(np.percentile(timings, 95))
+
+
+def report_variant(name, path, backend, val_images, val_labels, repeats):
+    accuracy = evaluate(backend, val_images, val_labels)
+    latency_p50, latency_p95 = single_face_latency_ms(backend, val_images[0], repeats)
+    return {
+        'variant': name, 'path': path,
+        'size_bytes': os.path.getsize(path), 'gzip_bytes': gzipped_size(path),
+        'latency_ms_p50': latency_p50, 'latency_ms_p95': latency_p95,
+        'accuracy': accuracy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help="Trained Keras .h5 model")
+    parser.add_argument('--csv', default=os.path.join(project_root, DATASET_PATH))
+    parser.add_argument('--output-dir', help="Where to write the variants (defaults to the model's directory)")
+    parser.add_argument('--calibration-size', type=int, default=500)
+    parser.add_argument('--sparsity', type=float, default=0.5, help="Fraction of each kernel to prune (0 skips pruning)")
+    parser.add_argument('--finetune-epochs', type=int, default=0, help="Fine-tune the pruned model for N epochs")
+    parser.add_argument('--num-threads', type=int, default=1, help="TFLite threads for the latency measurement")
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--report', help="Report path (defaults to <output-dir>/<name>_export_report.json)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"Error: model not found at {args.model}")
+        sys.exit(1)
+    output_dir = args.output_dir or os.path.dirname(os.path.abspath(args.model))
+    os.makedirs(output_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.model))[0]
+    artifact = lambda suffix: os.path.join(output_dir, f'{name}_{suffix}')
+
+    dataset = open_fer2013(args.csv)
+    val_idx = dataset.indices_for_usage(VALIDATION_SPLIT)
+    if len(val_idx) == 0:
+        print(f"Error: no '{VALIDATION_SPLIT}' rows in {args.csv}")
+        sys.exit(1)
+    val_images = np.asarray(dataset.images[val_idx])
+    val_labels = np.asarray(dataset.labels[val_idx], dtype=np.int64)
+    calibration = calibration_subset(dataset, args.calibration_size)
+    print(f"Validation images: {len(val_labels)}, calibration images: {len(calibration)}")
+
+    model = load_float32_keras_model(args.model)
+    variants = [('keras', args.model, KerasBackend(args.model))]
+    for mode in ('float32', 'dynamic', 'int8'):
+        path = convert_to_tflite(model, artifact(f'{mode}.tflite'), mode, calibration)
+        variants.append((mode, path, TFLiteBackend(path, num_threads=args.num_threads)))
+
+    if args.sparsity > 0:
+        pruned = prune_model(args.model, args.sparsity, dataset, args.finetune_epochs)
+        pruned_path = artifact('pruned.h5')
+        pruned.save(pruned_path, include_optimizer=False)
+        variants.append(('pruned', pruned_path, KerasBackend(pruned_path)))
+        path = convert_to_tflite(pruned, artifact('pruned_int8.tflite'), 'int8', calibration)
+        variants.append(('pruned_int8', path, TFLiteBackend(path, num_threads=args.num_threads)))
+
+    results = [report_variant(*variant, val_images, val_labels, args.repeats) for variant in variants]
+    baseline = next(r for r in results if r['variant'] == 'float32')
+    for r in results:
+        r['accuracy_delta'] = r['accuracy'] - baseline['accuracy']
+        r['size_ratio'] = r['size_bytes'] / baseline['size_bytes']
+
+    print(f"\nValidation split: {VALIDATION_SPLIT} ({len(val_labels)} images)")
+    print(f"{'variant':<12} {'size KB':>9} {'gzip KB':>9} {'p50 ms':>8} {'p95 ms':>8} {'accuracy':>9} {'delta':>8}")
+    for r in results:
+        print(f"{r['variant']:<12} {r['size_bytes'] / 1024:>9.1f} {r['gzip_bytes'] / 1024:>9.1f} "
+              f"{r['latency_ms_p50']:>8.3f} {r['latency_ms_p95']:>8.3f} {r['accuracy']:>9.4f} {r['accuracy_delta']:>+8.4f}")
+
+    report_path = args.report or artifact('export_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'model': args.model, 'validation_split': VALIDATION_SPLIT, 'validation_images': int(len(val_labels)),
+            'calibration_images': int(len(calibration)), 'sparsity': args.sparsity,
+            'finetune_epochs': args.finetune_epochs, 'num_threads': args.num_threads, 'results': results,
+        }, f, indent=2)
+    print(f"Report saved to {report_path}")
+
+
+if __name__ == '__main__':
+    main()
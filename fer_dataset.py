@@ -0,0 +1,236 @@
+"""
+Vectorised loader for the FER2013 CSV.
+
+The pixels column is parsed a chunk at a time: every row's pixel string in a
+chunk is joined into one buffer and parsed with a single np.fromstring call,
+so there is no per-row Python work and images stay uint8 until the caller
+decides how to scale them.
+
+The parsed dataset is cached once as .npy files next to the CSV (uint8
+images, int8 labels and usage codes, plus per-class and per-split index
+tables). Later loads memory-map the cache, so startup is near-instant and
+the pages are shared between processes. The cache is rebuilt whenever the
+CSV's size or modification time changes.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DATASET_PATH = "fer2013.csv"
+IMG_HEIGHT, IMG_WIDTH = 48, 48
+NUM_PIXELS = IMG_HEIGHT * IMG_WIDTH
+# Index order of the FER2013 'emotion' column.
+EMOTION_LABELS = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
+USAGE_SPLITS = ['Training', 'PublicTest', 'PrivateTest']
+CACHE_VERSION = 1
+
+
+def parse_pixel_strings(pixel_strings):
+    """
+    Parses a sequence of space-separated pixel strings into a (N, 48, 48) uint8
+    array. Rows without exactly 48*48 values are dropped.
+
+    Returns:
+        (images, valid_mask) where valid_mask marks the rows that were kept.
+    """
+    pixel_strings = pd.Series(pixel_strings, dtype=object).fillna('').str.strip()
+    valid_mask = (pixel_strings.str.count(' ') + 1).to_numpy() == NUM_PIXELS
+    valid = pixel_strings[valid_mask]
+    if valid.empty:
+        return np.empty((0, IMG_HEIGHT, IMG_WIDTH), dtype=np.uint8), valid_mask
+    flat = np.fromstring(' '.join(valid), dtype=np.uint8, sep=' ')
+    return flat.reshape(-1, IMG_HEIGHT, IMG_WIDTH), valid_mask
+
+
+def iter_fer2013_chunks(csv_path=DATASET_PATH, chunksize=4096):
+    """
+    Streams the CSV in chunks, yielding (images, labels, usage) per chunk:
+    uint8 (n, 48, 48) images, int8 labels and an array of Usage strings
+    (empty strings if the CSV has no Usage column).
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Dataset file not found: {csv_path}")
+
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype={'emotion': np.int8, 'pixels': str}):
+        images, valid_mask = parse_pixel_strings(chunk['pixels'])
+        labels = chunk['emotion'].to_numpy(dtype=np.int8)[valid_mask]
+        if 'Usage' in chunk.columns:
+            usage = chunk['Usage'].to_numpy(dtype=str)[valid_mask]
+        else:
+            usage = np.full(len(labels), '', dtype=str)
+        yield images, labels, usage
+
+
+def default_cache_dir(csv_path):
+    return os.path.splitext(os.path.abspath(csv_path))[0] + '_cache'
+
+
+def _csv_signature(csv_path, with_hash=False):
+    stat = os.stat(csv_path)
+    signature = {'version': CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(csv_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        signature['sha256'] = digest.hexdigest()
+    return signature
+
+
+def _index_table(codes, num_codes):
+    """Stable sort of row indices by code plus offsets, so rows with code c are order[offsets[c]:offsets[c + 1]]."""
+    order = np.argsort(codes, kind='stable').astype(np.int32)
+    offsets = np.searchsorted(codes[order], np.arange(num_codes + 1)).astype(np.int64)
+    return order, offsets
+
+
+def build_cache(csv_path=DATASET_PATH, cache_dir=None, chunksize=4096):
+    """Parses the CSV once and writes the binary cache. Returns the cache directory."""
+    cache_dir = cache_dir or default_cache_dir(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    print(f"Building FER2013 cache from {csv_path} in {cache_dir}...")
+    chunks = list(iter_fer2013_chunks(csv_path, chunksize))
+    images = np.concatenate([c[0] for c in chunks]) if chunks else np.empty((0, IMG_HEIGHT, IMG_WIDTH), np.uint8)
+    labels = np.concatenate([c[1] for c in chunks]) if chunks else np.empty(0, np.int8)
+    usage_str = np.concatenate([c[2] for c in chunks]) if chunks else np.empty(0, str)
+
+    # Unknown/missing Usage values get code len(USAGE_SPLITS).
+    usage = np.full(len(usage_str), len(USAGE_SPLITS), dtype=np.int8)
+    for code, split in enumerate(USAGE_SPLITS):
+        usage[usage_str == split] = code
+
+    class_order, class_offsets = _index_table(labels, len(EMOTION_LABELS))
+    usage_order, usage_offsets = _index_table(usage, len(USAGE_SPLITS) + 1)
+
+    arrays = {
+        'images': images, 'labels': labels, 'usage': usage,
+        'class_order': class_order, 'class_offsets': class_offsets,
+        'usage_order': usage_order, 'usage_offsets': usage_offsets,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(cache_dir, f'{name}.npy'), array)
+
+    # meta.json is written last: a cache without it is treated as incomplete.
+    meta = dict(_csv_signature(csv_path, with_hash=True), rows=int(len(labels)))
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    print(f"FER2013 cache built: {len(labels)} images.")
+    return cache_dir
+
+
+def cache_is_valid(csv_path=DATASET_PATH, cache_dir=None):
+    cache_dir = cache_dir or default_cache_dir(csv_path)
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return False
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not os.path.exists(csv_path):
+        # The cache can stand in for a CSV that has since been removed.
+        return True
+    signature = _csv_signature(csv_path)
+    return all(meta.get(key) == value for key, value in signature.items())
+
+
+class FER2013Dataset:
+    """
+    Memory-mapped view of the cached dataset. Filtering by class or split
+    is an index lookup into precomputed tables rather than a scan.
+    """
+
+    def __init__(self, cache_dir, mmap=True):
+        mode = 'r' if mmap else None
+        load = lambda name: np.load(os.path.join(cache_dir, f'{name}.npy'), mmap_mode=mode)
+        self.cache_dir = cache_dir
+        self.images = load('images')
+        self.labels = load('labels')
+        self.usage = load('usage')
+        self._class_order = load('class_order')
+        self._class_offsets = load('class_offsets')
+        self._usage_order = load('usage_order')
+        self._usage_offsets = load('usage_offsets')
+
+    def __len__(self):
+        return len(self.labels)
+
+    def indices_for_class(self, label):
+        """Row indices of images with the given emotion index, in file order."""
+        return np.asarray(self._class_order[self._class_offsets[label]:self._class_offsets[label + 1]])
+
+    def indices_for_usage(self, split):
+        """Row indices for a Usage split ('Training', 'PublicTest' or 'PrivateTest'), in file order."""
+        code = USAGE_SPLITS.index(split)
+        return np.asarray(self._usage_order[self._usage_offsets[code]:self._usage_offsets[code + 1]])
+
+    def usage_names(self, indices=None):
+        names = np.array(USAGE_SPLITS + [''])
+        codes = self.usage if indices is None else self.usage[indices]
+        return names[np.asarray(codes)]
+
+
+def open_fer2013(csv_path=DATASET_PATH, cache_dir=None, mmap=True, rebuild=False):
+    """Opens the cached dataset, building or refreshing the cache from the CSV first if needed."""
+    cache_dir = cache_dir or default_cache_dir(csv_path)
+    if rebuild or not cache_is_valid(csv_path, cache_dir):
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"Dataset file not found: {csv_path}")
+        build_cache(csv_path, cache_dir)
+    return FER2013Dataset(cache_dir, mmap=mmap)
+
+
+def _load_from_csv(csv_path, usage, chunksize):
+    all_images, all_labels, all_usage = [], [], []
+    for images, labels, chunk_usage in iter_fer2013_chunks(csv_path, chunksize):
+        if usage is not None:
+            keep = np.isin(chunk_usage, usage)
+            images, labels, chunk_usage = images[keep], labels[keep], chunk_usage[keep]
+        all_images.append(images)
+        all_labels.append(labels)
+        all_usage.append(chunk_usage)
+
+    if not all_images:
+        return (np.empty((0, IMG_HEIGHT, IMG_WIDTH), dtype=np.uint8),
+                np.empty(0, dtype=np.int8), np.empty(0, dtype=str))
+    return np.concatenate(all_images), np.concatenate(all_labels), np.concatenate(all_usage)
+
+
+def load_fer2013(csv_path=DATASET_PATH, usage=None, chunksize=4096, use_cache=True):
+    """
+    Loads FER2013.
+
+    Args:
+        csv_path: Path to fer2013.csv.
+        usage: Optional Usage value or list of values ('Training',
+            'PublicTest', 'PrivateTest') to keep.
+        chunksize: Rows parsed per chunk when reading the CSV.
+        use_cache: Read from (and build if needed) the binary cache. Without a
+            filter the returned images/labels are read-only memory maps.
+
+    Returns:
+        (images, labels, usage) as uint8 (N, 48, 48), int8 (N,) and str (N,) arrays.
+    """
+    if isinstance(usage, str):
+        usage = [usage]
+
+    if use_cache:
+        try:
+            dataset = open_fer2013(csv_path)
+        except OSError as e:
+            print(f"Warning: FER2013 cache unavailable ({e}); parsing the CSV directly.")
+        else:
+            if usage is None:
+                return dataset.images, dataset.labels, dataset.usage_names()
+            indices = np.sort(np.concatenate([dataset.indices_for_usage(split) for split in usage]))
+            return dataset.images[indices], dataset.labels[indices], dataset.usage_names(indices)
+
+    return _load_from_csv(csv_path, usage, chunksize)
@@ -0,0 +1,125 @@
+"""
+tf.data input pipeline for FER2013 training.
+
+Replaces ImageDataGenerator.flow: augmentation (rotation, shift, shear, zoom,
+horizontal flip) is applied to a whole batch at once as one projective
+transform per image, runs in parallel with num_parallel_calls=AUTOTUNE, and
+uses stateless random ops seeded from (seed, batch index) so runs are
+reproducible. The decoded uint8 images can be cached in memory and batches
+are prefetched while the model trains.
+"""
+import math
+import time
+
+import numpy as np
+import tensorflow as tf
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# Same ranges as the ImageDataGenerator previously used in train_model.py.
+ROTATION_RANGE_DEG = 15.0
+WIDTH_SHIFT_RANGE = 0.1
+HEIGHT_SHIFT_RANGE = 0.1
+SHEAR_RANGE_DEG = 0.1
+ZOOM_RANGE = 0.1
+
+
+def _augmentation_transforms(batch_size, height, width, seed):
+    """Builds (B, 8) projective transforms mapping output pixels to input pixels."""
+    seeds = tf.random.experimental.stateless_split(seed, num=6)
+    uniform = lambda i, low, high: tf.random.stateless_uniform([batch_size], seeds[i], low, high)
+
+    theta = uniform(0, -1.0, 1.0) * (ROTATION_RANGE_DEG * math.pi / 180.0)
+    tx = uniform(1, -1.0, 1.0) * (WIDTH_SHIFT_RANGE * width)
+    ty = uniform(2, -1.0, 1.0) * (HEIGHT_SHIFT_RANGE * height)
+    shear = uniform(3, -1.0, 1.0) * (SHEAR_RANGE_DEG * math.pi / 180.0)
+    zoom = tf.random.stateless_uniform([batch_size, 2], seeds[4], 1.0 - ZOOM_RANGE, 1.0 + ZOOM_RANGE)
+    flip = tf.where(tf.random.stateless_uniform([batch_size], seeds[5]) < 0.5, -1.0, 1.0)
+
+    zx, zy = zoom[:, 0], zoom[:, 1]
+    cos_t, sin_t = tf.cos(theta), tf.sin(theta)
+    # Inverse map in the style of ImageDataGenerator: rotation * shear * zoom about the centre, plus shift.
+    a0 = cos_t * zx * flip
+    a1 = (-sin_t * tf.cos(shear) + cos_t * -tf.sin(shear)) * zy
+    b0 = sin_t * zx * flip
+    b1 = (cos_t * tf.cos(shear) + sin_t * -tf.sin(shear)) * zy
+    cx, cy = (width - 1) / 2.0, (height - 1) / 2.0
+    a2 = cx - a0 * cx - a1 * cy + tx
+    b2 = cy - b0 * cx - b1 * cy + ty
+    zeros = tf.zeros_like(a0)
+    return tf.stack([a0, a1, a2, b0, b1, b2, zeros, zeros], axis=1)
+
+
+def augment_batch(images, seed):
+    """Applies random affine augmentation to a float32 (B, H, W, 1) batch in one op."""
+    shape = tf.shape(images)
+    height, width = images.shape[1], images.shape[2]
+    transforms = _augmentation_transforms(shape[0], height, width, seed)
+    return tf.raw_ops.ImageProjectiveTransformV3(
+        images=images,
+        transforms=transforms,
+        output_shape=tf.stack([height, width]),
+        fill_value=0.0,
+        interpolation='BILINEAR',
+        fill_mode='NEAREST',
+    )
+
+
+def build_dataset(images, labels, batch_size=64, training=False, num_classes=7, seed=42,
+                  cache=True, shuffle_buffer=None):
+    """
+    Builds a batched tf.data.Dataset of (float32 images in [0, 1], one-hot labels).
+
+    Args:
+        images: uint8 array of shape (N, 48, 48) or (N, 48, 48, 1).
+        labels: Integer class labels of shape (N,).
+        batch_size: Batch size.
+        training: Shuffle, augment and drop the last partial batch.
+        num_classes: Number of classes for the one-hot encoding.
+        seed: Seed for shuffling and augmentation.
+        cache: Keep the decoded uint8 tensors in memory after the first epoch.
+        shuffle_buffer: Shuffle buffer size (defaults to the whole dataset).
+    """
+    images = np.asarray(images, dtype=np.uint8)
+    if images.ndim == 3:
+        images = images[..., np.newaxis]
+    labels = np.asarray(labels, dtype=np.int32)
+
+    ds = tf.data.Dataset.from_tensor_slices((images, labels))
+    if cache:
+        ds = ds.cache()
+    if training:
+        ds = ds.shuffle(shuffle_buffer or len(labels), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size, drop_remainder=training, num_parallel_calls=AUTOTUNE, deterministic=True)
+
+    def to_model_inputs(batch_images, batch_labels):
+        return tf.cast(batch_images, tf.float32) / 255.0, tf.one_hot(batch_labels, num_classes)
+
+    ds = ds.map(to_model_inputs, num_parallel_calls=AUTOTUNE, deterministic=True)
+
+    if training:
+        def augment(batch_index, batch):
+            batch_images, batch_labels = batch
+            batch_seed = tf.stack([tf.constant(seed, tf.int64), batch_index])
+            return augment_batch(batch_images, batch_seed), batch_labels
+
+        ds = ds.enumerate().map(augment, num_parallel_calls=AUTOTUNE, deterministic=True)
+
+    return ds.prefetch(AUTOTUNE)
+
+
+def measure_throughput(batches, num_batches, warmup_batches=5):
+    """
+    Iterates over batches (a tf.data.Dataset or a Keras generator) and returns
+    samples per second, ignoring the first warmup_batches.
+    """
+    iterator = iter(batches)
+    for _ in range(warmup_batches):
+        next(iterator)
+    samples = 0
+    start = time.perf_counter()
+    for _ in range(num_batches):
+        batch_images, _batch_labels = next(iterator)
+        samples += int(batch_images.shape[0])
+    elapsed = time.perf_counter() - start
+    return samples / elapsed if elapsed > 0 else float('inf')
@@ -0,0 +1,91 @@
+"""
+Gunicorn configuration for serving the Emotion Learning Tool in production.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+The app (and the emotion model) is imported once in the master before the
+workers are forked, so the model weights, Haar cascade and learning content
+are shared copy-on-write instead of being loaded once per worker. Each worker
+is a gthread worker: a few request threads share the worker's model, and the
+micro-batching scheduler batches their faces together.
+
+CPU threads are pinned per worker so workers x inference threads stays within
+the machine's cores instead of every worker starting one thread per core:
+
+    EMOTION_WORKERS             worker processes (default: cores // EMOTION_INFERENCE_THREADS)
+    EMOTION_WORKER_THREADS      request threads per worker (default 4)
+    EMOTION_INFERENCE_THREADS   intra-op threads for TFLite/ONNX Runtime/TensorFlow (default 1)
+    EMOTION_OPENCV_THREADS      OpenCV threads per worker (default 1)
+    EMOTION_BIND                listen address (default 0.0.0.0:5000)
+    EMOTION_PRELOAD             0 to load the model in each worker instead of the master
+
+TensorFlow cannot be used across fork(), so preloading is turned off whenever
+loading the model would import it in the master: the Keras backend, a .h5 that
+still has to be converted, or TFLite without tflite-runtime. This is decided
+from the backend EMOTION_INFERENCE_BACKEND actually resolves to (including
+'auto'; see inference_backends.plan_backend), and each worker then loads its
+own copy. To keep preloading, convert the model ahead of time (start the app
+once without gunicorn, or point EMOTION_MODEL_FILE at a .tflite/.onnx from
+export_model.py). TFLite and ONNX Runtime with one inference thread are safe
+to share; with more threads each worker reloads its backend after fork
+(see EmotionDetector.after_fork).
+"""
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SpecialNeedsEmotionAssistant'))
+from emotion_detector import model_path_for
+from inference_backends import plan_backend
+
+inference_threads = int(os.environ.get('EMOTION_INFERENCE_THREADS', '1'))
+opencv_threads = int(os.environ.get('EMOTION_OPENCV_THREADS', '1'))
+os.environ['EMOTION_INFERENCE_THREADS'] = str(inference_threads)
+os.environ['EMOTION_OPENCV_THREADS'] = str(opencv_threads)
+# Read by TensorFlow and the OpenMP/MKL kernels when they are first imported.
+os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(inference_threads))
+os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+os.environ.setdefault('OMP_NUM_THREADS', str(inference_threads))
+
+bind = os.environ.get('EMOTION_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('EMOTION_WORKERS', '0')) or max(1, multiprocessing.cpu_count() // inference_threads)
+worker_class = 'gthread'
+threads = int(os.environ.get('EMOTION_WORKER_THREADS', '4'))
+
+resolved_backend, backend_uses_tensorflow = plan_backend(
+    os.environ.get('EMOTION_INFERENCE_BACKEND', 'auto'),
+    model_path_for(os.environ.get('EMOTION_MODEL', 'baseline'), os.environ.get('EMOTION_MODEL_FILE') or None))
+preload_app = os.environ.get('EMOTION_PRELOAD', '1') != '0' and not backend_uses_tensorflow
+
+# Cold start (model conversion on first run) can take a while; frames themselves are fast.
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    server.log.info("Inference backend %s (imports TensorFlow: %s), preload_app=%s",
+                    resolved_backend, backend_uses_tensorflow, preload_app)
+
+
+def pre_fork(server, worker):
+    # Startup threads (model, audio, TTS, static asset build) do not survive fork(); finish them in the master first.
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.learning_tool.wait_for_startup()
+        app_module.asset_cache.wait()
+        if 'tensorflow' in sys.modules and not getattr(server, '_warned_tensorflow', False):
+            server._warned_tensorflow = True
+            server.log.error("TensorFlow was imported in the master (planned backend %s), so workers may hang; "
+                             "set EMOTION_PRELOAD=0 or convert the model ahead of time", resolved_backend)
+
+
+def post_fork(server, worker):
+    app_module = sys.modules.get('app')
+    if app_module is None:
+        return  # Not preloaded: the worker imports the app itself.
+    import cv2
+    cv2.setNumThreads(opencv_threads)
+    app_module.learning_tool.after_fork()
+    server.log.info("Worker %s ready (inference_threads=%s, opencv_threads=%s)",
+                    worker.pid, inference_threads, opencv_threads)
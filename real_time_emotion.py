@@ -1,44 +1,290 @@
+"""
+Real-time emotion detection on one or more cameras or video files.
+
+The pipeline has three decoupled stages so a slow model never stalls capture:
+
+    capture    one thread per source reads frames into a small ring buffer;
+               when inference falls behind the oldest frames are dropped
+    inference  one thread takes the newest frame of every stream and runs
+               EmotionDetector.detect_emotion_batch, so faces from all
+               streams share one batched model call
+    display    the main thread shows the annotated frames (one window per
+               stream), or with --headless only prints statistics
+
+Per stream it reports capture and processed FPS, dropped frames and the
+end-to-end latency from capture to result.
+
+    python real_time_emotion.py                          # default webcam
+    python real_time_emotion.py --source 0 --source 1    # two cameras
+    python real_time_emotion.py --source clip.mp4 --headless --backend tflite
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+
 import cv2
 import numpy as np
-import tensorflow as tf
 
-model = tf.keras.models.load_model("emotion_model.h5")
+project_root = os.path.dirname(os.path.abspath(__file__))
+sna_path = os.path.join(project_root, 'SpecialNeedsEmotionAssistant')
+if sna_path not in sys.path:
+    sys.path.insert(0, sna_path)
+
+from emotion_detector import EmotionDetector, EMOTION_MODELS
+from face_detectors import FACE_DETECTORS
+
+
+class CaptureStream(threading.Thread):
+    """
+    Reads frames from one source into a drop-oldest ring buffer.
+
+    Video files are paced to their own frame rate (unless pace=False) so they
+    behave like a live camera; a file that ends stops the stream, or restarts
+    it with loop=True.
+    """
+
+    def __init__(self, index, source, buffer_size=2, pace=True, loop=False):
+        super().__init__(name=f'capture-{index}', daemon=True)
+        self.index = index
+        self.source = source
+        self.is_file = not isinstance(source, int)
+        self.pace = pace
+        self.loop = loop
+        self.buffer = deque(maxlen=buffer_size)
+        self.buffer_lock = threading.Lock()
+        self.frame_ready = threading.Event()
+        self.stopped = threading.Event()
+        self.finished = threading.Event()
+        self.captured = 0
+        self.dropped = 0
+        self.capture = cv2.VideoCapture(source)
+        if not self.capture.isOpened():
+            raise IOError(f"Could not open video source {source!r}")
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.frame_interval = 1.0 / fps if self.is_file and pace and fps and fps > 0 else 0.0
+
+    def run(self):
+        next_frame_at = time.perf_counter()
+        try:
+            while not self.stopped.is_set():
+                ok, frame = self.capture.read()
+                if not ok:
+                    if self.is_file and self.loop and self.captured:
+                        self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    break
+                captured_at = time.perf_counter()
+                with self.buffer_lock:
+                    if len(self.buffer) == self.buffer.maxlen:
+                        self.dropped += 1
+                    self.buffer.append((captured_at, frame))
+                    self.captured += 1
+                self.frame_ready.set()
+                if self.frame_interval:
+                    next_frame_at += self.frame_interval
+                    delay = next_frame_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_frame_at = time.perf_counter()
+        finally:
+            self.capture.release()
+            self.finished.set()
+            self.frame_ready.set()
+
+    def take_latest(self):
+        """Returns the newest (captured_at, frame) and drops the older buffered ones, or None."""
+        with self.buffer_lock:
+            if not self.buffer:
+                return None
+            self.dropped += len(self.buffer) - 1
+            latest = self.buffer[-1]
+            self.buffer.clear()
+        return latest
+
+    def stop(self):
+        self.stopped.set()
 
-emotion_labels = ["Angry", "Disgust", "Fear", "Happy", "Neutral", "Sad", "Surprise"]
 
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+class StreamStats:
+    """Processed-frame rate and capture-to-result latency over a sliding window."""
 
-cap = cv2.VideoCapture(0)
+    def __init__(self, window=300):
+        self.processed = 0
+        self.faces = 0
+        self.latencies = deque(maxlen=window)
+        self.completed_at = deque(maxlen=window)
+        self.lock = threading.Lock()
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
+    def record(self, captured_at, completed_at, face_count):
+        with self.lock:
+            self.processed += 1
+            self.faces += face_count
+            self.latencies.append(completed_at - captured_at)
+            self.completed_at.append(completed_at)
 
-  
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    def snapshot(self):
+        with self.lock:
+            latencies = np.array(self.latencies, dtype=np.float64) * 1000.0
+            completed = list(self.completed_at)
+            processed, faces = self.processed, self.faces
+        span = completed[-1] - completed[0] if len(completed) > 1 else 0.0
+        return {
+            'processed': processed,
+            'faces': faces,
+            'fps': (len(completed) - 1) / span if span > 0 else 0.0,
+            'latency_ms_p50': float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+            'latency_ms_p95': float(np.percentile(latencies, 95)) if latencies.size else 0.0,
+        }
 
-   
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5)
 
-    for (x, y, w, h) in faces:
-        roi_gray = gray[y:y + h, x:x + w] 
-        roi_gray = cv2.resize(roi_gray, (48, 48))  
-        roi_gray = np.expand_dims(roi_gray, axis=0).reshape(-1, 48, 48, 1) / 255.0  
+class InferenceStage(threading.Thread):
+    """Classifies the newest frame of every stream in one batched detector call per round."""
 
- 
-        predictions = model.predict(roi_gray)
-        emotion = emotion_labels[np.argmax(predictions)]
+    def __init__(self, detector, streams):
+        super().__init__(name='inference', daemon=True)
+        self.detector = detector
+        self.streams = streams
+        self.stream_states = [{} for _ in streams]
+        self.stats = [StreamStats() for _ in streams]
+        self.results = [None] * len(streams)
+        self.results_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.batches = 0
 
-        
+    def run(self):
+        while not self.stopped.is_set():
+            pending = []
+            for i, stream in enumerate(self.streams):
+                latest = stream.take_latest()
+                if latest is not None:
+                    pending.append((i, latest))
+            if not pending:
+                if all(stream.finished.is_set() for stream in self.streams):
+                    break
+                self._wait_for_frames(0.01)
+                continue
+
+            frames = [frame for _, (_, frame) in pending]
+            states = [self.stream_states[i] for i, _ in pending]
+            detections = self.detector.detect_emotion_batch(frames, states)
+            completed_at = time.perf_counter()
+            self.batches += 1
+            with self.results_lock:
+                for (i, (captured_at, frame)), faces in zip(pending, detections):
+                    self.results[i] = (frame, faces)
+                    self.stats[i].record(captured_at, completed_at, len(faces))
+
+    def _wait_for_frames(self, timeout):
+        for stream in self.streams:
+            stream.frame_ready.clear()
+        for stream in self.streams:
+            if stream.frame_ready.wait(timeout):
+                return
+
+    def take_result(self, index):
+        """Returns the latest (frame, faces) for a stream once, or None if nothing new arrived."""
+        with self.results_lock:
+            result, self.results[index] = self.results[index], None
+        return result
+
+    def stop(self):
+        self.stopped.set()
+
+
+def annotate(frame, faces):
+    for (x, y, w, h), label, confidence in faces:
         cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-        cv2.putText(frame, emotion, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        cv2.putText(frame, f"{label} {confidence:.2f}", (x, max(0, y - 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    return frame
+
+
+def print_stats(streams, inference, elapsed):
+    print(f"--- {elapsed:6.1f}s, {inference.batches} inference batches ---")
+    for stream, stats in zip(streams, inference.stats):
+        s = stats.snapshot()
+        capture_fps = stream.captured / elapsed if elapsed > 0 else 0.0
+        print(f"[{stream.index}] {str(stream.source):<24} capture {capture_fps:5.1f} fps  processed {s['fps']:5.1f} fps  "
+              f"dropped {stream.dropped:5d}  latency p50 {s['latency_ms_p50']:6.1f} ms  p95 {s['latency_ms_p95']:6.1f} ms  "
+              f"faces {s['faces']}")
+
+
+def parse_source(value):
+    return int(value) if value.isdigit() else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', action='append', type=parse_source,
+                        help="Camera index or video file/URL; repeat for several streams (default: camera 0)")
+    parser.add_argument('--headless', action='store_true', help="No windows; print statistics only")
+    parser.add_argument('--duration', type=float, help="Stop after this many seconds")
+    parser.add_argument('--stats-interval', type=float, default=5.0, help="Seconds between statistics lines")
+    parser.add_argument('--buffer-size', type=int, default=2, help="Frames buffered per stream before dropping the oldest")
+    parser.add_argument('--no-pace', action='store_true', help="Read video files as fast as possible")
+    parser.add_argument('--loop', action='store_true', help="Restart video files when they end")
+    parser.add_argument('--backend', default='auto', help="Inference backend (auto, keras, tflite, onnxruntime, opencv)")
+    parser.add_argument('--model', default='baseline', choices=list(EMOTION_MODELS))
+    parser.add_argument('--model-file', help="Model file in pretrained_models/ (overrides --model)")
+    parser.add_argument('--face-detector', default='haar', choices=FACE_DETECTORS)
+    parser.add_argument('--detect-every', type=int, default=1, help="Full face detection every N frames, tracking in between")
+    parser.add_argument('--detection-scale', type=float, default=1.0)
+    parser.add_argument('--confidence-threshold', type=float, default=0.30)
+    parser.add_argument('--num-threads', type=int, help="CPU threads for the inference runtime")
+    args = parser.parse_args()
+
+    detector = EmotionDetector(confidence_threshold=args.confidence_threshold, backend=args.backend,
+                               num_threads=args.num_threads, face_detector=args.face_detector,
+                               detect_every=args.detect_every, detection_scale=args.detection_scale,
+                               model_filename=args.model_file, model=args.model)
 
+    sources = args.source or [0]
+    try:
+        streams = [CaptureStream(i, source, args.buffer_size, pace=not args.no_pace, loop=args.loop)
+                   for i, source in enumerate(sources)]
+    except IOError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    inference = InferenceStage(detector, streams)
+    for stream in streams:
+        stream.start()
+    inference.start()
 
-    cv2.imshow("Emotion Detection", frame)
+    start = time.perf_counter()
+    next_stats = start + args.stats_interval
+    try:
+        while inference.is_alive():
+            now = time.perf_counter()
+            if args.duration and now - start >= args.duration:
+                break
+            if now >= next_stats:
+                print_stats(streams, inference, now - start)
+                next_stats = now + args.stats_interval
+            if args.headless:
+                time.sleep(0.05)
+                continue
+            for i, stream in enumerate(streams):
+                result = inference.take_result(i)
+                if result is not None:
+                    frame, faces = result
+                    cv2.imshow(f"Emotion Detection [{stream.source}]", annotate(frame.copy(), faces))
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for stream in streams:
+            stream.stop()
+        inference.stop()
+        inference.join(timeout=5.0)
+        print_stats(streams, inference, time.perf_counter() - start)
+        if not args.headless:
+            cv2.destroyAllWindows()
 
-    if cv2.waitKey(1) & 0xFF == ord("q"): 
-        break
 
-cap.release()
-cv2.destroyAllWindows()
+if __name__ == '__main__':
+    main()
@@ -1,125 +1,411 @@
-import pandas as pd
-import numpy as np
-import cv2
-import tensorflow as tf
-
-from tensorflow.keras.models import load_model
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout, BatchNormalization
-from tensorflow.keras.utils import to_categorical
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
-from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
-from sklearn.model_selection import train_test_split
-from sklearn.utils.class_weight import compute_class_weight
-import matplotlib.pyplot as plt
+"""
+Trains the FER2013 emotion CNN.
+
+    python train_model.py                      # defaults below
+    python train_model.py --config train.json  # JSON keys match the option names (dashes -> underscores)
+    python train_model.py --epochs 30 --precision mixed_bfloat16 --jit-compile --intra-op-threads 8
+    python train_model.py --mode distill --teacher-path emotion_model_augmented_weighted.h5
+
+In distill mode a compact depthwise-separable student (emotion_models.py) is
+trained against the hard labels plus the teacher's temperature-softened
+predictions on the same augmented batches. Its output files default to
+emotion_model_student.h5 etc. so the teacher is never overwritten.
+
+Training state (weights, optimizer, epoch) is backed up every epoch to
+--backup-dir, so an interrupted run picks up where it stopped when the same
+command is run again. Per-epoch timing and throughput go to --metrics-path.
+
+A new run refuses to start if --checkpoint-path already exists, since its
+first epoch would replace that model (and then --model-save-path) with a
+worse one. Pass --export-only to just export it, --init-from to fine-tune
+(the checkpoint is then only replaced by a model with a lower val_loss), or
+--overwrite to train from scratch anyway.
+"""
+import argparse
+import json
 import os
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+sna_path = os.path.join(project_root, 'SpecialNeedsEmotionAssistant')
+if sna_path not in sys.path:
+    sys.path.insert(0, sna_path)
 
+from emotion_models import ARCHITECTURES, build_model, count_flops
 
-DATASET_PATH = "fer2013.csv"
-MODEL_SAVE_PATH = "emotion_model_augmented_weighted.h5" 
-CHECKPOINT_PATH = "model_checkpoint_weighted.keras"
-IMG_HEIGHT, IMG_WIDTH = 48, 48
+DEFAULT_CONFIG = {
+    'dataset_path': "fer2013.csv",
+    'model_save_path': "emotion_model_augmented_weighted.h5",
+    'checkpoint_path': "model_checkpoint_weighted.keras",
+    'backup_dir': "training_backup",
+    'metrics_path': "training_metrics.jsonl",
+    'plot_path': "training_history_augmented_weighted.png",
+    'init_from': None,
+    'epochs': 75,
+    'batch_size': 64,
+    'learning_rate': 0.0005,
+    'val_split': 0.2,
+    'seed': 42,
+    'precision': 'float32',
+    'jit_compile': False,
+    'intra_op_threads': 0,
+    'inter_op_threads': 0,
+    'export_only': False,
+    'overwrite': False,
+    'mode': 'train',
+    'architecture': None,
+    'teacher_path': "emotion_model_augmented_weighted.h5",
+    'distill_alpha': 0.1,
+    'distill_temperature': 4.0,
+}
+# Output defaults used in distill mode when the options above are left unchanged.
+DISTILL_OUTPUT_DEFAULTS = {
+    'model_save_path': "emotion_model_student.h5",
+    'checkpoint_path': "model_checkpoint_student.keras",
+    'backup_dir': "training_backup_student",
+    'metrics_path': "training_metrics_student.jsonl",
+    'plot_path': "training_history_student.png",
+}
 NUM_CLASSES = 7
-BATCH_SIZE = 64
-EPOCHS = 75 
+PRECISION_POLICIES = ('float32', 'mixed_float16', 'mixed_bfloat16')
+TRAINING_MODES = ('train', 'distill')
+
+
+def parse_args(argv=None):
+    """CLI options override values from --config, which override DEFAULT_CONFIG."""
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument('--config')
+    known, _ = config_parser.parse_known_args(argv)
+    defaults = dict(DEFAULT_CONFIG)
+    if known.config:
+        with open(known.config, 'r', encoding='utf-8') as f:
+            file_config = json.load(f)
+        unknown_keys = set(file_config) - set(DEFAULT_CONFIG)
+        if unknown_keys:
+            raise ValueError(f"Unknown keys in {known.config}: {sorted(unknown_keys)}")
+        defaults.update(file_config)
+
+    parser = argparse.ArgumentParser(description=__doc__, parents=[config_parser],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset-path')
+    parser.add_argument('--model-save-path', help="Final HDF5 model written from the best checkpoint")
+    parser.add_argument('--checkpoint-path', help="Best-so-far model (by val_loss)")
+    parser.add_argument('--backup-dir', help="Per-epoch training state used to resume interrupted runs")
+    parser.add_argument('--metrics-path', help="JSON-lines file of per-epoch metrics and throughput")
+    parser.add_argument('--plot-path')
+    parser.add_argument('--init-from', help="Warm-start weights from an existing .keras/.h5 model")
+    parser.add_argument('--epochs', type=int)
+    parser.add_argument('--batch-size', type=int)
+    parser.add_argument('--learning-rate', type=float)
+    parser.add_argument('--val-split', type=float)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--precision', choices=PRECISION_POLICIES,
+                        help="mixed_bfloat16 speeds up training on CPUs with AVX512-BF16/AMX")
+    parser.add_argument('--jit-compile', action='store_true', default=None, help="Compile the train step with XLA")
+    parser.add_argument('--intra-op-threads', type=int, help="0 lets TensorFlow decide")
+    parser.add_argument('--inter-op-threads', type=int, help="0 lets TensorFlow decide")
+    parser.add_argument('--export-only', action='store_true', default=None,
+                        help="Skip training and only convert the best checkpoint to --model-save-path")
+    parser.add_argument('--overwrite', action='store_true', default=None,
+                        help="Train from scratch even if --checkpoint-path exists, replacing it")
+    parser.add_argument('--mode', choices=TRAINING_MODES, help="'distill' trains a student against --teacher-path")
+    parser.add_argument('--architecture', choices=ARCHITECTURES,
+                        help="Defaults to 'baseline' for train mode and 'student' for distill mode")
+    parser.add_argument('--teacher-path', help="Trained teacher model (.h5/.keras) for distill mode")
+    parser.add_argument('--distill-alpha', type=float, help="Weight of the hard-label loss (1 - alpha goes to the teacher)")
+    parser.add_argument('--distill-temperature', type=float, help="Softmax temperature applied to teacher and student")
+    parser.set_defaults(**defaults)
+    config = parser.parse_args(argv)
+
+    if config.architecture is None:
+        config.architecture = 'student' if config.mode == 'distill' else 'baseline'
+    if config.mode == 'distill':
+        for key, value in DISTILL_OUTPUT_DEFAULTS.items():
+            if getattr(config, key) == DEFAULT_CONFIG[key]:
+                setattr(config, key, value)
+        if os.path.abspath(config.teacher_path) == os.path.abspath(config.model_save_path):
+            raise ValueError("--model-save-path must differ from --teacher-path in distill mode.")
+    return config
+
+
+def configure_runtime(config):
+    """Applies thread and precision settings; must run before any TensorFlow op is created."""
+    import tensorflow as tf
+    if config.intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(config.intra_op_threads)
+    if config.inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(config.inter_op_threads)
+    tf.keras.mixed_precision.set_global_policy(config.precision)
+    tf.keras.utils.set_random_seed(config.seed)
+    print(f"Runtime: precision={config.precision}, jit_compile={config.jit_compile}, "
+          f"intra_op_threads={config.intra_op_threads or 'auto'}, inter_op_threads={config.inter_op_threads or 'auto'}")
+
+
+def make_distillation_loss(num_classes, alpha, temperature):
+    """
+    Loss for y_true = [one-hot label | teacher probabilities]:
+    alpha * CE(label, student) + (1 - alpha) * T^2 * KL(teacher_T || student_T),
+    where p_T = softmax(log(p) / T). Both models output probabilities, and
+    softmax(log(p) / T) equals softmax(logits / T), so no logits are needed.
+    """
+    import tensorflow as tf
+
+    def soften(probs):
+        return tf.nn.softmax(tf.math.log(tf.clip_by_value(probs, 1e-7, 1.0)) / temperature)
+
+    def distillation_loss(y_true, y_pred):
+        y_pred = tf.cast(y_pred, tf.float32)
+        hard, teacher = y_true[:, :num_classes], y_true[:, num_classes:]
+        hard_loss = tf.keras.losses.categorical_crossentropy(hard, y_pred)
+        soft_teacher, soft_student = soften(teacher), soften(y_pred)
+        kl = tf.reduce_sum(soft_teacher * (tf.math.log(soft_teacher + 1e-7) - tf.math.log(soft_student + 1e-7)), axis=-1)
+        return alpha * hard_loss + (1.0 - alpha) * (temperature ** 2) * kl
+
+    return distillation_loss
+
+
+def make_hard_label_accuracy(num_classes):
+    import tensorflow as tf
+
+    def accuracy(y_true, y_pred):
+        return tf.cast(tf.equal(tf.argmax(y_true[:, :num_classes], axis=-1), tf.argmax(y_pred, axis=-1)), tf.float32)
+
+    return accuracy
+
+
+def add_teacher_targets(dataset, teacher, num_classes, class_weights=None):
+    """
+    Appends the teacher's predictions on each (already augmented) batch to the
+    one-hot labels. Class weights become per-sample weights, since Keras'
+    class_weight expects plain one-hot targets.
+    """
+    import tensorflow as tf
+    weights = None
+    if class_weights is not None:
+        weights = tf.constant([class_weights.get(c, 1.0) for c in range(num_classes)], tf.float32)
+
+    def attach(batch_images, batch_labels):
+        teacher_probs = tf.cast(teacher(batch_images, training=False), tf.float32)
+        targets = tf.concat([batch_labels, teacher_probs], axis=-1)
+        if weights is None:
+            return batch_images, targets
+        return batch_images, targets, tf.gather(weights, tf.argmax(batch_labels, axis=-1))
+
+    return dataset.map(attach, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+def make_epoch_metrics_logger(metrics_path, samples_per_epoch):
+    import tensorflow as tf
+
+    class EpochMetricsLogger(tf.keras.callbacks.Callback):
+        """Appends one JSON line per epoch with duration, samples/s, learning rate and Keras logs."""
 
-if not os.path.exists(DATASET_PATH):
-    raise FileNotFoundError(f"Dataset file not found: {DATASET_PATH}")
+        def on_epoch_begin(self, epoch, logs=None):
+            self._epoch_start = time.perf_counter()
 
-if not os.path.exists(CHECKPOINT_PATH):
-    print(f"Checkpoint file {CHECKPOINT_PATH} not found. Running full training...")
-    
-    data = pd.read_csv(DATASET_PATH)
+        def on_epoch_end(self, epoch, logs=None):
+            seconds = time.perf_counter() - self._epoch_start
+            entry = {
+                'epoch': epoch + 1,
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'seconds': round(seconds, 3),
+                'samples_per_sec': round(samples_per_epoch / seconds, 1) if seconds > 0 else None,
+                'learning_rate': float(tf.keras.backend.get_value(self.model.optimizer.learning_rate)),
+            }
+            entry.update({k: float(v) for k, v in (logs or {}).items()})
+            with open(metrics_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    return EpochMetricsLogger()
+
+
+def best_recorded_val_loss(metrics_path):
+    """Lowest val_loss logged so far, so a resumed run doesn't overwrite a better checkpoint."""
+    if not os.path.exists(metrics_path):
+        return None
+    losses = []
+    with open(metrics_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                value = json.loads(line).get('val_loss')
+            except ValueError:
+                continue
+            if value is not None:
+                losses.append(value)
+    return min(losses) if losses else None
+
+
+def checkpoint_val_loss(checkpoint_path, validation_dataset, loss):
+    """val_loss of an existing checkpoint, so a new run only replaces it with a better model."""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(checkpoint_path, compile=False)
+    model.compile(loss=loss)
+    return float(model.evaluate(validation_dataset, verbose=0))
+
+
+def train(config):
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint, BackupAndRestore
+    from sklearn.model_selection import train_test_split
+    from sklearn.utils.class_weight import compute_class_weight
+    from fer_dataset import load_fer2013
+    from fer_pipeline import build_dataset
+
+    if not os.path.exists(config.dataset_path):
+        raise FileNotFoundError(f"Dataset file not found: {config.dataset_path}")
+
+    resuming = os.path.isdir(config.backup_dir) and bool(os.listdir(config.backup_dir))
+    keep_checkpoint = not resuming and os.path.exists(config.checkpoint_path) and not config.overwrite
+    if keep_checkpoint and not config.init_from:
+        raise FileExistsError(
+            f"{config.checkpoint_path} exists and there is no training backup to resume from. Use --export-only "
+            f"to export it, --init-from to fine-tune it, or --overwrite to train a new model in its place.")
+    if resuming:
+        print(f"Found training backup in {config.backup_dir}; resuming the interrupted run.")
+    elif os.path.exists(config.metrics_path):
+        os.remove(config.metrics_path)
+
+    images, y, _usage = load_fer2013(config.dataset_path)
     print("Dataset loaded.")
-    X = []
-    y = []
-    print("Processing pixels...")
-    for index, row in data.iterrows():
-        pixels = np.array(row["pixels"].split(), dtype="float32")
-        if pixels.size != IMG_HEIGHT * IMG_WIDTH: continue
-        X.append(pixels.reshape(IMG_HEIGHT, IMG_WIDTH))
-        y.append(row["emotion"])
-    if not X: raise ValueError("No valid data loaded from the CSV file.")
-    X = np.array(X)
-    y = np.array(y)
-    X = X / 255.0
-    X = X.reshape(-1, IMG_HEIGHT, IMG_WIDTH, 1)
-    y_one_hot = to_categorical(y, num_classes=NUM_CLASSES)
-    print(f"Data prepared: X shape={X.shape}, y_one_hot shape={y_one_hot.shape}")
-    X_train, X_val, y_train_one_hot, y_val_one_hot, y_train_int, y_val_int = train_test_split(
-        X, y_one_hot, y, test_size=0.2, random_state=42, stratify=y
+    if len(images) == 0: raise ValueError("No valid data loaded from the CSV file.")
+    y = y.astype(np.int64)
+    print(f"Data prepared: images shape={images.shape}, labels shape={y.shape}")
+    X_train, X_val, y_train_int, y_val_int = train_test_split(
+        images, y, test_size=config.val_split, random_state=config.seed, stratify=y
     )
     print(f"Train data: {X_train.shape}, Validation data: {X_val.shape}")
     class_labels = np.unique(y_train_int)
     class_weights_array = compute_class_weight(class_weight='balanced', classes=class_labels, y=y_train_int)
     class_weight_dict = dict(zip(class_labels, class_weights_array))
     print(f"Using Class Weights: {class_weight_dict}")
-    train_datagen = ImageDataGenerator( rotation_range=15, width_shift_range=0.1, height_shift_range=0.1, shear_range=0.1, zoom_range=0.1, horizontal_flip=True, fill_mode='nearest' )
-    val_datagen = ImageDataGenerator()
-    train_generator = train_datagen.flow(X_train, y_train_one_hot, batch_size=BATCH_SIZE)
-    validation_generator = val_datagen.flow(X_val, y_val_one_hot, batch_size=BATCH_SIZE)
-    print("Data generators created.")
-    model = Sequential([ Conv2D(64, (3, 3), activation='relu', padding='same', input_shape=(IMG_HEIGHT, IMG_WIDTH, 1)), BatchNormalization(), MaxPooling2D(2, 2), Conv2D(128, (3, 3), activation='relu', padding='same'), BatchNormalization(), MaxPooling2D(2, 2), Conv2D(256, (3, 3), activation='relu', padding='same'), BatchNormalization(), MaxPooling2D(2, 2), Conv2D(512, (3, 3), activation='relu', padding='same'), BatchNormalization(), MaxPooling2D(2, 2), Flatten(), Dense(256, activation='relu'), BatchNormalization(), Dropout(0.5), Dense(NUM_CLASSES, activation='softmax') ])
+    train_dataset = build_dataset(X_train, y_train_int, batch_size=config.batch_size, training=True, num_classes=NUM_CLASSES, seed=config.seed)
+    validation_dataset = build_dataset(X_val, y_val_int, batch_size=config.batch_size, training=False, num_classes=NUM_CLASSES)
+    print("tf.data pipelines created.")
+
+    model = build_model(config.architecture, NUM_CLASSES)
+    if config.init_from:
+        print(f"Warm-starting weights from {config.init_from}")
+        model.set_weights(tf.keras.models.load_model(config.init_from, compile=False).get_weights())
     model.summary()
-    optimizer = tf.keras.optimizers.Adam(learning_rate=0.0005)
-    model.compile(loss="categorical_crossentropy", optimizer=optimizer, metrics=["accuracy"])
+    print(f"Architecture '{config.architecture}': {count_flops(model) / 1e6:.1f} MFLOPs per image")
+    optimizer = tf.keras.optimizers.Adam(learning_rate=config.learning_rate)
+
+    fit_class_weight = class_weight_dict
+    if config.mode == 'distill':
+        from inference_backends import load_float32_keras_model
+        if not os.path.exists(config.teacher_path):
+            raise FileNotFoundError(f"Teacher model not found: {config.teacher_path}")
+        teacher = load_float32_keras_model(config.teacher_path)
+        teacher.trainable = False
+        teacher_flops = count_flops(teacher)
+        print(f"Distilling from {config.teacher_path} ({teacher_flops / 1e6:.1f} MFLOPs, "
+              f"{teacher_flops / count_flops(model):.1f}x the student), "
+              f"alpha={config.distill_alpha}, temperature={config.distill_temperature}")
+        train_dataset = add_teacher_targets(train_dataset, teacher, NUM_CLASSES, class_weight_dict)
+        validation_dataset = add_teacher_targets(validation_dataset, teacher, NUM_CLASSES)
+        loss = make_distillation_loss(NUM_CLASSES, config.distill_alpha, config.distill_temperature)
+        metrics = [make_hard_label_accuracy(NUM_CLASSES)]
+        fit_class_weight = None
+    else:
+        loss, metrics = "categorical_crossentropy", ["accuracy"]
+    model.compile(loss=loss, optimizer=optimizer, metrics=metrics, jit_compile=config.jit_compile)
     print("Model compiled.")
+
+    samples_per_epoch = (len(X_train) // config.batch_size) * config.batch_size
     early_stopping = EarlyStopping( monitor='val_loss', patience=15, verbose=1, restore_best_weights=False )
     reduce_lr = ReduceLROnPlateau( monitor='val_loss', factor=0.3, patience=7, verbose=1, min_lr=1e-7 )
-    model_checkpoint = ModelCheckpoint( filepath=CHECKPOINT_PATH, monitor='val_loss', save_best_only=True, save_weights_only=False, verbose=1 )
+    best_val_loss = None
+    if resuming:
+        best_val_loss = best_recorded_val_loss(config.metrics_path)
+    elif keep_checkpoint:
+        best_val_loss = checkpoint_val_loss(config.checkpoint_path, validation_dataset, loss)
+        print(f"Existing checkpoint {config.checkpoint_path}: val_loss={best_val_loss:.4f}; "
+              f"it is only replaced by a better model.")
+    model_checkpoint = ModelCheckpoint( filepath=config.checkpoint_path, monitor='val_loss', save_best_only=True, save_weights_only=False, verbose=1,
+                                        initial_value_threshold=best_val_loss )
+    backup = BackupAndRestore(backup_dir=config.backup_dir, delete_checkpoint=True)
+    metrics_logger = make_epoch_metrics_logger(config.metrics_path, samples_per_epoch)
     print("Starting training with class weights...")
-    history = model.fit( train_generator, steps_per_epoch=len(X_train) // BATCH_SIZE, epochs=EPOCHS, validation_data=validation_generator, validation_steps=len(X_val) // BATCH_SIZE, callbacks=[early_stopping, reduce_lr, model_checkpoint], class_weight=class_weight_dict )
+    history = model.fit( train_dataset, epochs=config.epochs, validation_data=validation_dataset,
+                         callbacks=[backup, early_stopping, reduce_lr, model_checkpoint, metrics_logger], class_weight=fit_class_weight )
     print("Training finished.")
+    return history
 
-print(f"Loading best model from checkpoint: {CHECKPOINT_PATH}")
-if os.path.exists(CHECKPOINT_PATH):
+
+def export_best_model(checkpoint_path, model_save_path):
+    from tensorflow.keras.models import load_model
+    print(f"Loading best model from checkpoint: {checkpoint_path}")
+    if not os.path.exists(checkpoint_path):
+        print(f"ERROR: Checkpoint file {checkpoint_path} not found. Cannot load best model.")
+        return False
     try:
-       
-        best_model = load_model(CHECKPOINT_PATH)
+        # The exported model is for inference, so the training loss/optimizer are not restored.
+        best_model = load_model(checkpoint_path, compile=False)
         print("Best model loaded successfully from checkpoint.")
-        print(f"Saving loaded best model to HDF5 format: {MODEL_SAVE_PATH}")
-        best_model.save(MODEL_SAVE_PATH)
-        print(f"Best model saved to {MODEL_SAVE_PATH}")
-
+        print(f"Saving loaded best model to HDF5 format: {model_save_path}")
+        best_model.save(model_save_path)
+        print(f"Best model saved to {model_save_path}")
+        return True
     except Exception as e:
-        print(f"ERROR: Could not load model from checkpoint {CHECKPOINT_PATH} or save to HDF5. Error: {e}")
+        print(f"ERROR: Could not load model from checkpoint {checkpoint_path} or save to HDF5. Error: {e}")
         import traceback
         traceback.print_exc()
-else:
-    print(f"ERROR: Checkpoint file {CHECKPOINT_PATH} not found. Cannot load best model.")
-
-try:
-    if 'history' in locals(): 
-        def plot_history(history):
-            acc = history.history['accuracy']
-            val_acc = history.history['val_accuracy']
-            loss = history.history['loss']
-            val_loss = history.history['val_loss']
-            epochs_range = range(len(acc))
-
-            plt.figure(figsize=(12, 5))
-            plt.subplot(1, 2, 1)
-            plt.plot(epochs_range, acc, label='Train Accuracy')
-            plt.plot(epochs_range, val_acc, label='Validation Accuracy')
-            plt.legend(loc='lower right')
-            plt.title('Training and Validation Accuracy')
-            plt.xlabel('Epochs')
-            plt.ylabel('Accuracy')
-
-            plt.subplot(1, 2, 2)
-            plt.plot(epochs_range, loss, label='Train Loss')
-            plt.plot(epochs_range, val_loss, label='Validation Loss')
-            plt.legend(loc='upper right')
-            plt.title('Training and Validation Loss')
-            plt.xlabel('Epochs')
-            plt.ylabel('Loss')
-
-            plt.tight_layout()
-            plt.savefig('training_history_augmented_weighted.png')
-            print("Training history plot saved as training_history_augmented_weighted.png")
-            # plt.show()
-        plot_history(history)
+        return False
+
+
+def plot_history(history, plot_path):
+    import matplotlib.pyplot as plt
+    acc = history.history['accuracy']
+    val_acc = history.history['val_accuracy']
+    loss = history.history['loss']
+    val_loss = history.history['val_loss']
+    epochs_range = range(len(acc))
+
+    plt.figure(figsize=(12, 5))
+    plt.subplot(1, 2, 1)
+    plt.plot(epochs_range, acc, label='Train Accuracy')
+    plt.plot(epochs_range, val_acc, label='Validation Accuracy')
+    plt.legend(loc='lower right')
+    plt.title('Training and Validation Accuracy')
+    plt.xlabel('Epochs')
+    plt.ylabel('Accuracy')
+
+    plt.subplot(1, 2, 2)
+    plt.plot(epochs_range, loss, label='Train Loss')
+    plt.plot(epochs_range, val_loss, label='Validation Loss')
+    plt.legend(loc='upper right')
+    plt.title('Training and Validation Loss')
+    plt.xlabel('Epochs')
+    plt.ylabel('Loss')
+
+    plt.tight_layout()
+    plt.savefig(plot_path)
+    print(f"Training history plot saved as {plot_path}")
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    configure_runtime(config)
+
+    history = None
+    if not config.export_only:
+        history = train(config)
+
+    export_best_model(config.checkpoint_path, config.model_save_path)
+
+    if history is not None:
+        try:
+            plot_history(history, config.plot_path)
+        except Exception as e:
+            print(f"Could not plot history. Error: {e}")
     else:
-        print("Skipping plotting history as full training was not run.")
-except Exception as e:
-    print(f"Could not plot history. Error: {e}")
\ No newline at end of file
+        print("Skipping plotting history as training was not run.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,14 @@
+"""
+WSGI entry point: `gunicorn -c gunicorn.conf.py wsgi:application`.
+
+Any WSGI server can load `wsgi:application`. The thread environment variables
+are set before app.py imports TensorFlow/OpenCV so they take effect.
+"""
+import os
+
+if os.environ.get('EMOTION_INFERENCE_THREADS'):
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', os.environ['EMOTION_INFERENCE_THREADS'])
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+    os.environ.setdefault('OMP_NUM_THREADS', os.environ['EMOTION_INFERENCE_THREADS'])
+
+from app import app as application  # noqa: E402